@@ -1,18 +1,32 @@
 """
 Executable file.
 """
+import argparse
 import os
 import logging
 from src import app
+from src.controller.task_controller import db
+from src.jobs import start_jobs
+from src.logging_setup import configure_logging
+from src.server import serve, server_processes
 
 os.environ['WERKZEUG_RUN_MAIN'] = 'true'
-logging.basicConfig(filename="logFile.log", level=logging.DEBUG,
-                    datefmt='%Y-%m-%d %H:%M:%S',
-                    format='%(asctime)s %(levelname)s %(name)s %('
-                           'threadName)s: %(message)s')
 log = logging.getLogger('werkzeug')
 log.disabled = True
 
 
 if __name__ == '__main__':
-    app.run(host='0.0.0.0')
+    parser = argparse.ArgumentParser(description='Serve the application.')
+    parser.add_argument('--dev', action='store_true',
+                        help='use the development server of Flask')
+    dev = parser.parse_args().dev
+    configure_logging(app, 1 if dev else server_processes(app))
+    if dev:
+        db.warm_up()
+        start_jobs(app, db)
+        app.run(host='0.0.0.0')
+    else:
+        serve(app)
+else:
+    # Imported by gunicorn (app:app), before the fork of the workers.
+    configure_logging(app, server_processes(app))
@@ -0,0 +1,385 @@
+"""
+Benchmarks of the routes and repository operations.
+
+Seeds the Tasks in an in-process backend (memory or mongomock), drives
+every route through the test client and every TaskRepository operation
+directly, and reports the throughput and the p50/p99 latency of each
+one. The results can be saved as JSON and compared with a baseline:
+
+    python benchmarks.py --tasks 100000 --output results.json
+    python benchmarks.py --tasks 100000 --baseline results.json
+"""
+import argparse
+import itertools
+import json
+import math
+import platform
+import sys
+import time
+from src import app
+from src.controller.task_controller import encode_cursor, \
+    find_next_available_id, page_cache
+from src.repository.connection import connections
+from src.repository.task_repository import TaskRepository
+
+# Cases that read or write all the Tasks run this many times less.
+HEAVY = 20
+# Phases of the cases: the reads run first, and the deletes last.
+READ, WRITE, DELETE = range(3)
+
+
+def percentile(samples, quantile):
+    """
+    Method to compute a percentile of sorted samples (nearest rank).
+
+    :param samples: Sorted samples.
+    :type samples: list
+    :param quantile: Quantile, between 0 and 1.
+    :type quantile: float
+    :return: The sample of the percentile, or 0 if there is none.
+    :rtype: float
+    """
+    if not samples:
+        return 0.0
+    return samples[max(0, math.ceil(quantile * len(samples)) - 1)]
+
+
+def measure(function, iterations):
+    """
+    Method to execute a case many times, timing each execution.
+
+    :param function: Case, called with the number of the execution.
+    :type function: callable
+    :param iterations: Amount of executions.
+    :type iterations: int
+    :return: Count, total seconds, throughput (executions per second),
+    and mean, p50 and p99 latency in milliseconds.
+    :rtype: dict
+    """
+    samples = []
+    for iteration in range(iterations):
+        start = time.perf_counter()
+        function(iteration)
+        samples.append(time.perf_counter() - start)
+
+    total = sum(samples)
+    samples.sort()
+    return {"count": len(samples),
+            "seconds": round(total, 6),
+            "throughput": round(len(samples) / total, 2) if total else 0.0,
+            "mean_ms": round(total / len(samples) * 1000, 4),
+            "p50_ms": round(percentile(samples, 0.5) * 1000, 4),
+            "p99_ms": round(percentile(samples, 0.99) * 1000, 4)}
+
+
+def seed(db, tasks, batch_size=1000):
+    """
+    Method to insert the Tasks of the benchmark, with the descriptions
+    Task 0000001, Task 0000002... and every other one finished.
+
+    :param db: Repository of the Tasks.
+    :type db: TaskRepository
+    :param tasks: Amount of Tasks.
+    :type tasks: int
+    :param batch_size: Tasks inserted per operation.
+    :type batch_size: int
+    :return: Seconds spent.
+    :rtype: float
+    """
+    start = time.perf_counter()
+    for first in range(1, tasks + 1, batch_size):
+        db.insert_many([{"description": 'Task %07d' % number,
+                         "status": number % 2 == 0}
+                        for number in range(first, min(first + batch_size,
+                                                       tasks + 1))])
+    return time.perf_counter() - start
+
+
+def route_cases(client, tasks, deleted):
+    """
+    Method to build the cases of the routes.
+
+    :param client: Test client of the application.
+    :type client: flask.testing.FlaskClient
+    :param tasks: Amount of Tasks seeded.
+    :type tasks: int
+    :param deleted: Identifiers to be deleted, from the last one.
+    :type deleted: iterator
+    :return: Phase, name, function and divisor of the iterations of
+    each case.
+    :rtype: list
+    """
+    def task_id(iteration):
+        return iteration % tasks + 1
+
+    def middle(iteration):
+        return encode_cursor((tasks // 2 + iteration) % tasks)
+
+    return [
+        (READ, "GET /index", lambda i: client.get('/index'), 1),
+        (READ, "GET /find-all", lambda i: client.get('/find-all'), 1),
+        (READ, "GET /find-all?after", lambda i: client.get(
+            '/find-all', query_string={"after": middle(i)}), 1),
+        (READ, "GET /find-all?status&sort", lambda i: client.get(
+            '/find-all', query_string={"status": 'true',
+                                       "description": 'Task 00%s' % (i % 10),
+                                       "sort": 'description'}), 1),
+        (READ, "GET /find-all?stream", lambda i: client.get(
+            '/find-all', query_string={"stream": 1}).get_data(), HEAVY),
+        (READ, "GET /search", lambda i: client.get(
+            '/search', query_string={"q": '%07d' % task_id(i)},
+            headers={"Accept": 'application/json'}), 1),
+        (READ, "GET /insert", lambda i: client.get('/insert'), 1),
+        (READ, "GET /update-by-id/<id>", lambda i: client.get(
+            '/update-by-id/%s' % task_id(i)), 1),
+        (READ, "GET /api/v1/tasks", lambda i: client.get('/api/v1/tasks'), 1),
+        (READ, "GET /api/v1/tasks/<id>", lambda i: client.get(
+            '/api/v1/tasks/%s' % task_id(i)), 1),
+        (READ, "GET /metrics", lambda i: client.get('/metrics'), 1),
+        (WRITE, "POST /insert", lambda i: client.post(
+            '/insert', data={"description": 'Route insert %s' % i}), 1),
+        (WRITE, "POST /update-by-id/<id>", lambda i: client.post(
+            '/update-by-id/%s' % task_id(i),
+            data={"description": 'Route update %s' % i}), 1),
+        (WRITE, "GET /change-status-by-id/<id>", lambda i: client.get(
+            '/change-status-by-id/%s' % task_id(i)), 1),
+        (WRITE, "POST /api/v1/tasks", lambda i: client.post(
+            '/api/v1/tasks', json={"description": 'Api insert %s' % i}), 1),
+        (WRITE, "PUT /api/v1/tasks/<id>", lambda i: client.put(
+            '/api/v1/tasks/%s' % task_id(i), json={"status": i % 2 == 0}),
+         1),
+        (WRITE, "POST /api/v1/tasks/bulk", lambda i: client.post(
+            '/api/v1/tasks/bulk',
+            json=[{"description": 'Bulk insert %s-%s' % (i, item)}
+                  for item in range(10)]), 1),
+        (WRITE, "PATCH /api/v1/tasks/bulk", lambda i: client.patch(
+            '/api/v1/tasks/bulk',
+            json=[{"id": task_id(i * 10 + item), "status": True}
+                  for item in range(10)]), 1),
+        (DELETE, "DELETE /api/v1/tasks/<id>", lambda i: client.delete(
+            '/api/v1/tasks/%s' % next(deleted)), 1),
+        (DELETE, "GET /delete-by-id/<id>", lambda i: client.get(
+            '/delete-by-id/%s' % next(deleted)), 1),
+        (DELETE, "DELETE /api/v1/tasks/bulk", lambda i: client.delete(
+            '/api/v1/tasks/bulk',
+            json=[next(deleted) for _ in range(10)]), HEAVY),
+    ]
+
+
+def repository_cases(db, tasks, deleted):
+    """
+    Method to build the cases of the repository operations.
+
+    :param db: Repository of the Tasks.
+    :type db: TaskRepository
+    :param tasks: Amount of Tasks seeded.
+    :type tasks: int
+    :param deleted: Identifiers to be deleted, from the last one.
+    :type deleted: iterator
+    :return: Phase, name, function and divisor of the iterations of
+    each case.
+    :rtype: list
+    """
+    def task_id(iteration):
+        return iteration % tasks + 1
+
+    return [
+        (READ, "TaskRepository.version", lambda i: db.version(), 1),
+        (READ, "TaskRepository.stats", lambda i: db.stats(), 1),
+        (READ, "TaskRepository.find_one", lambda i: db.find_one(
+            {"_id": task_id(i)}), 1),
+        (READ, "TaskRepository.find_page", lambda i: db.find_page(50), 1),
+        (READ, "TaskRepository.find_page(after)", lambda i: db.find_page(
+            50, after=(tasks // 2 + i) % tasks), 1),
+        (READ, "TaskRepository.find_page(filters)", lambda i: db.find_page(
+            50, parameters=db.task_filters(True, 'Task 00%s' % (i % 10)),
+            sort_key='description'), 1),
+        (READ, "TaskRepository.find_tasks", lambda i: sum(
+            1 for _ in db.find_tasks({})), HEAVY),
+        (READ, "TaskRepository.search", lambda i: db.search(
+            '%07d' % task_id(i), 50), 1),
+        (READ, "TaskRepository.reconcile_stats",
+         lambda i: db.reconcile_stats(wait=0), HEAVY),
+        (WRITE, "find_next_available_id",
+         lambda i: find_next_available_id(), 1),
+        (WRITE, "TaskRepository.next_ids", lambda i: db.next_ids(100), 1),
+        (WRITE, "TaskRepository.insert_one", lambda i: db.insert_one(
+            db.next_id(), 'Repository insert %s' % i, False), 1),
+        (WRITE, "TaskRepository.insert_many", lambda i: db.insert_many(
+            [{"description": 'Repository bulk %s-%s' % (i, item),
+              "status": False} for item in range(10)]), 1),
+        (WRITE, "TaskRepository.upsert_by_description",
+         lambda i: db.upsert_by_description('Task %07d' % task_id(i),
+                                            i % 2 == 0), 1),
+        (WRITE, "TaskRepository.update_one", lambda i: db.update_one(
+            {"_id": task_id(i)}, {"description": 'Repository update %s' % i}),
+         1),
+        (WRITE, "TaskRepository.update_one(status)", lambda i: db.update_one(
+            {"_id": task_id(i)}, {"status": i % 2 == 0}), 1),
+        (WRITE, "TaskRepository.toggle_status", lambda i: db.toggle_status(
+            task_id(i)), 1),
+        (WRITE, "TaskRepository.update_many", lambda i: db.update_many(
+            [(task_id(i * 10 + item), {"status": True})
+             for item in range(10)]), 1),
+        (DELETE, "TaskRepository.delete_one", lambda i: db.delete_one(
+            {"_id": next(deleted)}), 1),
+    ]
+
+
+def run_benchmarks(tasks=1000, backend='memory', iterations=200):
+    """
+    Method to seed the Tasks in a new database of the backend, and
+    measure every case. The configuration of the application and the
+    connection of the process are restored at the end.
+
+    :param tasks: Amount of Tasks seeded.
+    :type tasks: int
+    :param backend: In-process backend: memory or mongomock.
+    :type backend: str
+    :param iterations: Executions of each case (divided by the divisor
+    of the heavy cases).
+    :type iterations: int
+    :return: Parameters of the benchmark, and the results by case.
+    :rtype: dict
+    """
+    saved = {name: app.config.get(name) for name in ('TESTING',
+                                                      'TASK_BACKEND')}
+    app.config.update(TESTING=True, TASK_BACKEND=backend)
+    connections.reset()
+    page_cache.clear()
+    db = TaskRepository(app)
+    try:
+        seed_seconds = seed(db, tasks)
+        # Deletes take the Identifiers from the last one, so the other
+        # cases keep finding their Tasks.
+        deleted = (max(task_id, 1) for task_id in itertools.count(tasks, -1))
+        client = app.test_client()
+        results = {}
+        cases = route_cases(client, tasks, deleted) \
+            + repository_cases(db, tasks, deleted)
+        for _, name, function, divisor in sorted(cases,
+                                                 key=lambda case: case[0]):
+            results[name] = measure(function, max(1, iterations // divisor))
+    finally:
+        db.drop_mongo_connection()
+        app.config.update(saved)
+        connections.reset()
+        page_cache.clear()
+
+    return {"tasks": tasks, "backend": backend, "iterations": iterations,
+            "python": platform.python_version(),
+            "seed_seconds": round(seed_seconds, 3),
+            "results": results}
+
+
+def compare(current, baseline, threshold=0.2, min_delta_ms=0.05):
+    """
+    Method to find the cases slower than in a baseline: p50 latency
+    higher, or throughput lower, by more than the threshold. Cases whose
+    p50 and mean latency changed less than min_delta_ms are ignored, as
+    the noise of the fastest operations is larger than the threshold.
+
+    :param current: Results of run_benchmarks.
+    :type current: dict
+    :param baseline: Results of a previous run_benchmarks.
+    :type baseline: dict
+    :param threshold: Accepted relative change (0.2 is 20%).
+    :type threshold: float
+    :param min_delta_ms: Ignored change of the latency, in milliseconds.
+    :type min_delta_ms: float
+    :return: Case, metric, baseline value, current value and relative
+    change of each regression.
+    :rtype: list
+    """
+    regressions = []
+    for name, result in current.get('results', {}).items():
+        before = baseline.get('results', {}).get(name)
+        if not before or all(
+                abs(result.get(metric) - before.get(metric)) < min_delta_ms
+                for metric in ('p50_ms', 'mean_ms')):
+            continue
+        if before.get('p50_ms') and result.get('p50_ms') \
+                > before.get('p50_ms') * (1 + threshold):
+            regressions.append((name, 'p50_ms', before.get('p50_ms'),
+                                result.get('p50_ms'),
+                                result.get('p50_ms') / before.get('p50_ms')
+                                - 1))
+        if result.get('throughput') and before.get('throughput') \
+                > result.get('throughput') * (1 + threshold):
+            regressions.append((name, 'throughput',
+                                before.get('throughput'),
+                                result.get('throughput'),
+                                result.get('throughput')
+                                / before.get('throughput') - 1))
+    return regressions
+
+
+def report(benchmark, output=sys.stdout):
+    """
+    Method to print the results of a benchmark as a table.
+
+    :param benchmark: Results of run_benchmarks.
+    :type benchmark: dict
+    :param output: Stream of the table.
+    :type output: io.TextIOBase
+    """
+    output.write('%s tasks, %s backend, seeded in %.3fs\n'
+                 % (benchmark.get('tasks'), benchmark.get('backend'),
+                    benchmark.get('seed_seconds')))
+    output.write('%-40s %7s %12s %10s %10s\n'
+                 % ('case', 'count', 'ops/s', 'p50 ms', 'p99 ms'))
+    for name, result in benchmark.get('results').items():
+        output.write('%-40s %7d %12.1f %10.3f %10.3f\n'
+                     % (name, result.get('count'), result.get('throughput'),
+                        result.get('p50_ms'), result.get('p99_ms')))
+
+
+def main(argv=None):
+    """
+    Method to run the benchmark from the command line.
+
+    :param argv: Arguments, or None for the ones of the process.
+    :type argv: list
+    :return: Exit status: 1 if a case regressed against the baseline.
+    :rtype: int
+    """
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--tasks', type=int, default=1000,
+                        help='Tasks seeded (default: 1000).')
+    parser.add_argument('--backend', choices=('memory', 'mongomock'),
+                        default='memory', help='Backend (default: memory).')
+    parser.add_argument('--iterations', type=int, default=200,
+                        help='Executions of each case (default: 200).')
+    parser.add_argument('--output', help='File of the JSON results.')
+    parser.add_argument('--baseline', help='JSON results to compare with.')
+    parser.add_argument('--threshold', type=float, default=0.2,
+                        help='Accepted slowdown (default: 0.2, 20%%).')
+    parser.add_argument('--min-delta-ms', type=float, default=0.05,
+                        help='Ignored latency change (default: 0.05).')
+    arguments = parser.parse_args(argv)
+
+    benchmark = run_benchmarks(arguments.tasks, arguments.backend,
+                               arguments.iterations)
+    report(benchmark)
+    if arguments.output:
+        with open(arguments.output, 'w') as output:
+            json.dump(benchmark, output, indent=2)
+
+    if not arguments.baseline:
+        return 0
+    with open(arguments.baseline) as baseline_file:
+        baseline = json.load(baseline_file)
+    if (baseline.get('tasks'), baseline.get('backend')) \
+            != (benchmark.get('tasks'), benchmark.get('backend')):
+        print('warning: the baseline has %s tasks on %s'
+              % (baseline.get('tasks'), baseline.get('backend')))
+    regressions = compare(benchmark, baseline, arguments.threshold,
+                          arguments.min_delta_ms)
+    for name, metric, before, after, change in regressions:
+        print('regression: %s %s %s -> %s (%+.0f%%)'
+              % (name, metric, before, after, change * 100))
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,8 @@
+"""
+Configuration of gunicorn, built from the settings of the application:
+gunicorn -c gunicorn.conf.py app:app
+"""
+from src import app
+from src.server import server_options
+
+globals().update(server_options(app))
@@ -9,4 +9,20 @@ db.createUser(
             }
         ]
     }
-);
\ No newline at end of file
+);
+db.getSiblingDB("todo_test").createUser(
+    {
+        user: "mongotest",
+        pwd: "MngTst321",
+        roles:[
+            {
+                role: "readWrite",
+                db: "todo_test"
+            },
+            {
+                role: "dbAdmin",
+                db: "todo_test"
+            }
+        ]
+    }
+);
@@ -3,8 +3,13 @@ Initializer of src package.
 Defines the application, and imports view methods.
 """
 from flask import Flask
+from src.admission import init_admission
+from src.metrics import init_metrics
 
 app = Flask(__name__)
+app.config.from_object('src.config.Config')
+init_admission(app)
+init_metrics(app)
 
 from src.controller.task_controller import index
 from src.controller.task_controller import find_all
@@ -12,3 +17,14 @@ from src.controller.task_controller import insert
 from src.controller.task_controller import update_by_id
 from src.controller.task_controller import change_status_by_id
 from src.controller.task_controller import delete_by_id
+from src.controller.api_controller import api_find_all
+from src.controller.api_controller import api_insert
+from src.controller.api_controller import api_find_by_id
+from src.controller.api_controller import api_update_by_id
+from src.controller.api_controller import api_delete_by_id
+from src.controller.api_controller import api_insert_many
+from src.controller.api_controller import api_update_many
+from src.controller.api_controller import api_delete_many
+from src.controller.search_controller import search
+from src.controller.metrics_controller import find_metrics, find_slow_queries
+from src.commands import create_indexes, reconcile_stats, tasks
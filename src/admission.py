@@ -0,0 +1,429 @@
+"""
+Admission control of the repository operations: a bounded-concurrency
+gate, with a bounded queue and wait, and a circuit breaker that stops
+calling the database after consecutive timeouts.
+"""
+import asyncio
+import contextlib
+import contextvars
+import logging
+import math
+import threading
+import time
+import weakref
+from flask import jsonify, request
+from pymongo.errors import ConnectionFailure, ExecutionTimeout
+from werkzeug.exceptions import ServiceUnavailable
+
+# Errors of the database that count as timeouts in the circuit breaker.
+# ConnectionFailure includes the network, server selection and
+# connection pool wait timeouts.
+TIMEOUT_ERRORS = (ConnectionFailure, ExecutionTimeout)
+
+
+class Overloaded(ServiceUnavailable):
+    """
+    Error of an operation refused by the admission control. Answered
+    with 503 and the Retry-After header.
+    """
+    description = 'O serviço está sobrecarregado. Tente novamente em' \
+                  ' instantes.'
+
+
+class AdmissionGate:
+    """
+    Class to limit the operations executed at the same time. Up to
+    queue_depth operations wait for a free slot, each one for at most
+    timeout seconds; the others are refused at once.
+    """
+    def __init__(self, limit, queue_depth, timeout):
+        """
+        :param limit: Max amount of operations at the same time.
+        :type limit: int
+        :param queue_depth: Max amount of operations waiting.
+        :type queue_depth: int
+        :param timeout: Max seconds of wait for a slot.
+        :type timeout: float
+        """
+        self.limit = limit
+        self.queue_depth = queue_depth
+        self.timeout = timeout
+        self.waiting = 0
+        self.rejected = 0
+        self._slots = threading.BoundedSemaphore(limit)
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """
+        Method to take a slot, waiting in the queue if there is none.
+        :return: If a slot was taken. False if the queue is full or the
+        wait timed out.
+        :rtype: bool
+        """
+        if self._slots.acquire(blocking=False):
+            return True
+        with self._lock:
+            if self.waiting >= self.queue_depth:
+                self.rejected += 1
+                return False
+            self.waiting += 1
+        try:
+            acquired = self._slots.acquire(timeout=self.timeout)
+        finally:
+            with self._lock:
+                self.waiting -= 1
+                if not acquired:
+                    self.rejected += 1
+        return acquired
+
+    def release(self):
+        """
+        Method to give back a slot taken by acquire.
+        """
+        self._slots.release()
+
+
+class AsyncAdmissionGate:
+    """
+    Class to limit the coroutines executed at the same time, with the
+    limits of AdmissionGate, over an asyncio.Semaphore, so the wait for
+    a slot does not block the event loop. Each event loop has its own
+    semaphore.
+    """
+    def __init__(self, limit, queue_depth, timeout):
+        """
+        :param limit: Max amount of operations at the same time.
+        :type limit: int
+        :param queue_depth: Max amount of operations waiting.
+        :type queue_depth: int
+        :param timeout: Max seconds of wait for a slot.
+        :type timeout: float
+        """
+        self.limit = limit
+        self.queue_depth = queue_depth
+        self.timeout = timeout
+        self.waiting = 0
+        self.rejected = 0
+        self._slots = weakref.WeakKeyDictionary()
+
+    def _semaphore(self):
+        loop = asyncio.get_running_loop()
+        slots = self._slots.get(loop)
+        if slots is None:
+            slots = self._slots[loop] = asyncio.Semaphore(self.limit)
+        return slots
+
+    async def acquire(self):
+        """
+        Method to take a slot, waiting in the queue if there is none.
+        :return: If a slot was taken. False if the queue is full or the
+        wait timed out.
+        :rtype: bool
+        """
+        slots = self._semaphore()
+        if not slots.locked():
+            await slots.acquire()
+            return True
+        if self.waiting >= self.queue_depth:
+            self.rejected += 1
+            return False
+        self.waiting += 1
+        try:
+            await asyncio.wait_for(slots.acquire(), self.timeout)
+        except asyncio.TimeoutError:
+            self.rejected += 1
+            return False
+        finally:
+            self.waiting -= 1
+        return True
+
+    def release(self):
+        """
+        Method to give back a slot taken by acquire.
+        """
+        self._semaphore().release()
+
+
+class CircuitBreaker:
+    """
+    Class to stop calling the database after threshold consecutive
+    timeouts. While open, the calls are refused; after reset_timeout
+    seconds, a single call is let through (half-open) to probe the
+    database: if it succeeds the circuit closes, if not it opens again.
+    """
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, threshold, reset_timeout, logger=None,
+                 clock=time.monotonic):
+        """
+        :param threshold: Consecutive timeouts that open the circuit.
+        :type threshold: int
+        :param reset_timeout: Seconds open before the probe.
+        :type reset_timeout: float
+        :param logger: Logger of the state changes.
+        :type logger: logging.Logger
+        :param clock: Function returning the current time in seconds.
+        :type clock: function
+        """
+        self.threshold = threshold
+        self.reset_timeout = reset_timeout
+        self.logger = logger
+        self.clock = clock
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = None
+        self._lock = threading.Lock()
+
+    def allow(self):
+        """
+        Method to check if a call can be executed, moving an open
+        circuit to half-open after reset_timeout.
+        :return: If the call can be executed.
+        :rtype: bool
+        """
+        with self._lock:
+            if self.state == self.CLOSED:
+                return True
+            if self.state == self.OPEN \
+                    and self.clock() - self.opened_at >= self.reset_timeout:
+                self._change(self.HALF_OPEN)
+                return True
+            return False
+
+    def record(self, failed):
+        """
+        Method to count the result of a call allowed by allow.
+        :param failed: If the call timed out.
+        :type failed: bool
+        """
+        with self._lock:
+            if not failed:
+                self.failures = 0
+                if self.state != self.CLOSED:
+                    self._change(self.CLOSED)
+                return
+            self.failures += 1
+            if self.state == self.HALF_OPEN \
+                    or self.failures >= self.threshold:
+                self.opened_at = self.clock()
+                if self.state != self.OPEN:
+                    self._change(self.OPEN)
+
+    def cancel(self):
+        """
+        Method to give up a call allowed by allow, without a result. A
+        probe given up opens the circuit again, so the next call probes
+        the database.
+        """
+        with self._lock:
+            if self.state == self.HALF_OPEN:
+                self.state = self.OPEN
+
+    def retry_after(self):
+        """
+        :return: Seconds until the next probe of the database.
+        :rtype: float
+        """
+        if self.state != self.OPEN:
+            return 0.0
+        return max(self.reset_timeout - (self.clock() - self.opened_at), 0.0)
+
+    def _change(self, state):
+        if self.logger is not None:
+            self.logger.warning('CircuitBreaker - %s -> %s after %s'
+                                ' timeouts', self.state, state, self.failures)
+        self.state = state
+
+
+def admission_limits(config, asynchronous=False):
+    """
+    Method to read the size of the gate. When not defined, the
+    concurrency is one less than the threads of each server process
+    (SERVER_THREADS), so a thread is always free to refuse requests at
+    once, and the queue is half the concurrency (at least 1). The
+    coroutines are not limited by threads, but by the connection pool,
+    so their concurrency is MONGO_MAX_POOL_SIZE.
+
+    :param config: Configuration of the application.
+    :type config: flask.Config
+    :param asynchronous: If the gate is the one of the coroutines.
+    :type asynchronous: bool
+    :return: Max operations at the same time, and max operations
+    waiting.
+    :rtype: tuple(int, int)
+    """
+    limit = config['ADMISSION_MAX_CONCURRENCY']
+    if limit is None:
+        limit = config['MONGO_MAX_POOL_SIZE'] if asynchronous \
+            else max(config['SERVER_THREADS'] - 1, 1)
+    queue_depth = config['ADMISSION_QUEUE_DEPTH']
+    if queue_depth is None:
+        queue_depth = max(limit // 2, 1)
+    return limit, queue_depth
+
+
+class AdmissionControl:
+    """
+    Class with the gate and the circuit breaker of the process, applied
+    to every repository operation (see metrics.timed). Operations
+    executed inside another one are not counted again.
+    """
+    def __init__(self):
+        self.gate = None
+        self.async_gate = None
+        self.breaker = None
+        self.retry_after = 1
+        self._depth = contextvars.ContextVar('admission_depth', default=0)
+
+    def configure(self, app):
+        """
+        Method to create the gate and the circuit breaker from the
+        configuration of the application.
+
+        :param app: Flask application.
+        :type app: flask.Flask
+        """
+        config = app.config
+        limit, queue_depth = admission_limits(config)
+        self.gate = None
+        if limit > 0:
+            self.gate = AdmissionGate(limit, queue_depth,
+                                      config['ADMISSION_TIMEOUT'])
+        limit, queue_depth = admission_limits(config, asynchronous=True)
+        self.async_gate = None
+        if limit > 0:
+            self.async_gate = AsyncAdmissionGate(
+                limit, queue_depth, config['ADMISSION_TIMEOUT'])
+        self.breaker = None
+        if config['CIRCUIT_BREAKER_THRESHOLD'] > 0:
+            # The logger is read by name: app.logger, before the logging
+            # is configured, would attach the default stderr handler.
+            self.breaker = CircuitBreaker(
+                config['CIRCUIT_BREAKER_THRESHOLD'],
+                config['CIRCUIT_BREAKER_RESET_TIMEOUT'],
+                logging.getLogger(app.name))
+        self.retry_after = config['ADMISSION_RETRY_AFTER']
+
+    def _allow(self):
+        """
+        Method to check the circuit breaker before an operation.
+        :return: The circuit breaker, or None if it is disabled.
+        :rtype: CircuitBreaker
+        :raises Overloaded: If the circuit is open.
+        """
+        breaker = self.breaker
+        if breaker is not None and not breaker.allow():
+            raise Overloaded(retry_after=max(
+                math.ceil(breaker.retry_after()), self.retry_after))
+        return breaker
+
+    def _refuse(self, breaker):
+        """
+        Method to refuse an operation allowed by the circuit breaker,
+        for which there is no slot in the gate.
+        :param breaker: Circuit breaker, or None.
+        :type breaker: CircuitBreaker
+        :raises Overloaded: Always.
+        """
+        if breaker is not None:
+            breaker.cancel()
+        raise Overloaded(retry_after=self.retry_after)
+
+    @contextlib.contextmanager
+    def admit(self):
+        """
+        Context manager to execute an operation through the circuit
+        breaker and the gate.
+
+        :raises Overloaded: If the circuit is open, or there is no slot.
+        """
+        if self._depth.get():
+            yield
+            return
+
+        breaker = self._allow()
+        gate = self.gate
+        if gate is not None and not gate.acquire():
+            self._refuse(breaker)
+
+        token = self._depth.set(1)
+        failed = False
+        try:
+            yield
+        except TIMEOUT_ERRORS:
+            failed = True
+            raise
+        finally:
+            self._depth.reset(token)
+            if gate is not None:
+                gate.release()
+            if breaker is not None:
+                breaker.record(failed)
+
+    @contextlib.asynccontextmanager
+    async def admit_async(self):
+        """
+        Context manager to execute a coroutine through the circuit
+        breaker and the gate of the coroutines (see AsyncAdmissionGate),
+        like admit.
+
+        :raises Overloaded: If the circuit is open, or there is no slot.
+        """
+        if self._depth.get():
+            yield
+            return
+
+        breaker = self._allow()
+        gate = self.async_gate
+        if gate is not None and not await gate.acquire():
+            self._refuse(breaker)
+
+        token = self._depth.set(1)
+        failed = False
+        try:
+            yield
+        except TIMEOUT_ERRORS:
+            failed = True
+            raise
+        finally:
+            self._depth.reset(token)
+            if gate is not None:
+                gate.release()
+            if breaker is not None:
+                breaker.record(failed)
+
+
+admission = AdmissionControl()
+
+
+def overloaded(error):
+    """
+    Method that answers the requests refused by the admission control:
+    with JSON in the API routes, and with the HTML error page in the
+    others, both with the Retry-After header.
+
+    :param error: Error raised by the admission control.
+    :type error: Overloaded
+    :return: Response with 503 in HTTP status code.
+    :rtype: flask.Response
+    """
+    if not request.path.startswith('/api/'):
+        return error.get_response()
+    response = jsonify({"error": error.description})
+    response.headers['Retry-After'] = str(error.retry_after)
+    return response, error.code
+
+
+def init_admission(app):
+    """
+    Method to configure the admission control of the repository
+    operations of the application, and the answer of the requests it
+    refuses.
+
+    :param app: Flask application.
+    :type app: flask.Flask
+    """
+    admission.configure(app)
+    app.register_error_handler(Overloaded, overloaded)
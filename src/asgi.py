@@ -0,0 +1,213 @@
+"""
+ASGI application.
+Serves the asynchronous views, and the Flask application (through
+asgiref, when installed) in the other routes.
+"""
+import asyncio
+import json
+import re
+from urllib.parse import parse_qs
+from werkzeug.exceptions import HTTPException
+from src import app
+from src.server import initialize_worker, stop_worker
+
+try:
+    from asgiref.wsgi import WsgiToAsgi
+except ImportError:
+    WsgiToAsgi = None
+
+
+class AsyncRequest:
+    """
+    Class with the data of a HTTP request received by an asynchronous
+    view.
+    """
+    def __init__(self, scope, body):
+        self.method = scope['method']
+        self.path = scope['path']
+        self.args = {key: values[0] for key, values in
+                     parse_qs(scope.get('query_string', b'').decode())
+                     .items()}
+        self.headers = {key.decode('latin-1').lower():
+                        value.decode('latin-1')
+                        for key, value in scope.get('headers', [])}
+        self.body = body
+
+    def get_json(self):
+        """
+        Method to decode the body of the request.
+        :return: JSON received, or None if the body is not valid JSON.
+        :rtype: object
+        """
+        try:
+            return json.loads(self.body)
+        except ValueError:
+            return None
+
+
+class AsyncRouter:
+    """
+    Class to register the asynchronous views, and find the view of a
+    request by method and path.
+    """
+    def __init__(self):
+        self.routes = []
+
+    def route(self, pattern, methods):
+        """
+        Decorator to register an asynchronous view. Named groups of the
+        pattern are received by the view as keyword arguments.
+        :param pattern: Regular expression of the path.
+        :type pattern: str
+        :param methods: HTTP methods accepted.
+        :type methods: list
+        :return: Decorator of the view.
+        :rtype: function
+        """
+        def decorator(view):
+            self.routes.append((re.compile(pattern + '$'), methods, view))
+            return view
+        return decorator
+
+    def match(self, method, path):
+        """
+        Method to find the view of a request.
+        :param method: HTTP method.
+        :type method: str
+        :param path: Path of the request.
+        :type path: str
+        :return: The view and its arguments, or None if no route
+        matches. If the path matches with other methods, the view is
+        None.
+        :rtype: tuple(function, dict)
+        """
+        result = None
+        for pattern, methods, view in self.routes:
+            found = pattern.match(path)
+            if found:
+                if method in methods:
+                    return view, found.groupdict()
+                result = (None, {})
+        return result
+
+
+class AsgiApplication:
+    """
+    ASGI application, that serves the asynchronous views of the router,
+    and the other routes with the WSGI application.
+    """
+    def __init__(self, router, wsgi_app=None, startup=None, shutdown=None):
+        """
+        :param router: Router of the asynchronous views.
+        :type router: AsyncRouter
+        :param wsgi_app: Application of the other routes, or None.
+        :type wsgi_app: flask.Flask
+        :param startup: Function executed (in a thread) when the server
+        starts, whose result is given to shutdown, or None.
+        :type startup: function
+        :param shutdown: Function executed (in a thread) when the
+        server stops, or None.
+        :type shutdown: function
+        """
+        self.router = router
+        self.fallback = WsgiToAsgi(wsgi_app) \
+            if wsgi_app is not None and WsgiToAsgi is not None else None
+        self.startup = startup
+        self.shutdown = shutdown
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            await self.lifespan(receive, send)
+            return
+        if scope['type'] != 'http':
+            return
+
+        match = self.router.match(scope['method'], scope['path'])
+        if match is None and self.fallback is not None:
+            await self.fallback(scope, receive, send)
+            return
+
+        headers = []
+        body = b''
+        more_body = True
+        while more_body:
+            message = await receive()
+            body += message.get('body', b'')
+            more_body = message.get('more_body', False)
+
+        if match is None:
+            status, payload = 404, {"error": 'Rota não encontrada.'}
+        elif match[0] is None:
+            status, payload = 405, {"error": 'Método não permitido.'}
+        else:
+            view, arguments = match
+            try:
+                status, payload = await view(AsyncRequest(scope, body),
+                                             **arguments)
+            except HTTPException as error:
+                status, payload = error.code, {"error": error.description}
+                headers = [(name, value) for name, value in error.get_headers()
+                           if name.lower() == 'retry-after']
+
+        await self.send_json(send, status, payload, headers)
+
+    async def lifespan(self, receive, send):
+        """
+        Method to answer the lifespan events of the ASGI server, running
+        the startup and shutdown functions of the application.
+        """
+        loop = asyncio.get_running_loop()
+        state = None
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                try:
+                    if self.startup is not None:
+                        state = await loop.run_in_executor(None,
+                                                           self.startup)
+                except Exception as error:
+                    await send({"type": 'lifespan.startup.failed',
+                                "message": str(error)})
+                    return
+                await send({"type": 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                if self.shutdown is not None:
+                    await loop.run_in_executor(None, self.shutdown, state)
+                await send({"type": 'lifespan.shutdown.complete'})
+                return
+
+    @staticmethod
+    async def send_json(send, status, payload, extra_headers=()):
+        """
+        Method to send a JSON response.
+        :param send: ASGI send function.
+        :type send: function
+        :param status: HTTP status code.
+        :type status: int
+        :param payload: Body of the response, or None for no body.
+        :type payload: dict
+        :param extra_headers: Other headers, as (name, value) pairs.
+        :type extra_headers: list
+        """
+        body = b'' if payload is None else json.dumps(payload).encode()
+        headers = [(b'content-length', str(len(body)).encode())]
+        if payload is not None:
+            headers.append((b'content-type', b'application/json'))
+        headers.extend((name.lower().encode('latin-1'),
+                        str(value).encode('latin-1'))
+                       for name, value in extra_headers)
+        await send({"type": 'http.response.start', "status": status,
+                    "headers": headers})
+        await send({"type": 'http.response.body', "body": body})
+
+
+router = AsyncRouter()
+# The same worker initialization of the gunicorn post_fork hook.
+application = AsgiApplication(router, app, startup=initialize_worker,
+                              shutdown=stop_worker)
+
+from src.controller.async_api_controller import async_api_find_all
+from src.controller.async_api_controller import async_api_insert
+from src.controller.async_api_controller import async_api_find_by_id
+from src.controller.async_api_controller import async_api_update_by_id
+from src.controller.async_api_controller import async_api_delete_by_id
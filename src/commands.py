@@ -0,0 +1,246 @@
+"""
+Command line operations, executed with the flask command
+"""
+import csv
+import itertools
+import json
+import time
+import click
+from flask.cli import AppGroup
+from pymongo.errors import OperationFailure
+from src import app
+from src.controller.task_controller import db
+from src.repository.store import DUPLICATE_KEY_ERROR
+
+# Columns of the CSV files, in the order they are written.
+CSV_FIELDS = ('id', 'description', 'status')
+FORMATS = ('ndjson', 'csv')
+
+tasks = AppGroup('tasks', help='Exports and imports the Tasks.')
+app.cli.add_command(tasks)
+
+
+@app.cli.command('create-indexes')
+@click.option('--dedup', is_flag=True,
+              help='Deletes the Tasks with a duplicated description,'
+                   ' keeping the lowest Identifier, before creating the'
+                   ' indexes.')
+def create_indexes(dedup):
+    """
+    Creates the declared indexes of the Task collection, keeping the
+    ones that already exist. Fails if the database can not build an
+    index, as the unique index on description over duplicated Tasks.
+    """
+    app.logger.info("Executing at Commands - create_indexes(dedup=%s)",
+                    dedup)
+    if dedup:
+        removed = db.remove_duplicates()
+        click.echo('removed=%s' % len(removed), err=True)
+    try:
+        names = db.ensure_indexes(strict=True)
+    except OperationFailure as error:
+        message = 'Could not create the indexes: %s' % error
+        if error.code == DUPLICATE_KEY_ERROR:
+            message += ' (run with --dedup to delete the duplicated Tasks)'
+        raise click.ClickException(message)
+    for name in names:
+        click.echo(name)
+
+
+@app.cli.command('reconcile-stats')
+@click.option('--wait', type=float,
+              help='Seconds waited for the counters buffered by the'
+                   ' running workers (default: twice'
+                   ' TASK_COUNTERS_FLUSH_INTERVAL).')
+def reconcile_stats(wait):
+    """
+    Computes the statistics of the Tasks again, from the collection.
+    Fails, keeping the statistics, if they changed in the meantime.
+    """
+    app.logger.info("Executing at Commands - reconcile_stats(wait=%s)",
+                    wait)
+    stats = db.reconcile_stats(wait)
+    if stats is None:
+        raise click.ClickException('The statistics changed during the'
+                                   ' recalculation, run it again.')
+    click.echo('total=%s finished=%s pending=%s'
+               % (stats.get('total'), stats.get('finished'),
+                  stats.get('pending')))
+
+
+@tasks.command('export')
+@click.option('--output', '-o', type=click.File('w', encoding='utf-8'),
+              default='-', help='File to be written (default: stdout).')
+@click.option('--format', 'file_format', type=click.Choice(FORMATS),
+              help='Format of the file (default: by the file extension,'
+                   ' or ndjson).')
+def export_tasks(output, file_format):
+    """
+    Writes all the Tasks, in the order of the Identifier, while they
+    are read from the database.
+    """
+    app.logger.info("Executing at Commands - export_tasks()")
+    file_format = file_format or guess_format(getattr(output, 'name', '-'))
+    rows = ({"id": task.id, "description": task.description,
+             "status": task.status}
+            for task in db.find_tasks(
+                {}, batch_size=app.config['TASK_STREAM_BATCH_SIZE']))
+
+    start = time.perf_counter()
+    count = 0
+    if file_format == 'csv':
+        writer = csv.DictWriter(output, CSV_FIELDS, lineterminator='\n')
+        writer.writeheader()
+        for row in rows:
+            writer.writerow(row)
+            count += 1
+    else:
+        for row in rows:
+            output.write(json.dumps(row, ensure_ascii=False) + '\n')
+            count += 1
+    output.flush()
+    click.echo('exported=%s %s' % (count, throughput(count, start)),
+               err=True)
+
+
+@tasks.command('import')
+@click.argument('source', type=click.File('r', encoding='utf-8'),
+                default='-')
+@click.option('--format', 'file_format', type=click.Choice(FORMATS),
+              help='Format of the file (default: by the file extension,'
+                   ' or ndjson).')
+@click.option('--batch-size', type=click.IntRange(min=1),
+              help='Tasks inserted per operation (default:'
+                   ' TASK_IMPORT_BATCH_SIZE).')
+def import_tasks(source, file_format, batch_size):
+    """
+    Inserts the Tasks of a file (or stdin), in batches of unordered
+    inserts. The Identifiers of the file are ignored: new ones are
+    allocated by the repository. Tasks with a description that already
+    exists are skipped by the unique index of the description.
+    """
+    app.logger.info("Executing at Commands - import_tasks()")
+    file_format = file_format or guess_format(getattr(source, 'name', '-'))
+    batch_size = batch_size or app.config['TASK_IMPORT_BATCH_SIZE']
+    rows = read_csv(source) if file_format == 'csv' else read_ndjson(source)
+
+    counts = {"imported": 0, "duplicated": 0, "invalid": 0, "failed": 0}
+    start = time.perf_counter()
+    while True:
+        rows_batch = list(itertools.islice(rows, batch_size))
+        if not rows_batch:
+            break
+        batch = []
+        for line, task in rows_batch:
+            if task is None:
+                counts['invalid'] += 1
+                click.echo('line %s: invalid Task' % line, err=True)
+            else:
+                batch.append(task)
+        _, write_errors = db.insert_many(batch)
+        for write_error in write_errors.values():
+            if write_error.get('code') == DUPLICATE_KEY_ERROR:
+                counts['duplicated'] += 1
+            else:
+                counts['failed'] += 1
+        counts['imported'] += len(batch) - len(write_errors)
+
+    total = sum(counts.values())
+    click.echo(' '.join('%s=%s' % item for item in counts.items())
+               + ' ' + throughput(total, start), err=True)
+
+
+def guess_format(file_name):
+    """
+    Method that selects the format of a file by its extension.
+
+    :param file_name: Name of the file, or - for stdin and stdout.
+    :type file_name: str
+    :return: csv for .csv files, ndjson otherwise.
+    :rtype: str
+    """
+    return 'csv' if str(file_name).lower().endswith('.csv') else 'ndjson'
+
+
+def parse_row(description, status):
+    """
+    Method that validates the fields of a Task read from a file.
+
+    :param description: Description of the Task.
+    :type description: str
+    :param status: Status of the Task, as bool, or as text (true, false,
+    1, 0 or empty, for false).
+    :type status: bool or str
+    :return: Task with description and status, or None if a field is
+    invalid.
+    :rtype: dict
+    """
+    if isinstance(status, str):
+        status = {"true": True, "1": True, "false": False, "0": False,
+                  "": False}.get(status.strip().lower())
+    elif status is None:
+        status = False
+    if not isinstance(description, str) or not description \
+            or not isinstance(status, bool):
+        return None
+    return {"description": description, "status": status}
+
+
+def read_ndjson(source):
+    """
+    Method that reads the Tasks of a NDJSON file (one JSON object per
+    line), one line at a time.
+
+    :param source: File to be read.
+    :type source: io.TextIOBase
+    :return: Generator of the line number and the Task (None if the
+    line is invalid). Blank lines are skipped.
+    :rtype: generator
+    """
+    for line, text in enumerate(source, start=1):
+        if not text.strip():
+            continue
+        try:
+            row = json.loads(text)
+        except ValueError:
+            yield line, None
+            continue
+        if not isinstance(row, dict):
+            yield line, None
+            continue
+        yield line, parse_row(row.get('description'), row.get('status'))
+
+
+def read_csv(source):
+    """
+    Method that reads the Tasks of a CSV file, with a header with the
+    columns description and status (other columns are ignored), one row
+    at a time.
+
+    :param source: File to be read.
+    :type source: io.TextIOBase
+    :return: Generator of the line number and the Task (None if the
+    row is invalid).
+    :rtype: generator
+    """
+    reader = csv.DictReader(source)
+    for row in reader:
+        yield reader.line_num, parse_row(row.get('description'),
+                                         row.get('status'))
+
+
+def throughput(count, start):
+    """
+    Method that formats the elapsed time and the throughput of a
+    command.
+
+    :param count: Amount of Tasks processed.
+    :type count: int
+    :param start: Value of time.perf_counter() at the start.
+    :type start: float
+    :return: Elapsed seconds and Tasks per second.
+    :rtype: str
+    """
+    elapsed = time.perf_counter() - start
+    return 'seconds=%.3f tasks_per_second=%.0f' \
+        % (elapsed, count / elapsed if elapsed else 0)
@@ -0,0 +1,115 @@
+"""
+Application settings, read from the environment variables.
+"""
+import os
+
+
+def optional_int(name):
+    """
+    Method to read an optional integer environment variable.
+
+    :param name: Name of the environment variable.
+    :type name: str
+    :return: The value, or None if the variable is not defined.
+    :rtype: int
+    """
+    value = os.environ.get(name)
+    return None if value in (None, '') else int(value)
+
+
+def parse_flag(value, default=False):
+    """
+    Method to read a boolean from a text: 1, true, yes or on (ignoring
+    case) are true, and any other text is false.
+
+    :param value: Text, or None.
+    :type value: str
+    :param default: Value if the text is None or empty.
+    :type default: bool
+    :return: The value.
+    :rtype: bool
+    """
+    if value in (None, ''):
+        return default
+    return value.lower() in ('1', 'true', 'yes', 'on')
+
+
+def flag(name, default):
+    """
+    Method to read a boolean environment variable (see parse_flag).
+
+    :param name: Name of the environment variable.
+    :type name: str
+    :param default: Value if the variable is not defined.
+    :type default: bool
+    :return: The value.
+    :rtype: bool
+    """
+    return parse_flag(os.environ.get(name), default)
+
+
+class Config:
+    """
+    Default configuration of the application. Each setting can be
+    overridden by an environment variable with the same name.
+    """
+    TASK_BACKEND = os.environ.get('TASK_BACKEND') or None
+    TASK_MEMORY_SNAPSHOT = os.environ.get('TASK_MEMORY_SNAPSHOT') or None
+    TASK_MEMORY_SNAPSHOT_INTERVAL = float(
+        os.environ.get('TASK_MEMORY_SNAPSHOT_INTERVAL', 60))
+    TASK_ID_BLOCK_SIZE = int(os.environ.get('TASK_ID_BLOCK_SIZE', 100))
+    TASK_PAGE_SIZE = int(os.environ.get('TASK_PAGE_SIZE', 50))
+    TASK_PAGE_MAX_SIZE = int(os.environ.get('TASK_PAGE_MAX_SIZE', 500))
+    TASK_STREAM_BATCH_SIZE = int(os.environ.get('TASK_STREAM_BATCH_SIZE',
+                                                500))
+    TASK_IMPORT_BATCH_SIZE = int(os.environ.get('TASK_IMPORT_BATCH_SIZE',
+                                                1000))
+    TASK_CACHE_SIZE = int(os.environ.get('TASK_CACHE_SIZE', 0))
+    TASK_CACHE_TTL = float(os.environ.get('TASK_CACHE_TTL', 5))
+    TASK_PAGE_CACHE_SIZE = int(os.environ.get('TASK_PAGE_CACHE_SIZE', 64))
+    TASK_WRITE_BEHIND = flag('TASK_WRITE_BEHIND', False)
+    TASK_WRITE_BEHIND_INTERVAL = float(
+        os.environ.get('TASK_WRITE_BEHIND_INTERVAL', 1))
+    TASK_WRITE_BEHIND_MAX_PENDING = int(
+        os.environ.get('TASK_WRITE_BEHIND_MAX_PENDING', 100))
+    TASK_COUNTERS_FLUSH_INTERVAL = float(
+        os.environ.get('TASK_COUNTERS_FLUSH_INTERVAL', 1))
+    TASK_STATS_RECONCILE_INTERVAL = float(
+        os.environ.get('TASK_STATS_RECONCILE_INTERVAL', 300))
+    MONGO_MAX_POOL_SIZE = int(os.environ.get('MONGO_MAX_POOL_SIZE', 100))
+    MONGO_MIN_POOL_SIZE = int(os.environ.get('MONGO_MIN_POOL_SIZE', 0))
+    MONGO_WAIT_QUEUE_TIMEOUT_MS = optional_int('MONGO_WAIT_QUEUE_TIMEOUT_MS')
+    MONGO_SOCKET_TIMEOUT_MS = optional_int('MONGO_SOCKET_TIMEOUT_MS')
+    MONGO_CONNECT_TIMEOUT_MS = optional_int('MONGO_CONNECT_TIMEOUT_MS')
+    MONGO_SERVER_SELECTION_TIMEOUT_MS = \
+        optional_int('MONGO_SERVER_SELECTION_TIMEOUT_MS')
+    MONGO_SLOW_QUERY_MS = optional_int('MONGO_SLOW_QUERY_MS')
+    MONGO_SLOW_QUERY_LOG_SIZE = int(os.environ.get('MONGO_SLOW_QUERY_LOG_SIZE',
+                                                   100))
+    MONGO_EXPLAIN_SLOW_QUERIES = flag('MONGO_EXPLAIN_SLOW_QUERIES', False)
+    LOG_FILE = os.environ.get('LOG_FILE', 'logFile.log')
+    LOG_LEVEL = os.environ.get('LOG_LEVEL', 'DEBUG')
+    LOG_FORMAT = os.environ.get('LOG_FORMAT', 'text')
+    LOG_ASYNC = flag('LOG_ASYNC', False)
+    LOG_MAX_BYTES = int(os.environ.get('LOG_MAX_BYTES', 0))
+    LOG_BACKUP_COUNT = int(os.environ.get('LOG_BACKUP_COUNT', 5))
+    LOG_SAMPLING = os.environ.get('LOG_SAMPLING', '')
+    METRICS_ENABLED = flag('METRICS_ENABLED', True)
+    ADMISSION_MAX_CONCURRENCY = optional_int('ADMISSION_MAX_CONCURRENCY')
+    ADMISSION_QUEUE_DEPTH = optional_int('ADMISSION_QUEUE_DEPTH')
+    ADMISSION_TIMEOUT = float(os.environ.get('ADMISSION_TIMEOUT', 1))
+    ADMISSION_RETRY_AFTER = int(os.environ.get('ADMISSION_RETRY_AFTER', 1))
+    CIRCUIT_BREAKER_THRESHOLD = int(
+        os.environ.get('CIRCUIT_BREAKER_THRESHOLD', 5))
+    CIRCUIT_BREAKER_RESET_TIMEOUT = float(
+        os.environ.get('CIRCUIT_BREAKER_RESET_TIMEOUT', 10))
+    SERVER_BIND = os.environ.get('SERVER_BIND', '0.0.0.0:5000')
+    SERVER_WORKERS = optional_int('SERVER_WORKERS')
+    SERVER_THREADS = int(os.environ.get('SERVER_THREADS', 4))
+    SERVER_TIMEOUT = int(os.environ.get('SERVER_TIMEOUT', 30))
+    SERVER_GRACEFUL_TIMEOUT = int(os.environ.get('SERVER_GRACEFUL_TIMEOUT',
+                                                 30))
+    SERVER_KEEPALIVE = int(os.environ.get('SERVER_KEEPALIVE', 5))
+    SERVER_MAX_REQUESTS = int(os.environ.get('SERVER_MAX_REQUESTS', 0))
+    SERVER_MAX_REQUESTS_JITTER = int(
+        os.environ.get('SERVER_MAX_REQUESTS_JITTER', 0))
@@ -0,0 +1,383 @@
+"""
+JSON API methods and operations
+"""
+from flask import jsonify, request, url_for
+from pymongo.errors import DuplicateKeyError
+from src import app
+from src.controller.task_controller import db, decode_cursor, edge_cursor, \
+    list_query
+from src.model.task import Task
+from src.repository.store import DUPLICATE_KEY_ERROR
+
+
+def task_to_json(task):
+    """
+    Method that converts a Task document in the JSON representation of
+    the API.
+
+    :param task: Task document, or Task.
+    :type task: dict
+    :return: Task with id, description and status.
+    :rtype: dict
+    """
+    if isinstance(task, Task):
+        return {"id": task.id, "description": task.description,
+                "status": task.status}
+    return {"id": task.get('_id'), "description": task.get('description'),
+            "status": task.get('status')}
+
+
+def parse_task(data, partial=False):
+    """
+    Method that validates the fields of a Task received in the body of
+    a request.
+
+    :param data: Task received in the request.
+    :type data: dict
+    :param partial: If only the fields received must be validated
+    (update), instead of all of them (create).
+    :type partial: bool
+    :return: The validated fields, and a validation message if the Task
+    is invalid.
+    :rtype: tuple(dict, str)
+    """
+    if not isinstance(data, dict):
+        return None, 'A Tarefa deve ser um objeto JSON.'
+
+    fields = {}
+    if 'description' in data or not partial:
+        description = data.get('description')
+        if not isinstance(description, str) or not description:
+            return None, 'É necessário preencher a Descrição da Tarefa.'
+        fields['description'] = description
+    if 'status' in data or not partial:
+        status = data.get('status', False)
+        if not isinstance(status, bool):
+            return None, 'O Status da Tarefa deve ser true ou false.'
+        fields['status'] = status
+    if not fields:
+        return None, 'Nenhum campo da Tarefa foi informado.'
+    return fields, None
+
+
+def error_response(message, status_code):
+    """
+    Method that builds the JSON response of an error.
+
+    :param message: Message of the error.
+    :type message: str
+    :param status_code: HTTP status code.
+    :type status_code: int
+    :return: JSON response with the message.
+    :rtype: tuple(flask.Response, int)
+    """
+    return jsonify({"error": message}), status_code
+
+
+def repeated_message(task_id):
+    """
+    Method that builds the message of an item of a bulk operation whose
+    Identifier was already in the request.
+
+    :param task_id: Identifier of the Task.
+    :type task_id: int
+    :return: Message of the error.
+    :rtype: str
+    """
+    return 'A Tarefa %s está repetida na requisição.' % task_id
+
+
+def not_found_result(index):
+    """
+    Method that builds the result of an item of a bulk operation whose
+    Task does not exist.
+
+    :param index: Position of the item in the request.
+    :type index: int
+    :return: Result of the item.
+    :rtype: dict
+    """
+    return {"index": index, "status": 404, "error": 'Tarefa não encontrada.'}
+
+
+def write_error_result(index, write_error):
+    """
+    Method that converts a write error of a bulk operation in the
+    result of the item.
+
+    :param index: Position of the item in the request.
+    :type index: int
+    :param write_error: Write error returned by the database.
+    :type write_error: dict
+    :return: Result of the item.
+    :rtype: dict
+    """
+    if write_error.get('code') == DUPLICATE_KEY_ERROR:
+        return {"index": index, "status": 409,
+                "error": 'Já existe um registro de Tarefa com a mesma'
+                         ' descrição.'}
+    return {"index": index, "status": 500,
+            "error": write_error.get('errmsg')}
+
+
+@app.route('/api/v1/tasks', methods=['GET'])
+def api_find_all():
+    """
+    Method that returns one page of Tasks, selected by the query
+    parameters limit and after (cursor token of the next page), and
+    filtered and sorted by the query parameters status, description,
+    sort and order (see list_query).
+
+    :return: JSON with the Tasks and the cursor token of the next page.
+    :rtype: json
+    """
+    app.logger.info("Executing at ApiController - api_find_all()")
+    limit = request.args.get('limit', app.config['TASK_PAGE_SIZE'],
+                             type=int)
+    limit = min(max(limit, 1), app.config['TASK_PAGE_MAX_SIZE'])
+    _, parameters, sort_key, direction = list_query()
+    after = decode_cursor(request.args.get('after'), sort_key)
+
+    tasks, _, has_next = \
+        db.find_page(limit, after=after, parameters=parameters,
+                     sort_key=sort_key, direction=direction)
+    next_cursor = None
+    if tasks and has_next:
+        next_cursor = edge_cursor(tasks[-1], sort_key)
+
+    return jsonify({"tasks": [task_to_json(task) for task in tasks],
+                    "next": next_cursor})
+
+
+@app.route('/api/v1/tasks', methods=['POST'])
+def api_insert():
+    """
+    Method that creates a new Task.
+
+    :return: JSON with the Task created, and 201 in HTTP status code.
+    If the Task is invalid returns 400, and if the Description already
+    exists returns 409.
+    :rtype: json
+    """
+    app.logger.info("Executing at ApiController - api_insert()")
+    fields, message = parse_task(request.get_json(silent=True))
+    if message:
+        return error_response(message, 400)
+
+    task_id = db.next_id()
+    try:
+        db.insert_one(task_id, fields['description'], fields['status'])
+    except DuplicateKeyError:
+        return error_response('Já existe um registro de Tarefa com a'
+                              ' descrição ' + fields['description']
+                              + ' criado.', 409)
+
+    fields['_id'] = task_id
+    response = jsonify({"task": task_to_json(fields)})
+    response.headers['Location'] = url_for('api_find_by_id',
+                                           task_id=task_id)
+    return response, 201
+
+
+@app.route('/api/v1/tasks/<int:task_id>', methods=['GET'])
+def api_find_by_id(task_id):
+    """
+    Method that returns a Task by Identifier.
+
+    :param task_id: Identifier of the Task.
+    :type task_id: int
+    :return: JSON with the Task, or 404 if it does not exist.
+    :rtype: json
+    """
+    app.logger.info("Executing at ApiController -"
+                    " api_find_by_id(task_id=%s)", task_id)
+    task = db.find_one({"_id": task_id})
+    if task is None:
+        return error_response('Tarefa não encontrada.', 404)
+    return jsonify({"task": task_to_json(task)})
+
+
+@app.route('/api/v1/tasks/<int:task_id>', methods=['PUT', 'PATCH'])
+def api_update_by_id(task_id):
+    """
+    Method that updates the fields received of a Task by Identifier.
+
+    :param task_id: Identifier of the Task.
+    :type task_id: int
+    :return: 204 in HTTP status code. If the Task is invalid returns
+    400, if it does not exist 404, and if the Description already
+    exists 409.
+    :rtype: json
+    """
+    app.logger.info("Executing at ApiController -"
+                    " api_update_by_id(task_id=%s)", task_id)
+    fields, message = parse_task(request.get_json(silent=True),
+                                 partial=True)
+    if message:
+        return error_response(message, 400)
+
+    try:
+        result = db.update_one({"_id": task_id}, fields)
+    except DuplicateKeyError:
+        return error_response('Já existe um registro de Tarefa com a'
+                              ' descrição ' + fields['description']
+                              + ' criado.', 409)
+    if not result.matched_count:
+        return error_response('Tarefa não encontrada.', 404)
+    return '', 204
+
+
+@app.route('/api/v1/tasks/<int:task_id>', methods=['DELETE'])
+def api_delete_by_id(task_id):
+    """
+    Method that deletes a Task by Identifier.
+
+    :param task_id: Identifier of the Task.
+    :type task_id: int
+    :return: 204 in HTTP status code, or 404 if the Task does not
+    exist.
+    :rtype: json
+    """
+    app.logger.info("Executing at ApiController -"
+                    " api_delete_by_id(task_id=%s)", task_id)
+    if not db.delete_one({"_id": task_id}).deleted_count:
+        return error_response('Tarefa não encontrada.', 404)
+    return '', 204
+
+
+@app.route('/api/v1/tasks/bulk', methods=['POST'])
+def api_insert_many():
+    """
+    Method that creates many Tasks in a single database operation. The
+    body is a list of Tasks, and each one is created independently of
+    the others.
+
+    :return: JSON with the result of each Task, in the same order of
+    the request.
+    :rtype: json
+    """
+    app.logger.info("Executing at ApiController - api_insert_many()")
+    data = request.get_json(silent=True)
+    if not isinstance(data, list):
+        return error_response('O corpo da requisição deve ser uma lista'
+                              ' de Tarefas.', 400)
+
+    results = [None] * len(data)
+    tasks = []
+    positions = []
+    for index, item in enumerate(data):
+        fields, message = parse_task(item)
+        if message:
+            results[index] = {"index": index, "status": 400,
+                              "error": message}
+        else:
+            tasks.append(fields)
+            positions.append(index)
+
+    documents, write_errors = db.insert_many(tasks)
+    for position, (index, document) in enumerate(zip(positions,
+                                                     documents)):
+        if position in write_errors:
+            results[index] = write_error_result(index,
+                                                write_errors[position])
+        else:
+            results[index] = {"index": index, "status": 201,
+                              "id": document.get('_id')}
+
+    return jsonify({"results": results})
+
+
+@app.route('/api/v1/tasks/bulk', methods=['PATCH'])
+def api_update_many():
+    """
+    Method that updates many Tasks in a single database operation. The
+    body is a list of Tasks with id and the fields to be updated. The
+    results are derived from the operation: its write errors (409) and
+    the Tasks it did not find (404). An id repeated in the body is
+    answered with 400.
+
+    :return: JSON with the result of each Task, in the same order of
+    the request.
+    :rtype: json
+    """
+    app.logger.info("Executing at ApiController - api_update_many()")
+    data = request.get_json(silent=True)
+    if not isinstance(data, list):
+        return error_response('O corpo da requisição deve ser uma lista'
+                              ' de Tarefas.', 400)
+
+    results = [None] * len(data)
+    operations = []
+    positions = []
+    seen = set()
+    for index, item in enumerate(data):
+        fields, message = parse_task(item, partial=True)
+        task_id = item.get('id') if isinstance(item, dict) else None
+        if message is None and (not isinstance(task_id, int)
+                                or isinstance(task_id, bool)):
+            message = 'É necessário informar o id da Tarefa.'
+        if message is None and task_id in seen:
+            message = repeated_message(task_id)
+        if message:
+            results[index] = {"index": index, "status": 400,
+                              "error": message}
+        else:
+            seen.add(task_id)
+            operations.append((task_id, fields))
+            positions.append(index)
+
+    write_errors, missing = db.update_many(operations)
+    for position, index in enumerate(positions):
+        if position in write_errors:
+            results[index] = write_error_result(index,
+                                                write_errors[position])
+        elif position in missing:
+            results[index] = not_found_result(index)
+        else:
+            results[index] = {"index": index, "status": 200,
+                              "id": data[index].get('id')}
+
+    return jsonify({"results": results})
+
+
+@app.route('/api/v1/tasks/bulk', methods=['DELETE'])
+def api_delete_many():
+    """
+    Method that deletes many Tasks in a single database operation. The
+    body is a list of Identifiers. The Tasks not deleted by it are
+    answered with 404, and an Identifier repeated in the body with 400.
+
+    :return: JSON with the result of each Identifier, in the same order
+    of the request.
+    :rtype: json
+    """
+    app.logger.info("Executing at ApiController - api_delete_many()")
+    data = request.get_json(silent=True)
+    if not isinstance(data, list):
+        return error_response('O corpo da requisição deve ser uma lista'
+                              ' de Identificadores.', 400)
+
+    results = [None] * len(data)
+    seen = set()
+    for index, task_id in enumerate(data):
+        if not isinstance(task_id, int) or isinstance(task_id, bool):
+            results[index] = {"index": index, "status": 400,
+                              "error": 'Identificador inválido.'}
+        elif task_id in seen:
+            results[index] = {"index": index, "status": 400,
+                              "error": repeated_message(task_id)}
+        else:
+            seen.add(task_id)
+
+    deleted = set(db.delete_many([task_id for index, task_id
+                                  in enumerate(data)
+                                  if results[index] is None]))
+    for index, task_id in enumerate(data):
+        if results[index] is not None:
+            continue
+        if task_id in deleted:
+            results[index] = {"index": index, "status": 204, "id": task_id}
+        else:
+            results[index] = not_found_result(index)
+
+    return jsonify({"results": results})
@@ -0,0 +1,149 @@
+"""
+Asynchronous JSON API methods and operations
+"""
+from pymongo.errors import DuplicateKeyError
+from src import app
+from src.asgi import router
+from src.controller.api_controller import parse_task, task_to_json
+from src.controller import task_controller
+from src.controller.task_controller import decode_cursor, edge_cursor, \
+    list_query
+from src.repository.async_task_repository import AsyncTaskRepository
+
+
+# Shares the cache and the write-behind buffer of the Flask routes.
+db = AsyncTaskRepository(app, task_controller.db)
+
+
+@router.route(r'/api/v1/tasks', methods=['GET'])
+async def async_api_find_all(request):
+    """
+    Method that returns one page of Tasks, selected by the query
+    parameters limit and after (cursor token of the next page), and
+    filtered and sorted by the query parameters status, description,
+    sort and order (see list_query).
+
+    :param request: Request received.
+    :type request: src.asgi.AsyncRequest
+    :return: HTTP status code, and JSON with the Tasks and the cursor
+    token of the next page.
+    :rtype: tuple(int, dict)
+    """
+    app.logger.info("Executing at AsyncApiController - async_api_find_all()")
+    try:
+        limit = int(request.args.get('limit', app.config['TASK_PAGE_SIZE']))
+    except ValueError:
+        limit = app.config['TASK_PAGE_SIZE']
+    limit = min(max(limit, 1), app.config['TASK_PAGE_MAX_SIZE'])
+    _, parameters, sort_key, direction = list_query(request.args)
+    after = decode_cursor(request.args.get('after'), sort_key)
+
+    tasks, has_next = await db.find_page(limit, after=after,
+                                         parameters=parameters,
+                                         sort_key=sort_key,
+                                         direction=direction)
+    next_cursor = None
+    if tasks and has_next:
+        next_cursor = edge_cursor(tasks[-1], sort_key)
+
+    return 200, {"tasks": [task_to_json(task) for task in tasks],
+                 "next": next_cursor}
+
+
+@router.route(r'/api/v1/tasks', methods=['POST'])
+async def async_api_insert(request):
+    """
+    Method that creates a new Task.
+
+    :param request: Request received.
+    :type request: src.asgi.AsyncRequest
+    :return: 201 and JSON with the Task created. If the Task is invalid
+    returns 400, and if the Description already exists returns 409.
+    :rtype: tuple(int, dict)
+    """
+    app.logger.info("Executing at AsyncApiController - async_api_insert()")
+    fields, message = parse_task(request.get_json())
+    if message:
+        return 400, {"error": message}
+
+    task_id = await db.next_id()
+    try:
+        await db.insert_one(task_id, fields['description'],
+                            fields['status'])
+    except DuplicateKeyError:
+        return 409, {"error": 'Já existe um registro de Tarefa com a'
+                              ' descrição ' + fields['description']
+                              + ' criado.'}
+
+    fields['_id'] = task_id
+    return 201, {"task": task_to_json(fields)}
+
+
+@router.route(r'/api/v1/tasks/(?P<task_id>\d+)', methods=['GET'])
+async def async_api_find_by_id(request, task_id):
+    """
+    Method that returns a Task by Identifier.
+
+    :param request: Request received.
+    :type request: src.asgi.AsyncRequest
+    :param task_id: Identifier of the Task.
+    :type task_id: str
+    :return: 200 and JSON with the Task, or 404 if it does not exist.
+    :rtype: tuple(int, dict)
+    """
+    app.logger.info("Executing at AsyncApiController -"
+                    " async_api_find_by_id(task_id=%s)", task_id)
+    task = await db.find_one({"_id": int(task_id)})
+    if task is None:
+        return 404, {"error": 'Tarefa não encontrada.'}
+    return 200, {"task": task_to_json(task)}
+
+
+@router.route(r'/api/v1/tasks/(?P<task_id>\d+)', methods=['PUT', 'PATCH'])
+async def async_api_update_by_id(request, task_id):
+    """
+    Method that updates the fields received of a Task by Identifier.
+
+    :param request: Request received.
+    :type request: src.asgi.AsyncRequest
+    :param task_id: Identifier of the Task.
+    :type task_id: str
+    :return: 204. If the Task is invalid returns 400, if it does not
+    exist 404, and if the Description already exists 409.
+    :rtype: tuple(int, dict)
+    """
+    app.logger.info("Executing at AsyncApiController -"
+                    " async_api_update_by_id(task_id=%s)", task_id)
+    fields, message = parse_task(request.get_json(), partial=True)
+    if message:
+        return 400, {"error": message}
+
+    try:
+        result = await db.update_one({"_id": int(task_id)}, fields)
+    except DuplicateKeyError:
+        return 409, {"error": 'Já existe um registro de Tarefa com a'
+                              ' descrição ' + fields['description']
+                              + ' criado.'}
+    if not result.matched_count:
+        return 404, {"error": 'Tarefa não encontrada.'}
+    return 204, None
+
+
+@router.route(r'/api/v1/tasks/(?P<task_id>\d+)', methods=['DELETE'])
+async def async_api_delete_by_id(request, task_id):
+    """
+    Method that deletes a Task by Identifier.
+
+    :param request: Request received.
+    :type request: src.asgi.AsyncRequest
+    :param task_id: Identifier of the Task.
+    :type task_id: str
+    :return: 204, or 404 if the Task does not exist.
+    :rtype: tuple(int, dict)
+    """
+    app.logger.info("Executing at AsyncApiController -"
+                    " async_api_delete_by_id(task_id=%s)", task_id)
+    result = await db.delete_one({"_id": int(task_id)})
+    if not result.deleted_count:
+        return 404, {"error": 'Tarefa não encontrada.'}
+    return 204, None
@@ -0,0 +1,49 @@
+"""
+Metrics methods and operations
+"""
+from flask import Response, abort, jsonify
+from src import app
+from src.controller.task_controller import db, page_cache
+from src.metrics import metrics
+from src.repository.connection import connections
+
+
+@app.route('/metrics', methods=['GET'])
+def find_metrics():
+    """
+    Method that returns the latency metrics of this process (requests,
+    templates and repository operations) and the counters of the
+    caches, in the Prometheus text format.
+
+    :return: Metrics in the Prometheus text format.
+    :rtype: text
+    """
+    lines = []
+    caches = (('task', db.cache.stats()), ('page', page_cache.stats()))
+    for counter in ('hits', 'misses'):
+        lines.append(f'# TYPE task_cache_{counter}_total counter')
+        for name, stats in caches:
+            lines.append(f'task_cache_{counter}_total{{cache="{name}"}}'
+                         f' {stats.get(counter)}')
+
+    return Response(metrics.render() + '\n'.join(lines) + '\n',
+                    mimetype='text/plain; version=0.0.4')
+
+
+@app.route('/debug/slow-queries', methods=['GET'])
+def find_slow_queries():
+    """
+    Method that returns what the command monitor of this process
+    recorded: the duration by command, the last slow commands (with the
+    shape of their queries, without values) and the summary of the
+    plans of the slow find shapes.
+
+    :return: JSON with the report of the command monitor, or 404 if
+    MONGO_SLOW_QUERY_MS is not defined.
+    :rtype: json
+    """
+    app.logger.info("Executing at MetricsController - find_slow_queries()")
+    monitor = connections.monitor
+    if monitor is None:
+        abort(404)
+    return jsonify(monitor.report())
@@ -0,0 +1,52 @@
+"""
+Search methods and operations
+"""
+from flask import jsonify, render_template, request
+from src import app
+from src.controller.api_controller import error_response, task_to_json
+from src.controller.task_controller import db
+
+
+@app.route('/search', methods=['GET'])
+def search():
+    """
+    Method that searches the Tasks by the words of their descriptions
+    (query parameter q), ranked by relevance, one page at a time (query
+    parameters page and limit). Returns JSON if the client accepts JSON
+    rather than HTML.
+
+    :return: Renders the page with the Tasks found, or JSON with the
+    Tasks, their scores and the number of the next page. Without a
+    search, renders only the form (or returns 400 in JSON), and if the
+    page is invalid returns 400.
+    :rtype: html or json
+    """
+    app.logger.info("Executing at SearchController - search()")
+    text = request.args.get('q', '').strip()
+    page = request.args.get('page', 1, type=int)
+    limit = request.args.get('limit', app.config['TASK_PAGE_SIZE'],
+                             type=int)
+    limit = min(max(limit, 1), app.config['TASK_PAGE_MAX_SIZE'])
+    wants_json = request.accept_mimetypes.best_match(
+        ['text/html', 'application/json']) == 'application/json'
+
+    if not text or page < 1:
+        if wants_json:
+            return error_response('É necessário informar o texto da busca'
+                                  ' e uma página válida.', 400)
+        if page < 1:
+            return render_template('search.html', text=text, tasks=[],
+                                   limit=limit, page=1, has_next=False,
+                                   message='Página inválida.'), 400
+        return render_template('search.html', text=text, tasks=[],
+                               limit=limit, page=1, has_next=False)
+
+    tasks, has_next = db.search(text, limit, page)
+    if wants_json:
+        return jsonify({"tasks": [dict(task_to_json(task),
+                                       score=task.get('score'))
+                                  for task in tasks],
+                        "page": page,
+                        "next": page + 1 if has_next else None})
+    return render_template('search.html', text=text, tasks=tasks,
+                           limit=limit, page=page, has_next=has_next)
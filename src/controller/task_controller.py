@@ -1,59 +1,302 @@
 """
 Controller/View methods and operations
 """
-from flask import render_template, request, url_for, redirect
+import base64
+import binascii
+import json
+from flask import render_template, request, url_for, redirect, abort, \
+    Response, stream_with_context, get_template_attribute
+from pymongo.errors import DuplicateKeyError
 from src import app
+from src.config import parse_flag
+from src.model.task import Task
 from src.repository.task_repository import TaskRepository
+from src.repository.task_cache import TaskCache
 
 
 db = TaskRepository(app)
+page_cache = TaskCache(app.config['TASK_PAGE_CACHE_SIZE'], 0)
+
+# Values of the query parameter sort, and the field of each one.
+SORT_FIELDS = {"id": '_id', "description": 'description', "status": 'status'}
 
 
 @app.route('/')
 @app.route('/index', methods=['GET'])
 def index():
     """
-    Returns the initial HTML page of application.
+    Returns the initial HTML page of application, with the statistics
+    of the Tasks.
 
     :return: Renders the index.html file.
     :rtype: html
     """
     app.logger.info("Executing at TaskController - index()")
-    return render_template('index.html')
+    return render_template('index.html', stats=db.stats())
 
 
 @app.route('/find-all', methods=['GET'])
 def find_all():
     """
-    Method that query all the registers in the database and returns all
-    the data.
-
-    :return: Renders the page with the list of all Tasks stored in the
-    database.
+    Method that query one page of registers in the database and returns
+    the data. The page is selected by the query parameters limit, and
+    after or before (cursor tokens of the next and previous pages).
+    The Tasks can be filtered by the query parameters status (true or
+    false) and description (prefix), and sorted by the query parameters
+    sort (id, description or status) and order (asc or desc).
+    With the query parameter stream, all the registers are sent, while
+    they are read from the database.
+    Pages are tagged with the version of the collection (ETag): while
+    it does not change, the rendered page is reused, and clients that
+    already have it receive 304. Reading the version costs one read of
+    the counter in MongoDB per request, or per
+    TASK_COUNTERS_FLUSH_INTERVAL if it is positive (see
+    TaskRepository.version).
+
+    :return: Renders the page with the list of Tasks stored in the
+    database, and the links to the next and previous pages.
     :rtype: html
     """
 
     app.logger.info("Executing at TaskController - find_all()")
-    tasks = db.find({}, {"_id": True, "description": True,
-                         "status": True}).sort("_id", 1)
-    return render_template('list.html', tasks=tasks)
+    query, parameters, sort_key, direction = list_query()
+    if request.args.get('stream'):
+        tasks = db.find_tasks(parameters, sort_key, direction,
+                              app.config['TASK_STREAM_BATCH_SIZE'])
+        return Response(stream_with_context(
+            stream_template('list.html', tasks=tasks, query=query)))
+
+    limit = request.args.get('limit', app.config['TASK_PAGE_SIZE'],
+                             type=int)
+    limit = min(max(limit, 1), app.config['TASK_PAGE_MAX_SIZE'])
+    after = decode_cursor(request.args.get('after'), sort_key)
+    before = decode_cursor(request.args.get('before'), sort_key)
+    page = (limit, after, before, query, parameters, sort_key, direction)
+
+    version = db.version()
+    if version is None:
+        return render_list_page(*page)
+
+    if request.if_none_match.contains(version):
+        response = Response(status=304)
+    else:
+        key = (version, limit, after, before, tuple(sorted(query.items())))
+        cached = page_cache.get(key)
+        if cached is None:
+            cached = {"body": render_list_page(*page)}
+            page_cache.set(key, cached)
+        response = Response(cached.get('body'))
+    response.set_etag(version)
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
+
+
+def list_query(args=None):
+    """
+    Method that reads the filter and sort query parameters of a list of
+    Tasks (status, description, sort and order). Aborts the request
+    with 400 if a value is invalid.
+
+    :param args: Query parameters, or None for the ones of the current
+    Flask request.
+    :type args: dict
+    :return: The filter and sort query parameters received, to be kept
+    in the pagination links, the constraints of the query, the sort key
+    and the direction.
+    :rtype: tuple(dict, dict, str, int)
+    """
+    if args is None:
+        args = request.args
+    query = {name: args.get(name)
+             for name in ('status', 'description', 'sort', 'order')
+             if args.get(name)}
+
+    if query.get('status', 'true') not in ('true', 'false') \
+            or query.get('sort', 'id') not in SORT_FIELDS \
+            or query.get('order', 'asc') not in ('asc', 'desc'):
+        abort(400)
+
+    status = None
+    if 'status' in query:
+        status = query.get('status') == 'true'
+    parameters = db.task_filters(status, query.get('description'))
+    return query, parameters, SORT_FIELDS[query.get('sort', 'id')], \
+        -1 if query.get('order') == 'desc' else 1
+
+
+def render_list_page(limit, after, before, query=None, parameters=None,
+                     sort_key='_id', direction=1):
+    """
+    Method that query one page of registers in the database, and
+    renders the list page with them.
+
+    :param limit: Max amount of Tasks in the page.
+    :type limit: int
+    :param after: Edge after which the page starts (see decode_cursor).
+    :type after: int or tuple
+    :param before: Edge before which the page ends.
+    :type before: int or tuple
+    :param query: Filter and sort query parameters, kept in the
+    pagination links.
+    :type query: dict
+    :param parameters: Constraints of the query.
+    :type parameters: dict
+    :param sort_key: Field of the sort.
+    :type sort_key: str
+    :param direction: 1 (ascending) or -1 (descending).
+    :type direction: int
+    :return: The rendered page.
+    :rtype: str
+    """
+    tasks, has_previous, has_next = \
+        db.find_page(limit, after=after, before=before,
+                     parameters=parameters, sort_key=sort_key,
+                     direction=direction)
+
+    previous_cursor = None
+    next_cursor = None
+    if tasks and has_previous:
+        previous_cursor = edge_cursor(tasks[0], sort_key)
+    if tasks and has_next:
+        next_cursor = edge_cursor(tasks[-1], sort_key)
+
+    return render_template('list.html', tasks=tasks, limit=limit,
+                           query=query or {},
+                           previous_cursor=previous_cursor,
+                           next_cursor=next_cursor)
+
+
+def stream_template(template_name, **context):
+    """
+    Method that renders a template in chunks, so the first rows are sent
+    to the client before the last ones are read from the database.
+
+    :param template_name: Name of the template file.
+    :type template_name: str
+    :param context: Variables of the template.
+    :type context: dict
+    :return: Generator of the rendered HTML chunks.
+    :rtype: jinja2.environment.TemplateStream
+    """
+    app.update_template_context(context)
+    stream = app.jinja_env.get_template(template_name).stream(context)
+    stream.enable_buffering(64)
+    return stream
+
+
+def encode_cursor(*values):
+    """
+    Method that converts the edge of a page into an opaque cursor token,
+    to be used in the pagination links.
+
+    :param values: Identifier of the Task in the edge of the page, or,
+    if the sort key is not the Identifier, its value and the Identifier.
+    :type values: tuple
+    :return: URL safe cursor token.
+    :rtype: str
+    """
+    return base64.urlsafe_b64encode(json.dumps(list(values)).encode())\
+        .decode().rstrip('=')
+
+
+def edge_cursor(task, sort_key='_id'):
+    """
+    Method that converts the Task in the edge of a page into the cursor
+    token of the page after (or before) it.
+
+    :param task: Task in the edge of the page.
+    :type task: dict
+    :param sort_key: Field of the sort.
+    :type sort_key: str
+    :return: URL safe cursor token.
+    :rtype: str
+    """
+    if sort_key == '_id':
+        return encode_cursor(task.get('_id'))
+    return encode_cursor(task.get(sort_key), task.get('_id'))
+
+
+def decode_cursor(token, sort_key='_id'):
+    """
+    Method that converts a cursor token back into the edge of the page.
+    Aborts the request with 400 if the token is invalid.
+
+    :param token: Cursor token received in the query parameters.
+    :type token: str
+    :param sort_key: Field of the sort.
+    :type sort_key: str
+    :return: Identifier of the Task in the edge of the page, or, if the
+    sort key is not the Identifier, its value and the Identifier. None
+    if no token was received.
+    :rtype: int or tuple
+    """
+    if not token:
+        return None
+    try:
+        padding = '=' * (-len(token) % 4)
+        values = json.loads(base64.urlsafe_b64decode(token + padding))
+    except (ValueError, TypeError, binascii.Error):
+        abort(400)
+    if not isinstance(values, list) \
+            or len(values) != (1 if sort_key == '_id' else 2):
+        abort(400)
+
+    task_id = values[-1]
+    if not isinstance(task_id, int) or isinstance(task_id, bool):
+        abort(400)
+    if sort_key == '_id':
+        return task_id
+
+    value_type = bool if sort_key == 'status' else str
+    if not isinstance(values[0], value_type):
+        abort(400)
+    return values[0], task_id
+
+
+def wants_fragment():
+    """
+    Method that checks if the request asks for a fragment (query or form
+    parameter fragment, read as the boolean settings: 1, true, yes or
+    on) instead of the redirect to the list page. The fragment is the
+    row of the changed Task, so a change costs a single request, and
+    renders a single row.
+
+    :return: If a fragment is requested.
+    :rtype: bool
+    """
+    return parse_flag(request.values.get('fragment'))
+
+
+def render_row(task, status=200):
+    """
+    Method that renders the row of a Task in the list page, from the
+    macro shared with list.html.
+
+    :param task: Task document, or Task.
+    :type task: dict
+    :param status: HTTP status of the response.
+    :type status: int
+    :return: Response with the rendered row, or 404 if there is no
+    Task.
+    :rtype: flask.Response
+    """
+    if task is None:
+        abort(404)
+    task_row = get_template_attribute('task_row.html', 'task_row')
+    return Response(task_row(Task.from_document(task)), status=status)
 
 
 def find_next_available_id():
     """
     Method that returns the next Identifier available to be used.
-    Query the max Identifier in the Database, and increase one more.
+    The Identifier is allocated by the repository, from an atomic
+    counter, so concurrent workers never receive the same value.
 
     :return: Integer Identifier available to be use.
     :rtype: int
     """
     app.logger.info("Executing at TaskController - find_next_available_id()")
-    query = db.find({}, {"_id": True}).sort("_id", -1).limit(1)
-
-    for obj in query:
-        return obj.get('_id') + 1
-    else:
-        return 1
+    return db.next_id()
 
 
 @app.route('/insert', methods=['GET', 'POST'])
@@ -63,8 +306,9 @@ def insert():
     already exists and returns or redirect the HTML page.
 
     :return: If a POST HTTP request called it, and no validation error
-    happens, returns the page with all registers. If not, renders the
-    page of insert a new Task.
+    happens, returns the page with all registers, or the row of the
+    Task in fragment mode (201 if it was created). If not, renders the
+    page of insert a new Task (400 in fragment mode).
     :rtype: html
     """
     app.logger.info("Executing at TaskController - insert()")
@@ -78,20 +322,17 @@ def insert():
             status = True
 
         if description:
-            task_exists = db.find_one({"description": description})
-            if task_exists:
-                db.update_one({"_id": task_exists.get('_id')},
-                              {"status": status})
-            else:
-                db.insert_one(find_next_available_id(), description,
-                              status)
+            task, previous = db.upsert_by_description(description, status)
         else:
             return render_template('insert.html',
                                    message='É necessário preencher a'
                                            ' Descrição da Tarefa.'
                                            '  Preencha o campo'
-                                           ' Descrição.')
+                                           ' Descrição.'), \
+                400 if wants_fragment() else 200
 
+        if wants_fragment():
+            return render_row(task, 201 if previous is None else 200)
         return redirect(url_for('find_all'))
     else:
         return render_template('insert.html')
@@ -105,12 +346,15 @@ def delete_by_id(task_id):
 
     :param task_id: Identifier of the Task.
     :type task_id: int
-    :return: HTML page with the list all Tasks.
+    :return: HTML page with the list all Tasks, or 204 in fragment
+    mode.
     :rtype: html
     """
-    app.logger.info(f"Executing at TaskController -"
-                    f" delete_by_id(task_id={task_id})")
+    app.logger.info("Executing at TaskController -"
+                    " delete_by_id(task_id=%s)", task_id)
     db.delete_one({"_id": task_id})
+    if wants_fragment():
+        return Response(status=204)
     return redirect(url_for('find_all'))
 
 
@@ -124,36 +368,42 @@ def update_by_id(task_id):
     :type task_id: int
     :return: If a POST or PUT HTTP method request called the method,
     and the process is executed with success, renders the HTML page
-    with the list of all Tasks. If not, returns the HTML page with
-    the form to update, with validation messages or not.
+    with the list of all Tasks, or the row of the Task in fragment
+    mode. If not, returns the HTML page with the form to update, with
+    validation messages or not (400 or 409 in fragment mode).
     :rtype: html
     """
-    app.logger.info(f"Executing at TaskController -"
-                    f" update_by_id(task_id={task_id})")
-    task = db.find_one({"_id": task_id})
+    app.logger.info("Executing at TaskController -"
+                    " update_by_id(task_id=%s)", task_id)
     description = request.form.get('description')
+    fragment = wants_fragment()
 
     if request.method == 'POST' or request.method == 'PUT':
         if description:
-            task_exists = db.find_one({"description": description})
-            if task_exists and (task_exists.get('_id') != task.get('_id')):
+            try:
+                task = db.update_task(task_id, {"description": description})
+            except DuplicateKeyError:
                 return \
-                    render_template('update.html', task=task,
+                    render_template('update.html',
+                                    task=db.find_one({"_id": task_id}),
                                     message='Já existe um registro de Tarefa'
                                             ' com a descrição '
-                                            + task_exists.get('description')
+                                            + description
                                             + ' criado. Escolha outra '
-                                              ' Descrição.')
-            else:
-                db.update_one({"_id": task_id}, {"description": description})
+                                              ' Descrição.'), \
+                    409 if fragment else 200
         else:
-            return render_template('update.html', task=task,
+            return render_template('update.html',
+                                   task=db.find_one({"_id": task_id}),
                                    message='É necessário preencher a'
                                            ' Descrição da Tarefa.'
                                            ' Preencha o campo'
-                                           ' Descrição.')
+                                           ' Descrição.'), \
+                400 if fragment else 200
+        if fragment:
+            return render_row(task)
         return redirect(url_for('find_all'))
-    return render_template('update.html', task=task)
+    return render_template('update.html', task=db.find_one({"_id": task_id}))
 
 
 @app.route('/change-status-by-id/<int:task_id>', methods=['GET', 'PUT'])
@@ -164,20 +414,13 @@ def change_status_by_id(task_id):
 
     :param task_id: Identifier of the Task
     :type task_id: int
-    :return: Renders the HTML page with the list of all Tasks.
+    :return: Renders the HTML page with the list of all Tasks, or the
+    row of the Task in fragment mode (404 if it does not exist).
     :rtype: html
     """
-    app.logger.info(f"Executing at TaskController -"
-                    f" change_status_by_id(task_id={task_id})")
-    task = db.find_one({"_id": task_id})
-    task_id = task.get('_id')
-    task_status = task.get('status')
-
-    if task_status:
-        task_status = False
-    else:
-        task_status = True
-
-    db.update_one({"_id": task_id}, {"status": task_status})
-
+    app.logger.info("Executing at TaskController -"
+                    " change_status_by_id(task_id=%s)", task_id)
+    task = db.toggle_task(task_id)
+    if wants_fragment():
+        return render_row(task)
     return redirect(url_for('find_all'))
@@ -0,0 +1,108 @@
+"""
+Background jobs of the application
+"""
+import threading
+from src.repository.connection import backend_name
+
+
+class RepeatingTimer:
+    """
+    Class to execute a function periodically in a daemon thread, until
+    it is stopped. Errors of an execution are logged, and do not stop
+    the next ones.
+    """
+    def __init__(self, interval, function, logger, name=None):
+        """
+        :param interval: Seconds between the executions.
+        :type interval: float
+        :param function: Function to be executed, without arguments.
+        :type function: function
+        :param logger: Logger of the errors.
+        :type logger: logging.Logger
+        :param name: Name of the thread.
+        :type name: str
+        """
+        self.interval = interval
+        self.function = function
+        self.logger = logger
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._run, name=name,
+                                        daemon=True)
+
+    def start(self):
+        """
+        Method to start the executions.
+        :return: The timer itself.
+        :rtype: RepeatingTimer
+        """
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """
+        Method to stop the executions, after the current one.
+        """
+        self._stopped.set()
+
+    def _run(self):
+        while not self._stopped.wait(self.interval):
+            try:
+                self.function()
+            except Exception:
+                self.logger.exception('RepeatingTimer - %s failed',
+                                      self._thread.name)
+
+
+def start_jobs(app, db):
+    """
+    Method to start the background jobs configured by the application,
+    in the current process. Must be executed after the fork, in each
+    worker process.
+
+    :param app: Flask application.
+    :type app: flask.Flask
+    :param db: Repository of the Tasks.
+    :type db: TaskRepository
+    :return: The timers started.
+    :rtype: list
+    """
+    timers = []
+    if app.config['TASK_WRITE_BEHIND']:
+        timers.append(RepeatingTimer(
+            app.config['TASK_WRITE_BEHIND_INTERVAL'],
+            db.flush_status_buffer, app.logger,
+            name='flush-status-buffer').start())
+    if app.config['TASK_COUNTERS_FLUSH_INTERVAL'] > 0:
+        timers.append(RepeatingTimer(
+            app.config['TASK_COUNTERS_FLUSH_INTERVAL'], db.flush_counters,
+            app.logger, name='flush-counters').start())
+    if backend_name(app) == 'memory' and app.config['TASK_MEMORY_SNAPSHOT'] \
+            and app.config['TASK_MEMORY_SNAPSHOT_INTERVAL'] > 0:
+        timers.append(RepeatingTimer(
+            app.config['TASK_MEMORY_SNAPSHOT_INTERVAL'], db.save_snapshot,
+            app.logger, name='save-snapshot').start())
+    interval = app.config['TASK_STATS_RECONCILE_INTERVAL']
+    if interval > 0:
+        timers.append(RepeatingTimer(
+            interval, lambda: reconcile_stats_once(db, interval),
+            app.logger, name='reconcile-stats').start())
+    return timers
+
+
+def reconcile_stats_once(db, interval):
+    """
+    Method to compute the statistics of the Tasks again, if no other
+    worker process did it in this interval. The lease is a little
+    shorter than the interval, so the process that holds it takes it
+    again on its next execution.
+
+    :param db: Repository of the Tasks.
+    :type db: TaskRepository
+    :param interval: Seconds between the executions.
+    :type interval: float
+    :return: The statistics, or None if another process computes them.
+    :rtype: dict
+    """
+    if not db.acquire_lease('reconcile_stats_lease', interval * 0.9):
+        return None
+    return db.reconcile_stats()
@@ -0,0 +1,198 @@
+"""
+Logging configuration of the application.
+"""
+import atexit
+import json
+import logging
+import os
+import queue
+import random
+import time
+from logging.handlers import QueueHandler, QueueListener, \
+    RotatingFileHandler, WatchedFileHandler
+
+TEXT_FORMAT = '%(asctime)s %(levelname)s %(name)s %(threadName)s:' \
+              ' %(message)s'
+
+
+class JsonFormatter(logging.Formatter):
+    """
+    Class to format each log record as a JSON line, with the same fields
+    of the text format (timestamp, level, logger and thread).
+    """
+    def format(self, record):
+        """
+        Method to format a log record.
+        :param record: Log record.
+        :type record: logging.LogRecord
+        :return: JSON line.
+        :rtype: str
+        """
+        document = {"timestamp": self.formatTime(record),
+                    "level": record.levelname,
+                    "logger": record.name,
+                    "thread": record.threadName,
+                    "message": record.getMessage()}
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            document["exception"] = record.exc_text
+        return json.dumps(document, ensure_ascii=False)
+
+    def formatTime(self, record, datefmt=None):
+        """
+        Method to format the time of a log record in ISO 8601, with
+        milliseconds and timezone.
+        :param record: Log record.
+        :type record: logging.LogRecord
+        :return: Formatted time.
+        :rtype: str
+        """
+        return time.strftime('%Y-%m-%dT%H:%M:%S',
+                             time.localtime(record.created)) \
+            + '.%03d' % record.msecs \
+            + time.strftime('%z', time.localtime(record.created))
+
+
+class SamplingFilter(logging.Filter):
+    """
+    Class to keep only a fraction of the records below WARNING of some
+    loggers. Records dropped are never formatted.
+    """
+    def __init__(self, rates, randomizer=random.random):
+        """
+        :param rates: Fraction of records kept, by logger name. A rate
+        applies to the logger and its children.
+        :type rates: dict
+        :param randomizer: Function returning a number between 0 and 1.
+        :type randomizer: function
+        """
+        super().__init__()
+        self.rates = rates
+        self.randomizer = randomizer
+
+    def filter(self, record):
+        """
+        :param record: Log record.
+        :type record: logging.LogRecord
+        :return: If the record must be kept.
+        :rtype: bool
+        """
+        if record.levelno >= logging.WARNING:
+            return True
+        name = record.name
+        while name:
+            if name in self.rates:
+                return self.randomizer() < self.rates[name]
+            name = name.rpartition('.')[0]
+        return True
+
+
+def parse_sampling(value):
+    """
+    Method to read the sampling rates from the configuration, in the
+    format "logger=rate,logger=rate".
+
+    :param value: Sampling rates.
+    :type value: str
+    :return: Fraction of records kept, by logger name.
+    :rtype: dict
+    """
+    rates = {}
+    for item in (value or '').split(','):
+        if item.strip():
+            name, _, rate = item.partition('=')
+            rates[name.strip()] = float(rate)
+    return rates
+
+
+def restart_listener(listener):
+    """
+    Method to start again, if it was running, the thread of a listener
+    inherited from the parent process. Threads do not survive a fork,
+    so without it the records queued by a worker process would never be
+    written.
+
+    :param listener: Listener started before the fork.
+    :type listener: logging.handlers.QueueListener
+    """
+    if listener._thread is not None:
+        listener._thread = None
+        listener.start()
+
+
+def create_file_handler(app, processes=1):
+    """
+    Method to create the handler of the log file. A single process
+    rotates the file by size. When many processes write the same file,
+    one of them rotating it would leave the others writing to the
+    rotated file, so the rotation is left to logrotate (or docker) and
+    each process opens the file again when it is moved.
+
+    :param app: Flask application.
+    :type app: flask.Flask
+    :param processes: Amount of processes writing the file.
+    :type processes: int
+    :return: Handler of the log file.
+    :rtype: logging.FileHandler
+    """
+    if processes > 1:
+        return WatchedFileHandler(app.config['LOG_FILE'], encoding='utf-8')
+    if app.config['LOG_MAX_BYTES'] > 0:
+        return RotatingFileHandler(
+            app.config['LOG_FILE'], maxBytes=app.config['LOG_MAX_BYTES'],
+            backupCount=app.config['LOG_BACKUP_COUNT'], encoding='utf-8')
+    return logging.FileHandler(app.config['LOG_FILE'], encoding='utf-8')
+
+
+def configure_logging(app, processes=1):
+    """
+    Method to configure the root logger from the configuration of the
+    application: level, file, text or JSON format, size based rotation
+    (see create_file_handler) and sampling. With LOG_ASYNC, records are
+    put in a queue and written to the file by a background thread, so
+    requests never wait for the disk; the thread is started again in
+    each forked worker process.
+
+    :param app: Flask application.
+    :type app: flask.Flask
+    :param processes: Amount of processes of the server, writing the
+    same file.
+    :type processes: int
+    :return: The listener writing the queued records, or None if the
+    logging is synchronous.
+    :rtype: logging.handlers.QueueListener
+    """
+    file_handler = create_file_handler(app, processes)
+
+    if app.config['LOG_FORMAT'] == 'json':
+        file_handler.setFormatter(JsonFormatter())
+    else:
+        file_handler.setFormatter(
+            logging.Formatter(TEXT_FORMAT, datefmt='%Y-%m-%d %H:%M:%S'))
+
+    listener = None
+    handler = file_handler
+    if app.config['LOG_ASYNC']:
+        records = queue.SimpleQueue()
+        listener = QueueListener(records, file_handler,
+                                 respect_handler_level=True)
+        handler = QueueHandler(records)
+        listener.start()
+        atexit.register(listener.stop)
+        if hasattr(os, 'register_at_fork'):
+            os.register_at_fork(
+                after_in_child=lambda: restart_listener(listener))
+
+    rates = parse_sampling(app.config['LOG_SAMPLING'])
+    if rates:
+        handler.addFilter(SamplingFilter(rates))
+
+    root = logging.getLogger()
+    root.setLevel(app.config['LOG_LEVEL'])
+    root.addHandler(handler)
+    if processes > 1 and app.config['LOG_MAX_BYTES'] > 0:
+        logging.getLogger(__name__).warning(
+            'LOG_MAX_BYTES is ignored with %s processes: rotate %s with'
+            ' logrotate', processes, app.config['LOG_FILE'])
+    return listener
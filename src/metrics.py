@@ -0,0 +1,334 @@
+"""
+Latency metrics of the requests, templates and repository operations.
+"""
+import functools
+import inspect
+import threading
+import time
+from bisect import bisect_left
+from flask import g, request
+from flask.signals import before_render_template, signals_available, \
+    template_rendered
+from src.admission import admission
+
+BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25,
+           0.5, 1.0, 2.5, 5.0, 10.0)
+QUANTILES = (0.5, 0.95, 0.99)
+
+
+class Histogram:
+    """
+    Class to count observations of a duration in fixed buckets. Keeps
+    the count, sum and errors, and estimates quantiles from the buckets,
+    so each observation costs the same regardless of the amount.
+    """
+    def __init__(self, buckets=BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.errors = 0
+        self._lock = threading.Lock()
+
+    def observe(self, seconds, error=False):
+        """
+        Method to count an observation.
+        :param seconds: Duration observed.
+        :type seconds: float
+        :param error: If the observed operation failed.
+        :type error: bool
+        """
+        index = bisect_left(self.buckets, seconds)
+        with self._lock:
+            self.counts[index] += 1
+            self.count += 1
+            self.sum += seconds
+            if error:
+                self.errors += 1
+
+    def snapshot(self):
+        """
+        Method to read the counters at once.
+        :return: Count by bucket, count, sum and errors.
+        :rtype: tuple(list, int, float, int)
+        """
+        with self._lock:
+            return list(self.counts), self.count, self.sum, self.errors
+
+    def quantile(self, quantile, counts=None):
+        """
+        Method to estimate a quantile of the durations observed, by
+        linear interpolation inside the bucket where it falls.
+        :param quantile: Quantile, between 0 and 1.
+        :type quantile: float
+        :param counts: Count by bucket (from snapshot), or None to read
+        the current ones.
+        :type counts: list
+        :return: Estimated duration, or 0 if nothing was observed.
+        :rtype: float
+        """
+        if counts is None:
+            counts = self.snapshot()[0]
+        total = sum(counts)
+        if not total:
+            return 0.0
+
+        rank = quantile * total
+        cumulative = 0
+        for index, count in enumerate(counts):
+            if count and cumulative + count >= rank:
+                if index == len(self.buckets):
+                    return self.buckets[-1]
+                lower = self.buckets[index - 1] if index else 0.0
+                upper = self.buckets[index]
+                return lower + (upper - lower) * (rank - cumulative) / count
+            cumulative += count
+        return self.buckets[-1]
+
+
+class MetricsRegistry:
+    """
+    Class to keep the histograms of the process, by metric name and
+    labels, and export them in the Prometheus text format.
+    """
+    def __init__(self):
+        self.histograms = {}
+        self.descriptions = {}
+        self._lock = threading.Lock()
+
+    def histogram(self, name, description, **labels):
+        """
+        Method to return the histogram of a metric and labels, creating
+        it the first time.
+        :param name: Name of the metric.
+        :type name: str
+        :param description: Description of the metric.
+        :type description: str
+        :param labels: Labels of the histogram.
+        :type labels: dict
+        :return: The histogram.
+        :rtype: Histogram
+        """
+        key = (name, tuple(sorted(labels.items())))
+        histogram = self.histograms.get(key)
+        if histogram is None:
+            with self._lock:
+                histogram = self.histograms.setdefault(key, Histogram())
+                self.descriptions.setdefault(name, description)
+        return histogram
+
+    def render(self):
+        """
+        Method to export the histograms in the Prometheus text format:
+        the buckets, sum and count of each histogram, the estimated
+        quantiles (p50, p95 and p99) and the errors.
+        :return: Metrics in the Prometheus text format.
+        :rtype: str
+        """
+        lines = []
+        families = {}
+        for (name, labels), histogram in sorted(self.histograms.items()):
+            families.setdefault(name, []).append((labels, histogram))
+
+        for name, histograms in families.items():
+            base = name[:-len('_duration_seconds')] \
+                if name.endswith('_duration_seconds') else name
+            description = self.descriptions.get(name)
+            buckets = [f'# HELP {name} {description}',
+                       f'# TYPE {name} histogram']
+            quantiles = [f'# HELP {base}_quantile_seconds Estimated'
+                         f' quantiles of {name}.',
+                         f'# TYPE {base}_quantile_seconds gauge']
+            errors = [f'# HELP {base}_errors_total Failures counted in'
+                      f' {name}.',
+                      f'# TYPE {base}_errors_total counter']
+
+            for labels, histogram in histograms:
+                counts, count, total, error_count = histogram.snapshot()
+                cumulative = 0
+                for bound, bucket_count in zip(histogram.buckets + ('+Inf',),
+                                               counts):
+                    cumulative += bucket_count
+                    buckets.append(f'{name}_bucket'
+                                   f'{format_labels(labels, le=bound)}'
+                                   f' {cumulative}')
+                buckets.append(f'{name}_sum{format_labels(labels)} {total}')
+                buckets.append(f'{name}_count{format_labels(labels)}'
+                               f' {count}')
+                for quantile in QUANTILES:
+                    quantiles.append(
+                        f'{base}_quantile_seconds'
+                        f'{format_labels(labels, quantile=quantile)}'
+                        f' {histogram.quantile(quantile, counts)}')
+                errors.append(f'{base}_errors_total{format_labels(labels)}'
+                              f' {error_count}')
+            lines.extend(buckets + quantiles + errors)
+        return '\n'.join(lines) + '\n'
+
+
+def format_labels(labels, **extra):
+    """
+    Method to format the labels of a sample in the Prometheus text
+    format.
+
+    :param labels: Labels, as (name, value) pairs.
+    :type labels: tuple
+    :param extra: Additional labels.
+    :type extra: dict
+    :return: Formatted labels, or an empty string if there is none.
+    :rtype: str
+    """
+    items = list(labels) + list(extra.items())
+    if not items:
+        return ''
+    return '{' + ','.join(
+        '%s="%s"' % (key, str(value).replace('\\', '\\\\')
+                     .replace('"', '\\"'))
+        for key, value in items) + '}'
+
+
+metrics = MetricsRegistry()
+
+
+def observe_iteration(iterator, histogram, elapsed=0.0):
+    """
+    Method to iterate over the results of an operation, observing the
+    time spent reading them (not the time spent by the caller between
+    the items), plus the time of the operation itself, when the
+    iteration ends.
+
+    :param iterator: Results of the operation.
+    :type iterator: iterator
+    :param histogram: Histogram of the operation.
+    :type histogram: Histogram
+    :param elapsed: Duration of the operation, before the iteration.
+    :type elapsed: float
+    :return: The results.
+    :rtype: iterator
+    """
+    iterator = iter(iterator)
+    error = False
+    try:
+        while True:
+            started = time.perf_counter()
+            try:
+                item = next(iterator)
+            except StopIteration:
+                return
+            except Exception:
+                error = True
+                raise
+            finally:
+                elapsed += time.perf_counter() - started
+            yield item
+    finally:
+        histogram.observe(elapsed, error)
+
+
+def timed(operation, iterated=False):
+    """
+    Decorator to observe the duration of a repository operation, and
+    if it raised an error. The operation is executed through the
+    admission control (see admission.AdmissionControl); refused
+    operations are not observed. Works with functions and coroutines.
+
+    :param operation: Name of the operation, used as label.
+    :type operation: str
+    :param iterated: If the operation returns a lazy iterator (a
+    cursor), whose reading is observed too, when it ends (see
+    observe_iteration). The reading happens after the operation,
+    outside the admission control.
+    :type iterated: bool
+    :return: Decorator of the operation.
+    :rtype: function
+    """
+    def decorator(function):
+        histogram = metrics.histogram(
+            'task_repository_operation_duration_seconds',
+            'Duration of the TaskRepository operations.',
+            operation=operation)
+
+        if inspect.iscoroutinefunction(function):
+            @functools.wraps(function)
+            async def async_wrapper(*args, **kwargs):
+                async with admission.admit_async():
+                    started = time.perf_counter()
+                    error = True
+                    try:
+                        result = await function(*args, **kwargs)
+                        error = False
+                        return result
+                    finally:
+                        histogram.observe(time.perf_counter() - started,
+                                          error)
+            return async_wrapper
+
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            with admission.admit():
+                started = time.perf_counter()
+                error = True
+                try:
+                    result = function(*args, **kwargs)
+                    error = False
+                    if iterated:
+                        return observe_iteration(
+                            result, histogram,
+                            time.perf_counter() - started)
+                    return result
+                finally:
+                    if error or not iterated:
+                        histogram.observe(time.perf_counter() - started,
+                                          error)
+        return wrapper
+    return decorator
+
+
+def init_metrics(app):
+    """
+    Method to observe the duration of every request of the application
+    (by route and method), and of the rendering of each template.
+
+    :param app: Flask application.
+    :type app: flask.Flask
+    """
+    if not app.config['METRICS_ENABLED']:
+        return
+
+    @app.before_request
+    def start_request_timer():
+        g.request_started = time.perf_counter()
+
+    @app.after_request
+    def keep_response_status(response):
+        g.response_status = response.status_code
+        return response
+
+    @app.teardown_request
+    def observe_request(exception=None):
+        started = g.pop('request_started', None)
+        if started is None:
+            return
+        rule = request.url_rule.rule if request.url_rule else 'unmatched'
+        error = exception is not None \
+            or g.pop('response_status', 500) >= 500
+        metrics.histogram('task_http_request_duration_seconds',
+                          'Duration of the HTTP requests.',
+                          route=rule, method=request.method)\
+            .observe(time.perf_counter() - started, error)
+
+    if signals_available:
+        def start_template_timer(sender, template, context, **extra):
+            g.setdefault('template_started', []).append(time.perf_counter())
+
+        def observe_template(sender, template, context, **extra):
+            started = g.get('template_started')
+            if started:
+                metrics.histogram('task_template_render_duration_seconds',
+                                  'Duration of the template rendering.',
+                                  template=template.name)\
+                    .observe(time.perf_counter() - started.pop())
+
+        before_render_template.connect(start_template_timer, app,
+                                       weak=False)
+        template_rendered.connect(observe_template, app, weak=False)
@@ -0,0 +1,3 @@
+"""
+Initializer of model package.
+"""
\ No newline at end of file
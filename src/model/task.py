@@ -0,0 +1,74 @@
+"""
+Task model
+"""
+from collections.abc import MutableMapping
+from bson.codec_options import CodecOptions
+
+# Fields of the Task documents, and the attribute of each one.
+FIELDS = {"_id": 'id', "description": 'description', "status": 'status'}
+PROJECTION = {field: True for field in FIELDS}
+
+
+class Task(MutableMapping):
+    """
+    Class of a Task read from the Database, with only its Identifier,
+    description and status, kept in slots instead of a dict.
+    It is also a mapping of the document fields (_id, description and
+    status), so the BSON decoder can build it directly (see
+    CODEC_OPTIONS), skipping the other fields, and it can be used where
+    a document is expected.
+    """
+    __slots__ = ('id', 'description', 'status')
+
+    def __init__(self, task_id=None, description=None, status=None):
+        self.id = task_id
+        self.description = description
+        self.status = status
+
+    @classmethod
+    def from_document(cls, document):
+        """
+        Method to build a Task from a document.
+        :param document: Task document, or Task.
+        :type document: dict
+        :return: The Task, or None if there is no document.
+        :rtype: Task
+        """
+        if document is None or isinstance(document, cls):
+            return document
+        return cls(document.get('_id'), document.get('description'),
+                   document.get('status'))
+
+    def __getitem__(self, field):
+        if field not in FIELDS:
+            raise KeyError(field)
+        return getattr(self, FIELDS[field])
+
+    def __setitem__(self, field, value):
+        # Fields that are not of the Task are ignored while decoding.
+        if field in FIELDS:
+            setattr(self, FIELDS[field], value)
+
+    def __delitem__(self, field):
+        raise TypeError('The fields of a Task can not be removed.')
+
+    def __iter__(self):
+        return iter(FIELDS)
+
+    def __len__(self):
+        return len(FIELDS)
+
+    def __repr__(self):
+        return f'Task(id={self.id!r}, description={self.description!r},' \
+               f' status={self.status!r})'
+
+    def copy(self):
+        """
+        :return: A new Task with the same fields.
+        :rtype: Task
+        """
+        return Task(self.id, self.description, self.status)
+
+
+# Codec options that decode the Task documents directly into Task.
+CODEC_OPTIONS = CodecOptions(document_class=Task)
@@ -0,0 +1,489 @@
+"""
+Asynchronous database communication
+"""
+import asyncio
+import functools
+import os
+import uuid
+from pymongo import ReturnDocument
+from pymongo.results import DeleteResult, UpdateResult
+from pymongo.errors import DuplicateKeyError, OperationFailure
+from src.metrics import timed
+from src.model.task import CODEC_OPTIONS, PROJECTION, Task
+from src.repository.connection import ConnectionManager, backend_name
+from src.repository.indexes import TASK_INDEXES
+from src.repository.mongo_store import TOGGLE_PIPELINE, page_query, \
+    supports_pipeline_updates
+from src.repository.task_repository import TaskRepository
+
+try:
+    from motor.motor_asyncio import AsyncIOMotorClient
+except ImportError:
+    AsyncIOMotorClient = None
+
+
+class AsyncTaskRepository:
+    """
+    Class to communicate with Database and make operations without
+    blocking the event loop, using Motor. Keeps the same documents,
+    counters and version stamp of TaskRepository, so both can be used
+    over the same Database, and shares the cache and the write-behind
+    buffer of its TaskRepository. The queries and updates are built by
+    the same functions of MongoTaskStore. The backends executed in the
+    process (mongomock and the memory engine) never wait for the
+    network, so their operations are the ones of TaskRepository.
+    """
+    def __init__(self, app, sync_repository=None):
+        """
+        :param app: Flask application.
+        :type app: flask.Flask
+        :param sync_repository: Repository of the Flask routes, whose
+        cache is invalidated by the writes, or None for a new one.
+        :type sync_repository: TaskRepository
+        """
+        self.app = app
+        self.sync_repository = sync_repository or TaskRepository(app)
+        self._client = None
+        self._indexes_ready = False
+        self._pipeline_updates = None
+        self._id_lock = None
+        self._id_block_pid = None
+        self._id_block_next = 1
+        self._id_block_last = 0
+
+    @property
+    def in_process(self):
+        """
+        :return: If the backend is executed in the process, so the
+        operations are delegated to the synchronous repository.
+        :rtype: bool
+        """
+        return backend_name(self.app) != 'mongodb'
+
+    def get_database(self):
+        """
+        Method to initialize the asynchronous MongoDB connection.
+        :return: Database of the application.
+        :rtype: motor.motor_asyncio.AsyncIOMotorDatabase
+        """
+        if self._client is None:
+            if AsyncIOMotorClient is None:
+                raise RuntimeError('The asynchronous repository requires'
+                                   ' the motor package.')
+            self._client = AsyncIOMotorClient(
+                self.sync_repository.get_mongo_uri(),
+                **ConnectionManager.client_options(self.app))
+        return self._client.get_default_database()
+
+    def get_collection(self, name):
+        """
+        Method to return a collection of the Database.
+        :param name: Name of the collection.
+        :type name: str
+        :return: Asynchronous collection.
+        :rtype: motor.motor_asyncio.AsyncIOMotorCollection
+        """
+        return self.get_database()[name]
+
+    async def get_task_collection(self):
+        """
+        Method to return the Task collection, creating its indexes and
+        probing the support of update pipelines (see
+        MongoTaskStore.pipeline_updates) the first time. As in
+        TaskRepository.ensure_indexes, an index the database can not
+        build is logged once, and not retried.
+        :return: Asynchronous Task collection.
+        :rtype: motor.motor_asyncio.AsyncIOMotorCollection
+        """
+        collection = self.get_collection('task')
+        if self._pipeline_updates is None:
+            self._pipeline_updates = supports_pipeline_updates(
+                await self._client.server_info())
+        if not self._indexes_ready:
+            try:
+                await collection.create_indexes(list(TASK_INDEXES))
+            except OperationFailure as error:
+                self.app.logger.error('AsyncTaskRepository - create_indexes'
+                                      ' failed, run the create-indexes'
+                                      ' command: %s', error)
+            self._indexes_ready = True
+        return collection
+
+    @timed('async_next_id')
+    async def next_id(self):
+        """
+        Method that returns the next Identifier available to be used,
+        from the same counter of TaskRepository.next_id.
+        :return: Integer Identifier available to be used.
+        :rtype: int
+        """
+        if self.in_process:
+            return self.sync_repository.next_id()
+        if self._id_block_pid != os.getpid():
+            # A block reserved before a fork must not be shared by the
+            # parent and the child processes, nor the lock of the event
+            # loop of the parent.
+            self._id_lock = asyncio.Lock()
+            self._id_block_pid = os.getpid()
+            self._id_block_next = 1
+            self._id_block_last = 0
+        block_size = self.app.config['TASK_ID_BLOCK_SIZE']
+
+        async with self._id_lock:
+            if self._id_block_next > self._id_block_last:
+                self._id_block_last = await self._reserve_ids(block_size)
+                self._id_block_next = self._id_block_last - block_size + 1
+            task_id = self._id_block_next
+            self._id_block_next += 1
+        return task_id
+
+    async def _reserve_ids(self, count):
+        """
+        Method to reserve a range of Identifiers, atomically increasing
+        the counter document of the Task collection.
+        :param count: Amount of Identifiers to be reserved.
+        :type count: int
+        :return: The last Identifier of the reserved range.
+        :rtype: int
+        """
+        counters = self.get_collection('counters')
+        counter = await counters.find_one_and_update(
+            {"_id": "task"}, {"$inc": {"seq": count}},
+            return_document=ReturnDocument.AFTER)
+
+        if counter is None:
+            tasks = await (await self.get_task_collection())\
+                .find({}, {"_id": True}).sort("_id", -1).limit(1)\
+                .to_list(1)
+            max_id = tasks[0].get('_id') if tasks else 0
+            try:
+                await counters.update_one({"_id": "task"},
+                                          {"$max": {"seq": max_id}},
+                                          upsert=True)
+            except DuplicateKeyError:
+                await counters.update_one({"_id": "task"},
+                                          {"$max": {"seq": max_id}})
+            counter = await counters.find_one_and_update(
+                {"_id": "task"}, {"$inc": {"seq": count}},
+                upsert=True, return_document=ReturnDocument.AFTER)
+
+        return counter.get('seq')
+
+    async def _bump_version(self):
+        """
+        Method to increase the version stamp of the Task collection, in
+        the counter buffer of the synchronous repository if it is
+        enabled (see TaskRepository._bump_version).
+        """
+        if await self._defer_counter("task_version", {"seq": 1}):
+            return
+        counters = self.get_collection('counters')
+        try:
+            await counters.update_one({"_id": "task_version"},
+                                      {"$inc": {"seq": 1},
+                                       "$setOnInsert": {"epoch":
+                                                        uuid.uuid4().hex}},
+                                      upsert=True)
+        except DuplicateKeyError:
+            await counters.update_one({"_id": "task_version"},
+                                      {"$inc": {"seq": 1}})
+
+    async def _defer_counter(self, name, values):
+        """
+        Method to keep the increment of a counter in the counter buffer
+        of the synchronous repository, if it is enabled, flushing it in
+        a thread if its last flush is too old.
+        :param name: Name of the counter.
+        :type name: str
+        :param values: Increment, by field.
+        :type values: dict
+        :return: If the increment was buffered.
+        :rtype: bool
+        """
+        repository = self.sync_repository
+        if not repository._defer_counter(name, values):
+            return False
+        if repository.counter_buffer.stale(
+                self.app.config['TASK_COUNTERS_FLUSH_INTERVAL']):
+            await self._in_thread(repository.flush_counters)
+        return True
+
+    async def _written(self, parameters):
+        """
+        Method to be executed after every write, like
+        TaskRepository._written: bumps the version of the collection, and
+        removes from the cache of the synchronous repository the Tasks
+        matched by the constraints of the write.
+        :param parameters: Constraints of the write.
+        :type parameters: dict
+        """
+        await self._bump_version()
+        self.sync_repository.invalidate(parameters)
+
+    async def _in_thread(self, method, *args):
+        """
+        Method to execute a blocking method of the synchronous
+        repository in a thread, without blocking the event loop.
+        :param method: Method of the synchronous repository.
+        :type method: function
+        :return: The result of the method.
+        :rtype: object
+        """
+        return await asyncio.get_running_loop().run_in_executor(
+            None, functools.partial(method, *args))
+
+    async def _flush_status_buffer(self):
+        """
+        Method to write the status changes of the write-behind buffer,
+        if there are any (see TaskRepository.flush_status_buffer).
+        """
+        if self.sync_repository._pending_statuses() is not None:
+            await self._in_thread(self.sync_repository.flush_status_buffer)
+
+    async def _count_stats(self, total, finished):
+        """
+        Method to increase the counters of the statistics of the Tasks,
+        like TaskRepository._count_stats.
+        :param total: Change in the amount of Tasks.
+        :type total: int
+        :param finished: Change in the amount of finished Tasks.
+        :type finished: int
+        """
+        if not (total or finished):
+            return
+        values = {"total": total, "finished": finished, "rev": 1}
+        if await self._defer_counter("task_stats", values):
+            return
+        await self.get_collection('counters').update_one(
+            {"_id": "task_stats"}, {"$inc": values})
+
+    @timed('async_find_page')
+    async def find_page(self, limit, after=None, parameters=None,
+                        sort_key='_id', direction=1):
+        """
+        Method to query one page of Tasks, after the edge of the
+        previous page (keyset), as TaskRepository.find_page. Only the
+        fields of Task are read, and decoded directly into Task where
+        the backend allows it.
+        :param limit: Max amount of Tasks in the page.
+        :type limit: int
+        :param after: Edge after which the page starts: the Identifier,
+        or, if the sort key is not the Identifier, the value and the
+        Identifier of the Task.
+        :type after: int or tuple
+        :param parameters: Filters (see task_filters), or None for all.
+        :type parameters: dict
+        :param sort_key: Field of the sort (see SORT_KEYS).
+        :type sort_key: str
+        :param direction: 1 (ascending) or -1 (descending).
+        :type direction: int
+        :return: The Tasks of the page, and if there is a page after it.
+        :rtype: tuple(list, bool)
+        """
+        self.app.logger.info('Executing at: AsyncTaskRepository -'
+                             ' find_page(limit=%s, after=%s,'
+                             ' parameters=%s, sort_key=%s, direction=%s)',
+                             limit, after, parameters, sort_key, direction)
+        if self.in_process:
+            tasks, _, has_next = self.sync_repository.find_page(
+                limit, after=after, parameters=parameters,
+                sort_key=sort_key, direction=direction)
+            return tasks, has_next
+        parameters = parameters or {}
+        buffer = self.sync_repository._pending_statuses()
+        if buffer is not None and ('status' in parameters
+                                   or sort_key == 'status'):
+            # The buffered status would change which Tasks are in the
+            # page, so it is written first.
+            await self._flush_status_buffer()
+            buffer = None
+        query, sort = page_query(parameters, sort_key, direction, after)
+        collection = (await self.get_task_collection())\
+            .with_options(codec_options=CODEC_OPTIONS)
+        tasks = await collection.find(query, PROJECTION).sort(sort)\
+            .limit(limit + 1).to_list(limit + 1)
+        return TaskRepository._overlay(
+            buffer, [Task.from_document(task) for task in tasks[:limit]]), \
+            len(tasks) > limit
+
+    @timed('async_find_one')
+    async def find_one(self, parameters):
+        """
+        Method to do a query in the database. The Task has the status
+        kept in the write-behind buffer, if there is one.
+        :param parameters: Constraints: the _id or the description.
+        :type parameters: dict
+        :return: Query result containing the document queried.
+        :rtype: dict
+        """
+        self.app.logger.info('Executing at: AsyncTaskRepository -'
+                             ' find_one(parameters=%s)', parameters)
+        if self.in_process:
+            return self.sync_repository.find_one(parameters)
+        field, value = TaskRepository._unique_key(parameters)
+        buffer = self.sync_repository._pending_statuses()
+        task = await (await self.get_task_collection()).find_one(
+            {field: value})
+        return task if buffer is None else buffer.overlay(task)
+
+    @timed('async_insert_one')
+    async def insert_one(self, task_id, description, status):
+        """
+        Method to insert a object in the database.
+        :param task_id: Identifier of the Task.
+        :type task_id: int
+        :param description: Description of the Task.
+        :type description: str
+        :param status: Status of the Task (Finished or No).
+        :type status: bool
+        :return: Instance of InsertOneResult.
+        :rtype: pymongo.results.InsertOneResult
+        :raises pymongo.errors.DuplicateKeyError: If the Description
+        already belongs to another Task.
+        """
+        self.app.logger.info('Executing at: AsyncTaskRepository -'
+                             ' insert_one(task_id=%s,'
+                             ' description=%s,'
+                             ' status=%s)', task_id, description, status)
+        if self.in_process:
+            return self.sync_repository.insert_one(task_id, description,
+                                                   status)
+        try:
+            result = await (await self.get_task_collection()).insert_one(
+                {"_id": task_id, "description": description,
+                 "status": status})
+        finally:
+            await self._written({"_id": task_id})
+        await self._count_stats(1, 1 if status else 0)
+        return result
+
+    @timed('async_update_one')
+    async def update_one(self, parameters, new_data):
+        """
+        Method to update a object in the database.
+        :param parameters: Constraints of the object to be updated: the
+        _id or the description.
+        :type parameters: dict
+        :param new_data: New data to be placed in the object.
+        :type new_data: dict
+        :return: Instance of UpdateResult.
+        :rtype: pymongo.results.UpdateResult
+        :raises pymongo.errors.DuplicateKeyError: If the new Description
+        already belongs to another Task.
+        """
+        self.app.logger.info('Executing at: AsyncTaskRepository -'
+                             ' update_one(parameters=%s,'
+                             ' new_data=%s)', parameters, new_data)
+        if self.in_process:
+            return self.sync_repository.update_one(parameters, new_data)
+        TaskRepository._unique_key(parameters)
+        collection = await self.get_task_collection()
+        try:
+            if 'status' not in new_data:
+                return await collection.update_one(parameters,
+                                                   {"$set": new_data})
+
+            # A buffered status written later would undo this one.
+            await self._flush_status_buffer()
+            previous = await collection.find_one_and_update(
+                parameters, {"$set": new_data},
+                projection={field: True for field in new_data},
+                return_document=ReturnDocument.BEFORE)
+        finally:
+            await self._written(parameters)
+
+        if previous is None:
+            return UpdateResult({"n": 0, "nModified": 0, "ok": 1.0}, True)
+        await self._count_stats(
+            0, TaskRepository._status_change(previous,
+                                             new_data.get('status')))
+        modified = any(previous.get(field) != value
+                       for field, value in new_data.items())
+        return UpdateResult({"n": 1, "nModified": int(modified), "ok": 1.0},
+                            True)
+
+    @timed('async_toggle_status')
+    async def toggle_status(self, task_id):
+        """
+        Method to flip the status of a Task on the server. With
+        TASK_WRITE_BEHIND, the status is flipped in the write-behind
+        buffer of the synchronous repository, and written later.
+        :param task_id: Identifier of the Task.
+        :type task_id: int
+        :return: The new status of the Task, or None if it does not
+        exist.
+        :rtype: bool
+        """
+        self.app.logger.info('Executing at: AsyncTaskRepository -'
+                             ' toggle_status(task_id=%s)', task_id)
+        if self.in_process:
+            return self.sync_repository.toggle_status(task_id)
+        if self.sync_repository.status_buffer is not None:
+            return await self._in_thread(self.sync_repository.toggle_status,
+                                         task_id)
+
+        collection = await self.get_task_collection()
+        try:
+            status = await self._toggle_status(collection, task_id)
+        finally:
+            await self._written({"_id": task_id})
+        if status is not None:
+            await self._count_stats(0, 1 if status else -1)
+        return status
+
+    async def _toggle_status(self, collection, task_id):
+        """
+        Method to flip the status of a Task with an update pipeline, or
+        with a compare-and-set where pipelines are not supported.
+        :param collection: Asynchronous Task collection.
+        :type collection: motor.motor_asyncio.AsyncIOMotorCollection
+        :param task_id: Identifier of the Task.
+        :type task_id: int
+        :return: The new status of the Task, or None if it does not
+        exist.
+        :rtype: bool
+        """
+        if self._pipeline_updates:
+            task = await collection.find_one_and_update(
+                {"_id": task_id}, TOGGLE_PIPELINE,
+                projection={"status": True},
+                return_document=ReturnDocument.AFTER)
+            return None if task is None else task.get('status')
+
+        while True:
+            task = await collection.find_one({"_id": task_id},
+                                             {"status": True})
+            if task is None:
+                return None
+            status = not task.get('status')
+            result = await collection.update_one(
+                {"_id": task_id, "status": task.get('status')},
+                {"$set": {"status": status}})
+            if result.matched_count:
+                return status
+
+    @timed('async_delete_one')
+    async def delete_one(self, parameters):
+        """
+        Method to delete a object in the database.
+        :param parameters: Constraints of the object to be deleted: the
+        _id or the description.
+        :type parameters: dict
+        :return: Instance of DeleteResult.
+        :rtype: pymongo.results.DeleteResult
+        """
+        self.app.logger.info('Executing at: AsyncTaskRepository -'
+                             ' delete_one(parameters=%s)', parameters)
+        if self.in_process:
+            return self.sync_repository.delete_one(parameters)
+        TaskRepository._unique_key(parameters)
+        await self._flush_status_buffer()
+        try:
+            task = await (await self.get_task_collection())\
+                .find_one_and_delete(parameters, projection={"status": True})
+        finally:
+            await self._written(parameters)
+        if task is None:
+            return DeleteResult({"n": 0, "ok": 1.0}, True)
+        await self._count_stats(-1, -1 if task.get('status') else 0)
+        return DeleteResult({"n": 1, "ok": 1.0}, True)
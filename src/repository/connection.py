@@ -0,0 +1,237 @@
+"""
+MongoDB connection management
+"""
+import atexit
+import os
+import threading
+from flask_pymongo import PyMongo
+from src.repository.memory import MemoryTaskStore
+from src.repository.mongo_store import MongoTaskStore
+from src.repository.monitoring import client_explain, create_command_monitor
+from src.repository.counter_buffer import CounterBuffer
+from src.repository.status_buffer import StatusBuffer
+
+
+def backend_name(app):
+    """
+    Method to read the database backend of the application: the
+    TASK_BACKEND setting, or, if it is not defined, mongomock when
+    TESTING and mongodb otherwise.
+
+    :param app: Flask application.
+    :type app: flask.Flask
+    :return: Name of the backend (a key of BACKENDS).
+    :rtype: str
+    """
+    backend = app.config['TASK_BACKEND'] \
+        or ('mongomock' if app.config['TESTING'] else 'mongodb')
+    if backend not in BACKENDS:
+        raise ValueError('Unknown TASK_BACKEND %r, expected one of %s.'
+                         % (backend, ', '.join(sorted(BACKENDS))))
+    return backend
+
+
+def create_mongodb(manager, app):
+    """
+    Method to create the store of the Tasks over a pooled MongoDB
+    client configured by the application, listened by the command
+    monitor if MONGO_SLOW_QUERY_MS is defined.
+    :param manager: Connection manager of the process.
+    :type manager: ConnectionManager
+    :param app: Flask application.
+    :type app: flask.Flask
+    :return: Store of the Tasks in MongoDB.
+    :rtype: MongoTaskStore
+    """
+    options = ConnectionManager.client_options(app)
+    manager.monitor = create_command_monitor(app)
+    if manager.monitor is not None:
+        options['event_listeners'] = [manager.monitor]
+
+    connection = PyMongo(app, connect=False, **options)
+    if manager.monitor is not None \
+            and app.config['MONGO_EXPLAIN_SLOW_QUERIES']:
+        manager.monitor.explain = client_explain(connection.cx)
+    return MongoTaskStore(connection.db, connection.cx)
+
+
+def create_mongomock(manager, app):
+    """
+    Method to create the store of the Tasks over a mongomock client.
+    mongomock is only imported here, so it is not needed by the other
+    backends.
+    :param manager: Connection manager of the process.
+    :type manager: ConnectionManager
+    :param app: Flask application.
+    :type app: flask.Flask
+    :return: Store of the Tasks in mongomock.
+    :rtype: MongoTaskStore
+    """
+    import mongomock
+    client = mongomock.MongoClient()
+    return MongoTaskStore(client.db, client)
+
+
+def create_memory(manager, app):
+    """
+    Method to create the store of the Tasks in the memory of the
+    process, loaded from the TASK_MEMORY_SNAPSHOT file, if it exists,
+    and saved to it when the process exits.
+    :param manager: Connection manager of the process.
+    :type manager: ConnectionManager
+    :param app: Flask application.
+    :type app: flask.Flask
+    :return: In-memory store of the Tasks.
+    :rtype: MemoryTaskStore
+    """
+    store = MemoryTaskStore(app.config['TASK_MEMORY_SNAPSHOT'])
+    if store.snapshot_path:
+        atexit.register(_close_at_exit, store, os.getpid())
+    return store
+
+
+def _close_at_exit(store, pid):
+    # Handlers registered before a fork also run in the child, which
+    # must not overwrite the snapshot of its parent.
+    if os.getpid() == pid:
+        store.close()
+
+
+# Factories of the store of the Tasks of each backend, by name.
+BACKENDS = {"mongodb": create_mongodb,
+            "mongomock": create_mongomock,
+            "memory": create_memory}
+
+
+class ConnectionManager:
+    """
+    Class to keep one store of the Tasks (and its MongoDB connection
+    pool) per process. The store is created lazily, without connecting
+    before it is used, and is discarded in the child process after a
+    fork, so pools and sockets are never shared by processes of a
+    pre-fork server.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pid = None
+        self._connection = None
+        self.indexes_ready = False
+        self.monitor = None
+        self.status_buffer = None
+        self._status_buffer_pid = None
+        self.counter_buffer = None
+        self._counter_buffer_pid = None
+        if hasattr(os, 'register_at_fork'):
+            os.register_at_fork(after_in_child=self.reset)
+
+    @staticmethod
+    def client_options(app):
+        """
+        Method to read the options of the MongoDB client from the
+        configuration of the application. Options not configured keep
+        the default of pymongo.
+        :param app: Flask application.
+        :type app: flask.Flask
+        :return: Keyword arguments of pymongo.MongoClient.
+        :rtype: dict
+        """
+        options = {"maxPoolSize": app.config['MONGO_MAX_POOL_SIZE'],
+                   "minPoolSize": app.config['MONGO_MIN_POOL_SIZE'],
+                   "waitQueueTimeoutMS":
+                       app.config['MONGO_WAIT_QUEUE_TIMEOUT_MS'],
+                   "socketTimeoutMS": app.config['MONGO_SOCKET_TIMEOUT_MS'],
+                   "connectTimeoutMS":
+                       app.config['MONGO_CONNECT_TIMEOUT_MS'],
+                   "serverSelectionTimeoutMS":
+                       app.config['MONGO_SERVER_SELECTION_TIMEOUT_MS']}
+        return {key: value for key, value in options.items()
+                if value is not None}
+
+    def get_connection(self, app):
+        """
+        Method to return the store of the current process, creating it
+        if needed.
+        :param app: Flask application.
+        :type app: flask.Flask
+        :return: Store of the Tasks.
+        :rtype: src.repository.store.TaskStore
+        """
+        if self._pid != os.getpid():
+            self.reset()
+        if self._connection is None:
+            with self._lock:
+                if self._connection is None:
+                    self._connection = self._create_connection(app)
+                    self._pid = os.getpid()
+        return self._connection
+
+    def _create_connection(self, app):
+        """
+        Method to create the store of the backend of the application
+        (see backend_name and BACKENDS).
+        :param app: Flask application.
+        :type app: flask.Flask
+        :return: Store of the Tasks.
+        :rtype: src.repository.store.TaskStore
+        """
+        backend = backend_name(app)
+        app.logger.info('Executing at: ConnectionManager -'
+                        ' _create_connection(backend=%s)', backend)
+        return BACKENDS[backend](self, app)
+
+    def current(self):
+        """
+        :return: The store of the current process, or None if it was
+        not created.
+        :rtype: src.repository.store.TaskStore
+        """
+        if self._pid != os.getpid():
+            return None
+        return self._connection
+
+    def reset(self):
+        """
+        Method to forget the connection, so the next use creates a new
+        one. Executed in the child process after a fork: the connection
+        of the parent is not closed, because its sockets still belong to
+        the parent.
+        """
+        self._lock = threading.Lock()
+        self._pid = None
+        self._connection = None
+        self.indexes_ready = False
+        self.monitor = None
+
+    def get_status_buffer(self):
+        """
+        Method to return the write-behind buffer of the status of the
+        Tasks of the current process, creating it if needed. The changes
+        buffered before a fork are written by the parent, so the child
+        starts with an empty buffer.
+        :return: Buffer of the status changes.
+        :rtype: StatusBuffer
+        """
+        if self._status_buffer_pid != os.getpid():
+            with self._lock:
+                if self._status_buffer_pid != os.getpid():
+                    self.status_buffer = StatusBuffer()
+                    self._status_buffer_pid = os.getpid()
+        return self.status_buffer
+
+    def get_counter_buffer(self):
+        """
+        Method to return the buffer of the counters of the current
+        process, creating it if needed. As the write-behind buffer, the
+        child process of a fork starts with an empty one.
+        :return: Buffer of the counters.
+        :rtype: CounterBuffer
+        """
+        if self._counter_buffer_pid != os.getpid():
+            with self._lock:
+                if self._counter_buffer_pid != os.getpid():
+                    self.counter_buffer = CounterBuffer()
+                    self._counter_buffer_pid = os.getpid()
+        return self.counter_buffer
+
+
+connections = ConnectionManager()
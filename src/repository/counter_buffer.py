@@ -0,0 +1,101 @@
+"""
+Buffer of the counters of the application
+"""
+import threading
+import time
+
+
+class CounterBuffer:
+    """
+    Class to keep in memory the increments of the counters (the version
+    stamp of the Task collection) not written yet, and the counters read
+    or written by the last flush. The increments of many writes are
+    summed, so they cost a single write per flush.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        # Held while the buffer is read or written with the database.
+        self.flush_lock = threading.RLock()
+        self.increments = {}
+        self.counters = {}
+        self.generation = 0
+        self.synced = None
+
+    def __bool__(self):
+        return bool(self.increments)
+
+    def add(self, name, values):
+        """
+        Method to increase the values of a counter in the buffer.
+        :param name: Name of the counter.
+        :type name: str
+        :param values: Increment, by field.
+        :type values: dict
+        """
+        with self._lock:
+            increment = self.increments.setdefault(name, {})
+            for field, value in values.items():
+                increment[field] = increment.get(field, 0) + value
+            self.generation += 1
+
+    def pending(self, name):
+        """
+        Method to read the increment of a counter not written yet.
+        :param name: Name of the counter.
+        :type name: str
+        :return: Increment, by field (empty if there is none).
+        :rtype: dict
+        """
+        with self._lock:
+            return dict(self.increments.get(name, {}))
+
+    def drain(self):
+        """
+        Method to remove all the increments, to be written.
+        :return: Increment, by field, by counter.
+        :rtype: dict
+        """
+        with self._lock:
+            increments, self.increments = self.increments, {}
+            return increments
+
+    def restore(self, increments):
+        """
+        Method to put back increments that could not be written.
+        :param increments: Increment, by field, by counter.
+        :type increments: dict
+        """
+        for name, values in increments.items():
+            self.add(name, values)
+
+    def synchronize(self, counters):
+        """
+        Method to keep the counters read or written by a flush.
+        :param counters: Counter documents (or None if missing), by
+        name.
+        :type counters: dict
+        """
+        with self._lock:
+            self.counters.update(counters)
+            self.synced = time.monotonic()
+
+    def clear(self):
+        """
+        Method to forget the increments and the counters kept, so they
+        are read again.
+        """
+        with self._lock:
+            self.increments = {}
+            self.counters = {}
+            self.synced = None
+
+    def stale(self, interval):
+        """
+        Method to check if the counters kept are older than an interval.
+        :param interval: Seconds.
+        :type interval: float
+        :return: If the counters were never read, or are older.
+        :rtype: bool
+        """
+        return self.synced is None \
+            or time.monotonic() - self.synced >= interval
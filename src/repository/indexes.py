@@ -0,0 +1,89 @@
+"""
+Indexes of the Task collection
+"""
+from pymongo import ASCENDING, TEXT, IndexModel
+
+ID_INDEX = ('_id_', (('_id', ASCENDING),))
+
+TASK_INDEXES = (
+    # Rejects duplicated Tasks and finds a Task by description.
+    IndexModel([("description", ASCENDING)], name='description_1',
+               unique=True),
+    # Finds the Tasks by status, in the order of the Identifier.
+    IndexModel([("status", ASCENDING), ("_id", ASCENDING)],
+               name='status_1__id_1'),
+    # Searches the Tasks by the words of the description, ignoring case
+    # and diacritics, without the stemming of a language.
+    IndexModel([("description", TEXT)], name='description_text',
+               default_language='none'),
+)
+
+
+def apply_indexes(collection, indexes=TASK_INDEXES):
+    """
+    Method to create the declared indexes of a collection. Indexes that
+    already exist with the same keys and options are kept, so it can be
+    executed on every startup.
+
+    :param collection: Collection of the indexes.
+    :type collection: pymongo.collection.Collection
+    :param indexes: Declared indexes.
+    :type indexes: tuple
+    :return: Names of the indexes.
+    :rtype: list
+    """
+    return collection.create_indexes(list(indexes))
+
+
+def index_keys(indexes=TASK_INDEXES):
+    """
+    Method to list the keys of the declared indexes, including the
+    index created by MongoDB on _id.
+
+    :param indexes: Declared indexes.
+    :type indexes: tuple
+    :return: Name and keys (field, direction) of each index.
+    :rtype: list
+    """
+    return [ID_INDEX] + [(index.document.get('name'),
+                          tuple(index.document.get('key').items()))
+                         for index in indexes]
+
+
+def index_for_query(query, sort=None, indexes=TASK_INDEXES):
+    """
+    Method to find a declared index the query planner can use for a
+    query, without asking the database: an index with a constraint on
+    its first field, or, for a query without such a constraint, an index
+    whose first fields are the fields of the sort.
+
+    :param query: Constraints of the query.
+    :type query: dict
+    :param sort: Sort of the query, as (field, direction) pairs.
+    :type sort: list
+    :param indexes: Declared indexes.
+    :type indexes: tuple
+    :return: Name of the index, or None if the query scans the
+    collection.
+    :rtype: str
+    """
+    fields = [field for field in (query or {}) if not field.startswith('$')]
+    candidates = index_keys(indexes)
+
+    text = [name for name, keys in candidates if TEXT in dict(keys).values()]
+    if '$text' in (query or {}):
+        return text[0] if text else None
+
+    candidates = [(name, keys) for name, keys in candidates
+                  if name not in text]
+    for name, keys in candidates:
+        if keys[0][0] in fields:
+            return name
+
+    if sort:
+        sort_fields = [field for field, _ in sort]
+        for name, keys in candidates:
+            if [field for field, _ in keys[:len(sort_fields)]] \
+                    == sort_fields:
+                return name
+    return None
@@ -0,0 +1,570 @@
+"""
+In-memory storage of the Tasks
+"""
+import bisect
+import os
+import tempfile
+import threading
+import bson
+from pymongo.errors import DuplicateKeyError
+from src.model.task import Task
+from src.repository.indexes import TASK_INDEXES
+from src.repository.store import DUPLICATE_KEY_ERROR, TaskStore
+from src.repository.text_index import TextIndex
+
+
+def duplicate_key(name, values):
+    """
+    Method to build the error of MongoDB for a duplicated key.
+
+    :param name: Name of the unique index.
+    :type name: str
+    :param values: Values of the fields of the index.
+    :type values: dict
+    :return: The error.
+    :rtype: pymongo.errors.DuplicateKeyError
+    """
+    message = 'E11000 duplicate key error index: %s dup key: %r' \
+        % (name, values)
+    return DuplicateKeyError(message, DUPLICATE_KEY_ERROR,
+                             {"code": DUPLICATE_KEY_ERROR,
+                              "errmsg": message, "keyValue": values})
+
+
+def project(document, fields):
+    """
+    Method to copy the fields of a document required by a query.
+
+    :param document: Task or counter document.
+    :type document: dict
+    :param fields: Fields required ({field: True}), or None for all. The
+    _id is always copied, unless it is excluded.
+    :type fields: dict
+    :return: Copy of the document.
+    :rtype: dict
+    """
+    if not fields:
+        return dict(document)
+    copy = {field: value for field, value in document.items()
+            if fields.get(field)}
+    if fields.get('_id', True) and '_id' in document:
+        copy["_id"] = document['_id']
+    return copy
+
+
+def prefix_end(prefix):
+    """
+    Method to find the first string after all the strings that start
+    with a prefix, the end of the range of the prefix in a sorted list.
+
+    :param prefix: Prefix, not empty.
+    :type prefix: str
+    :return: End of the range.
+    :rtype: str
+    """
+    return prefix[:-1] + chr(ord(prefix[-1]) + 1)
+
+
+class MemoryTaskStore(TaskStore):
+    """
+    Class to keep the Tasks and the counters in the memory of the
+    process, with the same operations (and errors) of MongoTaskStore.
+    The Tasks are kept by Identifier, with a sorted list of the
+    Identifiers (for ranges and the order of the pages), a sorted list
+    of the Identifiers of each status, a unique index of the
+    descriptions and a sorted list of them (for prefixes and the order by
+    description), and the inverted index of the words of the
+    descriptions. Every operation runs under a lock, and the results are
+    copied before it is released, so they never change afterwards.
+
+    With a snapshot file, the Tasks and counters are loaded from it when
+    the store is created, and written to it by save (and close).
+    """
+    def __init__(self, snapshot_path=None):
+        """
+        :param snapshot_path: File of the snapshot, or None.
+        :type snapshot_path: str
+        """
+        self.snapshot_path = snapshot_path
+        self.lock = threading.RLock()
+        self._clear()
+        if snapshot_path and os.path.exists(snapshot_path):
+            self.load(snapshot_path)
+
+    def _clear(self):
+        self.tasks = {}
+        self.ids = []
+        self.ids_by_status = {False: [], True: []}
+        self.descriptions = {}
+        self.sorted_descriptions = []
+        self.text_index = TextIndex()
+        self.counters = {}
+
+    def _add(self, task):
+        """
+        Method to store a Task in the indexes.
+        :param task: Task document, with _id, description and status.
+        :type task: dict
+        :raises pymongo.errors.DuplicateKeyError: If the Identifier or
+        the Description already exist.
+        """
+        task_id = task.get('_id')
+        description = task.get('description')
+        if task_id in self.tasks:
+            raise duplicate_key('_id_', {"_id": task_id})
+        if description in self.descriptions:
+            raise duplicate_key('description_1',
+                                {"description": description})
+        task = {"_id": task_id, "description": description,
+                "status": task.get('status')}
+        self.tasks[task_id] = task
+        bisect.insort(self.ids, task_id)
+        bisect.insort(self.ids_by_status[bool(task['status'])], task_id)
+        self.descriptions[description] = task_id
+        bisect.insort(self.sorted_descriptions, description)
+        self.text_index.add(task)
+
+    def _remove(self, task_id):
+        """
+        Method to remove a Task from the indexes.
+        :param task_id: Identifier of the Task.
+        :type task_id: int
+        :return: The Task removed, or None if it does not exist.
+        :rtype: dict
+        """
+        task = self.tasks.pop(task_id, None)
+        if task is None:
+            return None
+        self._discard(self.ids, task_id)
+        self._discard(self.ids_by_status[bool(task['status'])], task_id)
+        del self.descriptions[task['description']]
+        self._discard(self.sorted_descriptions, task['description'])
+        self.text_index.remove(task_id)
+        return task
+
+    @staticmethod
+    def _discard(values, value):
+        index = bisect.bisect_left(values, value)
+        if index < len(values) and values[index] == value:
+            del values[index]
+
+    def _set(self, task, fields):
+        """
+        Method to change fields of a stored Task, keeping the indexes.
+        :param task: Stored Task.
+        :type task: dict
+        :param fields: New values, by field.
+        :type fields: dict
+        :raises pymongo.errors.DuplicateKeyError: If the new Description
+        already belongs to another Task.
+        """
+        description = fields.get('description', task['description'])
+        if description != task['description']:
+            if description in self.descriptions:
+                raise duplicate_key('description_1',
+                                    {"description": description})
+            del self.descriptions[task['description']]
+            self._discard(self.sorted_descriptions, task['description'])
+            self.descriptions[description] = task['_id']
+            bisect.insort(self.sorted_descriptions, description)
+            task['description'] = description
+            self.text_index.add(task)
+        if 'status' in fields \
+                and bool(fields['status']) != bool(task['status']):
+            self._discard(self.ids_by_status[bool(task['status'])],
+                          task['_id'])
+            bisect.insort(self.ids_by_status[bool(fields['status'])],
+                          task['_id'])
+        if 'status' in fields:
+            task['status'] = fields['status']
+
+    @staticmethod
+    def _matches(task, filters):
+        """
+        Method to test if a Task is matched by the filters.
+        :param task: Task document.
+        :type task: dict
+        :param filters: Filters of the Tasks.
+        :type filters: dict
+        :return: If the Task is matched.
+        :rtype: bool
+        """
+        task_id = filters.get('_id')
+        if isinstance(task_id, (list, tuple, set)):
+            if task['_id'] not in task_id:
+                return False
+        elif task_id is not None and task['_id'] != task_id:
+            return False
+        if filters.get('description') is not None \
+                and task['description'] != filters.get('description'):
+            return False
+        if filters.get('prefix') \
+                and not task['description'].startswith(filters['prefix']):
+            return False
+        return filters.get('status') is None \
+            or task['status'] == filters.get('status')
+
+    def _candidates(self, filters):
+        """
+        Method to find the Identifiers of the Tasks that can be matched
+        by the unique fields of the filters.
+        :param filters: Filters of the Tasks.
+        :type filters: dict
+        :return: Identifiers, or None if the filters have no unique
+        field.
+        :rtype: list
+        """
+        task_id = filters.get('_id')
+        if isinstance(task_id, (list, tuple, set)):
+            return [value for value in set(task_id) if value in self.tasks]
+        if task_id is not None:
+            return [task_id] if task_id in self.tasks else []
+        if filters.get('description') is not None:
+            task_id = self.descriptions.get(filters.get('description'))
+            return [] if task_id is None else [task_id]
+        return None
+
+    @staticmethod
+    def _range(values, after, direction, low=0, high=None):
+        """
+        Method to list the positions of a sorted list after an edge, in
+        the order of the direction.
+        :param values: Sorted list.
+        :type values: list
+        :param after: Edge (excluded), or None.
+        :type after: object
+        :param direction: 1 (ascending) or -1 (descending).
+        :type direction: int
+        :param low: First position of the range.
+        :type low: int
+        :param high: End of the range, or None for the end of the list.
+        :type high: int
+        :return: Positions.
+        :rtype: range
+        """
+        high = len(values) if high is None else high
+        if direction == 1:
+            if after is not None:
+                low = max(low, bisect.bisect_right(values, after))
+            return range(low, high)
+        if after is not None:
+            high = min(high, bisect.bisect_left(values, after))
+        return range(high - 1, low - 1, -1)
+
+    def _walk(self, filters, sort_key, direction, after):
+        """
+        Method to iterate the Identifiers of the Tasks in the order of
+        the sort key, after the edge, from the sorted lists.
+        :return: Identifiers.
+        :rtype: iterator
+        """
+        status = filters.get('status')
+        if sort_key == 'description':
+            values = self.sorted_descriptions
+            low, high = 0, len(values)
+            prefix = filters.get('prefix')
+            if prefix:
+                low = bisect.bisect_left(values, prefix)
+                high = bisect.bisect_left(values, prefix_end(prefix))
+            edge = None if after is None else after[0]
+            for index in self._range(values, edge, direction, low, high):
+                yield self.descriptions[values[index]]
+            return
+
+        if sort_key == '_id':
+            lists = [(None, self.ids if status is None
+                      else self.ids_by_status[bool(status)])]
+        else:
+            lists = [(value, self.ids_by_status[value])
+                     for value in (False, True)
+                     if status is None or value == bool(status)]
+            if direction == -1:
+                lists.reverse()
+        for value, ids in lists:
+            edge = after
+            if sort_key == 'status' and after is not None:
+                if (value - bool(after[0])) * direction < 0:
+                    continue
+                edge = after[1] if value == bool(after[0]) else None
+            for index in self._range(ids, edge, direction):
+                yield ids[index]
+
+    def _select(self, filters, sort_key, direction, after, limit):
+        """
+        Method to read the Tasks matched by the filters, in the order of
+        the sort key, after the edge (see TaskStore.find_tasks).
+        :return: The Task documents (not copied).
+        :rtype: list
+        """
+        candidates = self._candidates(filters)
+        if candidates is None and filters.get('prefix') \
+                and sort_key != 'description':
+            values = self.sorted_descriptions
+            prefix = filters.get('prefix')
+            candidates = [self.descriptions[values[index]] for index in
+                          range(bisect.bisect_left(values, prefix),
+                                bisect.bisect_left(values,
+                                                   prefix_end(prefix)))]
+
+        if candidates is None:
+            tasks = []
+            for task_id in self._walk(filters, sort_key, direction, after):
+                task = self.tasks[task_id]
+                if self._matches(task, filters):
+                    tasks.append(task)
+                    if len(tasks) == limit:
+                        break
+            return tasks
+
+        def key(task):
+            if sort_key == 'status':
+                return bool(task['status']), task['_id']
+            return task[sort_key]
+
+        tasks = sorted((self.tasks[task_id] for task_id in candidates
+                        if self._matches(self.tasks[task_id], filters)),
+                       key=key, reverse=direction == -1)
+        if after is not None:
+            edge = after if sort_key == '_id' \
+                else (bool(after[0]), after[1]) if sort_key == 'status' \
+                else after[0]
+            tasks = [task for task in tasks
+                     if (key(task) > edge if direction == 1
+                         else key(task) < edge)]
+        return tasks[:limit] if limit else tasks
+
+    def find_one(self, field, value, fields=None):
+        with self.lock:
+            if field == 'description':
+                value = self.descriptions.get(value)
+            task = self.tasks.get(value)
+            return None if task is None else project(task, fields)
+
+    def find(self, filters, fields=None):
+        with self.lock:
+            return iter([project(task, fields) for task in
+                         self._select(filters, '_id', 1, None, 0)])
+
+    def find_tasks(self, filters, sort_key='_id', direction=1, after=None,
+                   limit=0, batch_size=None):
+        with self.lock:
+            return iter([Task.from_document(task) for task in
+                         self._select(filters, sort_key, direction, after,
+                                      limit)])
+
+    def search(self, text, skip, limit):
+        with self.lock:
+            return self.text_index.search(text)[skip:skip + limit]
+
+    def statuses(self, task_ids):
+        with self.lock:
+            return {task_id: bool(self.tasks[task_id]['status'])
+                    for task_id in set(task_ids) if task_id in self.tasks}
+
+    def count(self):
+        with self.lock:
+            return len(self.tasks), len(self.ids_by_status[True])
+
+    def duplicates(self):
+        # The Descriptions are unique since the Tasks are stored.
+        return []
+
+    def insert(self, task):
+        with self.lock:
+            self._add(task)
+
+    def insert_many(self, tasks):
+        errors = {}
+        with self.lock:
+            for index, task in enumerate(tasks):
+                try:
+                    self._add(task)
+                except DuplicateKeyError as error:
+                    errors[index] = dict(error.details, index=index)
+        return errors
+
+    def update(self, task_id, fields):
+        with self.lock:
+            task = self.tasks.get(task_id)
+            if task is None:
+                return None
+            previous = dict(task)
+            self._set(task, fields)
+            return previous
+
+    def update_many(self, updates):
+        errors = {}
+        matched = 0
+        with self.lock:
+            for index, (task_id, fields) in enumerate(updates):
+                task = self.tasks.get(task_id)
+                if task is None:
+                    continue
+                try:
+                    self._set(task, fields)
+                    matched += 1
+                except DuplicateKeyError as error:
+                    errors[index] = dict(error.details, index=index)
+        return errors, matched
+
+    def update_status_by_description(self, description, status):
+        with self.lock:
+            task_id = self.descriptions.get(description)
+            if task_id is None:
+                return None
+            return project(self.update(task_id, {"status": status}),
+                           {"status": True})
+
+    def upsert_status(self, description, status, task_id):
+        with self.lock:
+            task = self.tasks.get(self.descriptions.get(description))
+            if task is None:
+                self._add({"_id": task_id, "description": description,
+                           "status": status})
+                return None
+            previous = project(task, {"status": True})
+            self._set(task, {"status": status})
+            return previous
+
+    def toggle(self, task_id):
+        with self.lock:
+            task = self.tasks.get(task_id)
+            if task is None:
+                return None
+            self._set(task, {"status": not task['status']})
+            return dict(task)
+
+    def toggle_many(self, task_ids):
+        written = []
+        finished = 0
+        with self.lock:
+            for task_id in task_ids:
+                task = self.toggle(task_id)
+                if task is not None:
+                    written.append(task_id)
+                    finished += 1 if task.get('status') else -1
+        return written, [], finished
+
+    def delete(self, task_id):
+        with self.lock:
+            task = self._remove(task_id)
+            return None if task is None else project(task, {"status": True})
+
+    def delete_many(self, task_ids):
+        with self.lock:
+            return sum(1 for task_id in set(task_ids)
+                       if self._remove(task_id) is not None)
+
+    def reserve_ids(self, count):
+        with self.lock:
+            counter = self.counters.get('task')
+            if counter is None:
+                # The counter starts from the max Identifier stored.
+                counter = self.counters['task'] = {
+                    "_id": "task", "seq": self.ids[-1] if self.ids else 0}
+            counter['seq'] += count
+            return counter['seq']
+
+    def counter(self, name):
+        with self.lock:
+            counter = self.counters.get(name)
+            return None if counter is None else dict(counter)
+
+    def increment(self, name, values, on_insert=None):
+        with self.lock:
+            counter = self.counters.get(name)
+            if counter is None:
+                if on_insert is None:
+                    return None
+                counter = self.counters[name] = dict(on_insert, _id=name)
+            for field, value in values.items():
+                counter[field] = counter.get(field, 0) + value
+            return dict(counter)
+
+    def increment_if(self, name, revision, values):
+        with self.lock:
+            counter = self.counters.get(name)
+            if counter is None or counter.get('rev', 0) != revision:
+                return False
+            self.increment(name, values)
+            return True
+
+    def set_counter(self, name, values):
+        with self.lock:
+            self.counters.setdefault(name, {"_id": name}).update(values)
+
+    def acquire_lease(self, name, now, until):
+        with self.lock:
+            lease = self.counters.get(name)
+            if lease is not None and lease.get('until', 0) >= now:
+                return False
+            self.counters[name] = {"_id": name, "until": until,
+                                   "pid": os.getpid()}
+            return True
+
+    def create_indexes(self):
+        # The indexes are kept since the store is created.
+        return [index.document.get('name') for index in TASK_INDEXES]
+
+    def drop(self):
+        with self.lock:
+            self._clear()
+
+    def save(self, path=None):
+        """
+        Method to write all the Tasks and counters to a snapshot file (a
+        sequence of BSON documents). The file is replaced only after it
+        is completely written.
+        :param path: File of the snapshot, or None for snapshot_path.
+        :type path: str
+        :return: Amount of documents written, or None if there is no
+        snapshot file.
+        :rtype: int
+        """
+        path = path or self.snapshot_path
+        if not path:
+            return None
+        directory = os.path.dirname(os.path.abspath(path))
+        count = 0
+        handle, temporary = tempfile.mkstemp(dir=directory,
+                                             suffix='.tmp')
+        try:
+            with os.fdopen(handle, 'wb') as snapshot, self.lock:
+                for task_id in self.ids:
+                    snapshot.write(bson.encode({"task":
+                                                self.tasks[task_id]}))
+                    count += 1
+                for counter in self.counters.values():
+                    snapshot.write(bson.encode({"counter": counter}))
+                    count += 1
+            os.replace(temporary, path)
+        except BaseException:
+            os.remove(temporary)
+            raise
+        return count
+
+    def load(self, path):
+        """
+        Method to read the Tasks and counters of a snapshot file.
+        :param path: File of the snapshot.
+        :type path: str
+        :return: Amount of documents read.
+        :rtype: int
+        """
+        count = 0
+        with open(path, 'rb') as snapshot, self.lock:
+            for record in bson.decode_file_iter(snapshot):
+                if 'task' in record:
+                    self._add(record['task'])
+                else:
+                    counter = record['counter']
+                    self.counters[counter['_id']] = counter
+                count += 1
+        return count
+
+    def close(self):
+        """
+        Method to write the snapshot, if the store has a snapshot file.
+        """
+        if self.snapshot_path:
+            self.save()
@@ -0,0 +1,490 @@
+"""
+Storage of the Tasks in MongoDB (or mongomock)
+"""
+import os
+import re
+from pymongo import ReturnDocument, UpdateOne
+from pymongo.errors import BulkWriteError, DuplicateKeyError
+from src.model.task import CODEC_OPTIONS, PROJECTION, Task
+from src.repository.indexes import apply_indexes
+from src.repository.store import SORT_KEYS, TaskStore
+from src.repository.text_index import TextIndex
+
+# Update pipeline that flips the status of a Task on the server.
+TOGGLE_PIPELINE = [{"$set": {"status": {"$not": ["$status"]}}}]
+
+# First version of MongoDB whose updates accept aggregation pipelines.
+PIPELINE_UPDATES_VERSION = (4, 2)
+
+
+def task_query(filters):
+    """
+    Method to build the MongoDB query of the filters of the Tasks (see
+    TaskStore), backed by the indexes of the collection: status uses the
+    index on status and Identifier, and the prefix of the Description is
+    an anchored regular expression, which uses the index on description.
+
+    :param filters: Filters of the Tasks.
+    :type filters: dict
+    :return: Query.
+    :rtype: dict
+    """
+    query = {}
+    task_id = filters.get('_id')
+    if isinstance(task_id, (list, tuple, set)):
+        query["_id"] = {"$in": list(task_id)}
+    elif task_id is not None:
+        query["_id"] = task_id
+    if filters.get('description') is not None:
+        query["description"] = filters.get('description')
+    if filters.get('prefix'):
+        query["description"] = {"$regex": '^'
+                                + re.escape(filters.get('prefix'))}
+    if filters.get('status') is not None:
+        query["status"] = filters.get('status')
+    return query
+
+
+def sort_spec(sort_key='_id', direction=1):
+    """
+    Method to build the sort of a query of Tasks.
+
+    :param sort_key: Field of the sort (see SORT_KEYS).
+    :type sort_key: str
+    :param direction: 1 (ascending) or -1 (descending).
+    :type direction: int
+    :return: Sort, as (field, direction) pairs.
+    :rtype: list
+    """
+    sort = [(sort_key, direction)]
+    if not SORT_KEYS[sort_key]:
+        sort.append(("_id", direction))
+    return sort
+
+
+def keyset(sort_key, edge, operator):
+    """
+    Method to build the constraints of the Tasks after (or before) the
+    edge of a page, in the order of the sort key.
+
+    :param sort_key: Field of the sort (see SORT_KEYS).
+    :type sort_key: str
+    :param edge: Identifier of the Task in the edge, or, if the sort key
+    is not the Identifier, its value and the Identifier.
+    :type edge: int or tuple
+    :param operator: $gt or $lt.
+    :type operator: str
+    :return: Constraints of the query.
+    :rtype: dict
+    """
+    if sort_key == '_id':
+        return {"_id": {operator: edge}}
+    value, task_id = edge
+    if SORT_KEYS[sort_key]:
+        return {sort_key: {operator: value}}
+    return {"$or": [{sort_key: {operator: value}},
+                    {sort_key: value, "_id": {operator: task_id}}]}
+
+
+def merge(query, constraints):
+    """
+    Method to add constraints to a query, merging the ones over the same
+    field.
+
+    :param query: Query.
+    :type query: dict
+    :param constraints: Constraints to be added.
+    :type constraints: dict
+    :return: All the constraints.
+    :rtype: dict
+    """
+    merged = dict(query)
+    for field, constraint in constraints.items():
+        if isinstance(merged.get(field), dict):
+            merged[field] = {**merged[field], **constraint}
+        else:
+            merged[field] = constraint
+    return merged
+
+
+def page_query(filters, sort_key='_id', direction=1, after=None):
+    """
+    Method to build the query and the sort of the Tasks after the edge
+    of a page (keyset), so every page costs the same.
+
+    :param filters: Filters of the Tasks.
+    :type filters: dict
+    :param sort_key: Field of the sort (see SORT_KEYS).
+    :type sort_key: str
+    :param direction: 1 (ascending) or -1 (descending).
+    :type direction: int
+    :param after: Edge after which the page starts, or None.
+    :type after: int or tuple
+    :return: Query and sort.
+    :rtype: tuple(dict, list)
+    """
+    query = task_query(filters)
+    if after is not None:
+        query = merge(query, keyset(sort_key, after,
+                                    '$gt' if direction == 1 else '$lt'))
+    return query, sort_spec(sort_key, direction)
+
+
+def write_errors(error):
+    """
+    Method to index the write errors of a failed bulk operation by the
+    position of the operation.
+
+    :param error: Error raised by the bulk operation.
+    :type error: pymongo.errors.BulkWriteError
+    :return: The write errors, by index.
+    :rtype: dict
+    """
+    return {write_error.get('index'): write_error
+            for write_error in error.details.get('writeErrors', [])}
+
+
+def supports_pipeline_updates(build_info):
+    """
+    Method to check if a server accepts update pipelines, from the
+    output of its buildInfo command. mongomock reports an older version.
+
+    :param build_info: Output of buildInfo (MongoClient.server_info).
+    :type build_info: dict
+    :return: If the updates can be aggregation pipelines.
+    :rtype: bool
+    """
+    version = tuple(build_info.get('versionArray', ())[:2])
+    return version >= PIPELINE_UPDATES_VERSION
+
+
+class MongoTaskStore(TaskStore):
+    """
+    Class to keep the Tasks in the task collection of a MongoDB database,
+    and the counters in its counters collection. Also used over
+    mongomock: the support of update pipelines is probed once, by the
+    version of the server, and the other missing features (text search
+    and codec options) are detected on the first use.
+    """
+    def __init__(self, database, client=None):
+        """
+        :param database: Database of the application.
+        :type database: pymongo.database.Database
+        :param client: Client of the database, pinged by ping, or None.
+        :type client: pymongo.MongoClient
+        """
+        self.db = database
+        self.client = client
+        self._pipeline_updates = None
+        self._text_search = True
+        self._task_codec = True
+        self._text_index = None
+
+    def _written(self):
+        # The inverted index used without text search is rebuilt after
+        # the writes of the process (mongomock only runs in the process).
+        self._text_index = None
+
+    @property
+    def pipeline_updates(self):
+        """
+        :return: If the server accepts update pipelines, probed once by
+        its buildInfo.
+        :rtype: bool
+        """
+        if self._pipeline_updates is None:
+            client = self.client if self.client is not None \
+                else self.db.client
+            self._pipeline_updates = \
+                supports_pipeline_updates(client.server_info())
+        return self._pipeline_updates
+
+    def _task_collection(self):
+        """
+        Method to return the Task collection decoding the documents
+        directly into Task, or, if the backend can not (mongomock), the
+        Task collection decoding them into dicts.
+        :return: Task collection, and if it decodes into Task.
+        :rtype: tuple(pymongo.collection.Collection, bool)
+        """
+        if self._task_codec:
+            try:
+                return self.db.task.with_options(
+                    codec_options=CODEC_OPTIONS), True
+            except NotImplementedError:
+                self._task_codec = False
+        return self.db.task, False
+
+    def find_one(self, field, value, fields=None):
+        return self.db.task.find_one({field: value}, fields)
+
+    def find(self, filters, fields=None):
+        return self.db.task.find(task_query(filters), fields)
+
+    def find_tasks(self, filters, sort_key='_id', direction=1, after=None,
+                   limit=0, batch_size=None):
+        query, sort = page_query(filters, sort_key, direction, after)
+        collection, decoded = self._task_collection()
+        cursor = collection.find(query, PROJECTION).sort(sort)
+        if limit:
+            cursor = cursor.limit(limit)
+        if batch_size:
+            cursor = cursor.batch_size(batch_size)
+        return cursor if decoded else map(Task.from_document, cursor)
+
+    def search(self, text, skip, limit):
+        if self._text_search:
+            try:
+                return list(self.db.task.find(
+                    {"$text": {"$search": text}},
+                    {"_id": True, "description": True, "status": True,
+                     "score": {"$meta": "textScore"}})
+                    .sort([("score", {"$meta": "textScore"}), ("_id", 1)])
+                    .skip(skip).limit(limit))
+            except NotImplementedError:
+                self._text_search = False
+
+        text_index = self._text_index
+        if text_index is None:
+            text_index = self._text_index = TextIndex(self.db.task.find(
+                {}, {"_id": True, "description": True, "status": True}))
+        return text_index.search(text)[skip:skip + limit]
+
+    def statuses(self, task_ids):
+        return {task.get('_id'): bool(task.get('status')) for task in
+                self.db.task.find({"_id": {"$in": list(set(task_ids))}},
+                                  {"status": True})}
+
+    def count(self):
+        groups = list(self.db.task.aggregate([
+            {"$group": {"_id": None, "total": {"$sum": 1},
+                        "finished": {"$sum": {"$cond": ["$status", 1, 0]}}}}
+        ]))
+        if not groups:
+            return 0, 0
+        return groups[0].get('total'), groups[0].get('finished')
+
+    def duplicates(self):
+        groups = self.db.task.aggregate([
+            {"$group": {"_id": "$description", "ids": {"$push": "$_id"},
+                        "count": {"$sum": 1}}},
+            {"$match": {"count": {"$gt": 1}}}])
+        task_ids = []
+        for group in groups:
+            task_ids.extend(sorted(group.get('ids'))[1:])
+        return sorted(task_ids)
+
+    def insert(self, task):
+        try:
+            self.db.task.insert_one(dict(task))
+        finally:
+            self._written()
+
+    def insert_many(self, tasks):
+        if not tasks:
+            return {}
+        try:
+            self.db.task.insert_many([dict(task) for task in tasks],
+                                     ordered=False)
+        except BulkWriteError as error:
+            return write_errors(error)
+        finally:
+            self._written()
+        return {}
+
+    def update(self, task_id, fields):
+        try:
+            return self.db.task.find_one_and_update(
+                {"_id": task_id}, {"$set": fields}, projection=PROJECTION,
+                return_document=ReturnDocument.BEFORE)
+        finally:
+            self._written()
+
+    def update_many(self, updates):
+        if not updates:
+            return {}, 0
+        try:
+            result = self.db.task.bulk_write(
+                [UpdateOne({"_id": task_id}, {"$set": fields})
+                 for task_id, fields in updates], ordered=False)
+        except BulkWriteError as error:
+            return write_errors(error), error.details.get('nMatched', 0)
+        finally:
+            self._written()
+        return {}, result.matched_count
+
+    def update_status_by_description(self, description, status):
+        return self.db.task.find_one_and_update(
+            {"description": description}, {"$set": {"status": status}},
+            projection={"status": True},
+            return_document=ReturnDocument.BEFORE)
+
+    def upsert_status(self, description, status, task_id):
+        # The description of a new Task is taken from the query.
+        return self.db.task.find_one_and_update(
+            {"description": description},
+            {"$set": {"status": status}, "$setOnInsert": {"_id": task_id}},
+            projection={"status": True}, upsert=True,
+            return_document=ReturnDocument.BEFORE)
+
+    def toggle(self, task_id):
+        if self.pipeline_updates:
+            return self.db.task.find_one_and_update(
+                {"_id": task_id}, TOGGLE_PIPELINE, projection=PROJECTION,
+                return_document=ReturnDocument.AFTER)
+
+        # Backends without update pipelines (MongoDB < 4.2 or mongomock)
+        # use a compare-and-set instead.
+        while True:
+            task = self.db.task.find_one({"_id": task_id}, PROJECTION)
+            if task is None:
+                return None
+            status = not task.get('status')
+            result = self.db.task.update_one(
+                {"_id": task_id, "status": task.get('status')},
+                {"$set": {"status": status}})
+            if result.matched_count:
+                return dict(task, status=status)
+
+    def toggle_many(self, task_ids):
+        """
+        Method to flip the status of many Tasks. With update pipelines,
+        the statuses are read in a single query, and the toggles are
+        written in a single unordered bulk write; the change in the
+        statistics comes from the statuses read, so a Task toggled by
+        another process between the read and the write is left to the
+        periodic reconcile_stats. Where pipelines are not supported,
+        each Task is toggled with a compare-and-set (see toggle).
+        """
+        if self.pipeline_updates:
+            before = self.statuses(task_ids)
+            ids = list(before)
+            failed = set()
+            result = None
+            try:
+                if ids:
+                    result = self.db.task.bulk_write(
+                        [UpdateOne({"_id": task_id}, TOGGLE_PIPELINE)
+                         for task_id in ids], ordered=False)
+            except BulkWriteError as error:
+                failed = {ids[index] for index in write_errors(error)}
+
+            written = [task_id for task_id in ids if task_id not in failed]
+            if result is None or result.matched_count < len(ids):
+                # Some Tasks may have been deleted after the read.
+                existing = self.statuses(written)
+                written = [task_id for task_id in written
+                           if task_id in existing]
+            return written, sorted(failed), \
+                sum(-1 if before[task_id] else 1 for task_id in written)
+
+        written = []
+        finished = 0
+        for task_id in task_ids:
+            task = self.toggle(task_id)
+            if task is not None:
+                written.append(task_id)
+                finished += 1 if task.get('status') else -1
+        return written, [], finished
+
+    def delete(self, task_id):
+        try:
+            return self.db.task.find_one_and_delete(
+                {"_id": task_id}, projection={"status": True})
+        finally:
+            self._written()
+
+    def delete_many(self, task_ids):
+        try:
+            return self.db.task.delete_many(
+                {"_id": {"$in": list(task_ids)}}).deleted_count
+        finally:
+            self._written()
+
+    def reserve_ids(self, count):
+        counter = self.db.counters.find_one_and_update(
+            {"_id": "task"}, {"$inc": {"seq": count}},
+            return_document=ReturnDocument.AFTER)
+
+        if counter is None:
+            # The counter starts from the max Identifier already stored.
+            max_id = 0
+            for task in self.db.task.find({}, {"_id": True})\
+                    .sort("_id", -1).limit(1):
+                max_id = task.get('_id')
+            self._upsert_counter("task", {"$max": {"seq": max_id}})
+            counter = self.db.counters.find_one_and_update(
+                {"_id": "task"}, {"$inc": {"seq": count}},
+                upsert=True, return_document=ReturnDocument.AFTER)
+
+        return counter.get('seq')
+
+    def _upsert_counter(self, name, update, on_insert=None):
+        """
+        Method to update a counter, creating it if it does not exist.
+        :param name: Name of the counter.
+        :type name: str
+        :param update: Update of the counter.
+        :type update: dict
+        :param on_insert: Values of the fields of a new counter.
+        :type on_insert: dict
+        :return: The counter after the update.
+        :rtype: dict
+        """
+        try:
+            return self.db.counters.find_one_and_update(
+                {"_id": name},
+                dict(update, **{"$setOnInsert": on_insert})
+                if on_insert else update, upsert=True,
+                return_document=ReturnDocument.AFTER)
+        except DuplicateKeyError:
+            # Another worker created the counter at the same time.
+            return self.db.counters.find_one_and_update(
+                {"_id": name}, update,
+                return_document=ReturnDocument.AFTER)
+
+    def counter(self, name):
+        return self.db.counters.find_one({"_id": name})
+
+    def increment(self, name, values, on_insert=None):
+        if on_insert is None:
+            return self.db.counters.find_one_and_update(
+                {"_id": name}, {"$inc": values},
+                return_document=ReturnDocument.AFTER)
+        return self._upsert_counter(name, {"$inc": values}, on_insert)
+
+    def increment_if(self, name, revision, values):
+        # A counter without the field has the revision 0.
+        result = self.db.counters.update_one(
+            {"_id": name, "rev": revision or {"$in": [0, None]}},
+            {"$inc": values})
+        return result.matched_count == 1
+
+    def set_counter(self, name, values):
+        self._upsert_counter(name, {"$set": values})
+
+    def acquire_lease(self, name, now, until):
+        try:
+            # Only an expired (or missing) lease matches; otherwise the
+            # upsert inserts a second document with the same _id.
+            self.db.counters.update_one(
+                {"_id": name, "until": {"$lt": now}},
+                {"$set": {"until": until, "pid": os.getpid()}},
+                upsert=True)
+        except DuplicateKeyError:
+            return False
+        return True
+
+    def create_indexes(self):
+        return apply_indexes(self.db.task)
+
+    def ping(self):
+        if self.client is not None:
+            self.client.admin.command('ping')
+            # Probed while connecting, instead of on the first toggle.
+            self._pipeline_updates = \
+                supports_pipeline_updates(self.client.server_info())
+
+    def drop(self):
+        self.db.client.drop_database(self.db.name)
+        self._written()
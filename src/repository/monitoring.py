@@ -0,0 +1,321 @@
+"""
+Monitoring of the commands sent to MongoDB
+"""
+import json
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from pymongo import monitoring
+
+IGNORED_COMMANDS = {'isMaster', 'ismaster', 'hello', 'ping', 'saslStart',
+                    'saslContinue', 'authenticate', 'getnonce',
+                    'endSessions'}
+
+
+def query_shape(value):
+    """
+    Method to remove the values of a query, keeping its fields and
+    operators, so queries that differ only by values have the same
+    shape (and no data of the Tasks is kept).
+
+    :param value: Query, or a value inside it.
+    :type value: object
+    :return: Shape of the query.
+    :rtype: object
+    """
+    if isinstance(value, dict):
+        return {key: query_shape(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)) and value \
+            and isinstance(value[0], dict):
+        return [query_shape(item) for item in value]
+    return '?'
+
+
+def command_query(command_name, command):
+    """
+    Method to find the query (filter) and sort of a command.
+
+    :param command_name: Name of the command.
+    :type command_name: str
+    :param command: Command document.
+    :type command: dict
+    :return: The filter and the sort of the command, or None if it has
+    none.
+    :rtype: tuple(dict, dict)
+    """
+    if command_name == 'find':
+        return command.get('filter', {}), command.get('sort')
+    if command_name == 'findAndModify':
+        return command.get('query', {}), command.get('sort')
+    if command_name in ('count', 'distinct'):
+        return command.get('query', {}), None
+    if command_name == 'update' and command.get('updates'):
+        return command['updates'][0].get('q', {}), None
+    if command_name == 'delete' and command.get('deletes'):
+        return command['deletes'][0].get('q', {}), None
+    if command_name == 'aggregate' and command.get('pipeline'):
+        return command['pipeline'][0].get('$match'), None
+    return None, None
+
+
+def plan_stages(plan):
+    """
+    Method to list the stages of a query plan (explain output), from
+    the root to the leaves.
+
+    :param plan: Query plan.
+    :type plan: dict
+    :return: Names of the stages.
+    :rtype: list
+    """
+    stages = []
+    plans = [plan] if plan else []
+    while plans:
+        current = plans.pop(0)
+        if current.get('stage'):
+            stages.append(current.get('stage'))
+        if current.get('inputStage'):
+            plans.append(current.get('inputStage'))
+        plans.extend(current.get('inputStages', []))
+    return stages
+
+
+def plan_indexes(plan):
+    """
+    Method to list the indexes read by a query plan (explain output).
+
+    :param plan: Query plan.
+    :type plan: dict
+    :return: Names of the indexes, without repetitions.
+    :rtype: list
+    """
+    indexes = []
+    plans = [plan] if plan else []
+    while plans:
+        current = plans.pop(0)
+        if current.get('indexName') and \
+                current.get('indexName') not in indexes:
+            indexes.append(current.get('indexName'))
+        if current.get('inputStage'):
+            plans.append(current.get('inputStage'))
+        plans.extend(current.get('inputStages', []))
+    return indexes
+
+
+def explain_summary(output):
+    """
+    Method to summarize the explain output of a query: the stages and
+    indexes of the winning plan, and the amount of keys and documents
+    examined. The parsed query, the bounds of the indexes and the other
+    fields, which have the values of the query, are left out.
+
+    :param output: Explain output.
+    :type output: dict
+    :return: Summary of the plan.
+    :rtype: dict
+    """
+    plan = output.get('queryPlanner', {}).get('winningPlan', {})
+    stages = plan_stages(plan)
+    execution = output.get('executionStats', {})
+    return {"stages": stages, "indexes": plan_indexes(plan),
+            "collscan": 'COLLSCAN' in stages,
+            "keys_examined": execution.get('totalKeysExamined'),
+            "docs_examined": execution.get('totalDocsExamined'),
+            "returned": execution.get('nReturned')}
+
+
+class CommandMonitor(monitoring.CommandListener):
+    """
+    Class to listen the commands sent by the MongoDB client: records
+    the duration by command, keeps the last commands slower than a
+    threshold, and optionally explains the slow find shapes in a
+    background thread.
+    """
+    def __init__(self, threshold_ms, explain=None, log=None,
+                 max_entries=100):
+        """
+        :param threshold_ms: Duration, in milliseconds, from which a
+        command is slow.
+        :type threshold_ms: float
+        :param explain: Function receiving database, collection, filter
+        and sort, and returning the explain output of the query, or
+        None to not explain.
+        :type explain: function
+        :param log: Logger of the slow commands.
+        :type log: logging.Logger
+        :param max_entries: Max amount of slow commands and explained
+        shapes kept.
+        :type max_entries: int
+        """
+        self.threshold_ms = threshold_ms
+        self.explain = explain
+        self.log = log
+        self.max_entries = max_entries
+        self.commands = {}
+        self.slow = deque(maxlen=max_entries)
+        self.explains = {}
+        self._running = {}
+        self._pending = []
+        self._executor = None
+        self._lock = threading.Lock()
+
+    def started(self, event):
+        """
+        Method executed when a command is sent.
+        :param event: Event of the command.
+        :type event: pymongo.monitoring.CommandStartedEvent
+        """
+        if event.command_name in IGNORED_COMMANDS:
+            return
+        query, sort = command_query(event.command_name, event.command)
+        self._running[(event.connection_id, event.request_id)] = \
+            (event.database_name, event.command.get(event.command_name),
+             query, sort)
+
+    def succeeded(self, event):
+        """
+        Method executed when a command finishes with success.
+        :param event: Event of the command.
+        :type event: pymongo.monitoring.CommandSucceededEvent
+        """
+        self._finished(event, failed=False)
+
+    def failed(self, event):
+        """
+        Method executed when a command fails.
+        :param event: Event of the command.
+        :type event: pymongo.monitoring.CommandFailedEvent
+        """
+        self._finished(event, failed=True)
+
+    def _finished(self, event, failed):
+        """
+        Method to record the duration of a finished command, and keep
+        it if it is slow.
+        :param event: Event of the command.
+        :type event: pymongo.monitoring.CommandSucceededEvent
+        :param failed: If the command failed.
+        :type failed: bool
+        """
+        running = self._running.pop((event.connection_id,
+                                     event.request_id), None)
+        if running is None:
+            return
+        database, collection, query, sort = running
+        duration_ms = event.duration_micros / 1000
+
+        with self._lock:
+            stats = self.commands.setdefault(
+                event.command_name,
+                {"count": 0, "failures": 0, "total_ms": 0.0, "max_ms": 0.0})
+            stats["count"] += 1
+            stats["failures"] += 1 if failed else 0
+            stats["total_ms"] += duration_ms
+            stats["max_ms"] = max(stats["max_ms"], duration_ms)
+
+        if duration_ms < self.threshold_ms:
+            return
+
+        shape = {"command": event.command_name, "collection": collection,
+                 "filter": None if query is None else query_shape(query),
+                 "sort": None if sort is None else query_shape(dict(sort))}
+        key = json.dumps(shape, sort_keys=True, default=str)
+        self.slow.append({"time": time.time(), "duration_ms": duration_ms,
+                          "failed": failed, "shape": shape})
+        if self.log is not None:
+            self.log.warning('Slow MongoDB command (%.1f ms): %s',
+                             duration_ms, key)
+
+        if self.explain is not None and event.command_name == 'find' \
+                and not failed:
+            self._schedule_explain(key, shape, database, collection, query,
+                                   sort)
+
+    def _schedule_explain(self, key, shape, database, collection, query,
+                          sort):
+        """
+        Method to explain a slow find shape in the background, once by
+        shape.
+        """
+        with self._lock:
+            if key in self.explains or len(self.explains) >= \
+                    self.max_entries:
+                return
+            self.explains[key] = {"shape": shape, "status": 'pending'}
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=1)
+            self._pending.append(self._executor.submit(
+                self._run_explain, key, database, collection, query, sort))
+
+    def _run_explain(self, key, database, collection, query, sort):
+        """
+        Method to run the explain of a slow find shape, and keep the
+        summary of its winning plan (see explain_summary), without the
+        values of the query.
+        """
+        try:
+            output = self.explain(database, collection, query, sort)
+            self.explains[key].update(explain_summary(output),
+                                      status='done')
+        except Exception as error:
+            self.explains[key].update({"status": 'failed',
+                                       "error": str(error)})
+
+    def flush(self):
+        """
+        Method to wait for the explains in progress.
+        """
+        with self._lock:
+            pending, self._pending = self._pending, []
+        for future in pending:
+            future.result()
+
+    def report(self):
+        """
+        Method to read what was recorded.
+        :return: Threshold, statistics by command, last slow commands
+        and explained shapes.
+        :rtype: dict
+        """
+        with self._lock:
+            return {"threshold_ms": self.threshold_ms,
+                    "commands": {name: dict(stats) for name, stats
+                                 in self.commands.items()},
+                    "slow": list(self.slow),
+                    "explains": [dict(explain) for explain
+                                 in self.explains.values()]}
+
+
+def create_command_monitor(app):
+    """
+    Method to create the command monitor configured by the application,
+    if MONGO_SLOW_QUERY_MS is defined.
+
+    :param app: Flask application.
+    :type app: flask.Flask
+    :return: The command monitor, or None if it is disabled.
+    :rtype: CommandMonitor
+    """
+    if app.config['MONGO_SLOW_QUERY_MS'] is None:
+        return None
+    return CommandMonitor(app.config['MONGO_SLOW_QUERY_MS'], log=app.logger,
+                          max_entries=app.config['MONGO_SLOW_QUERY_LOG_SIZE'])
+
+
+def client_explain(client):
+    """
+    Method to create the explain function of a command monitor.
+
+    :param client: MongoDB client.
+    :type client: pymongo.MongoClient
+    :return: Function receiving database, collection, filter and sort,
+    and returning the explain output of the query.
+    :rtype: function
+    """
+    def explain(database, collection, query, sort):
+        cursor = client[database][collection].find(query)
+        if sort:
+            cursor = cursor.sort(list(sort.items()))
+        return cursor.explain()
+    return explain
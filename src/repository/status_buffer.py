@@ -0,0 +1,103 @@
+"""
+Write-behind buffer of the status of the Tasks
+"""
+import threading
+
+
+class StatusBuffer:
+    """
+    Class to keep in memory the status changes of the Tasks not written
+    yet. Each Task keeps its stored status and its current one, so
+    repeated toggles are coalesced in one write, and a Task toggled back
+    to the stored status needs no write at all.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        # Held while the buffer is read or written with the database.
+        self.flush_lock = threading.RLock()
+        self.entries = {}
+        self.generation = 0
+
+    def __len__(self):
+        return len(self.entries)
+
+    def status(self, task_id):
+        """
+        Method to read the buffered status of a Task.
+        :param task_id: Identifier of the Task.
+        :type task_id: int
+        :return: The status not written yet, or None if there is none.
+        :rtype: bool
+        """
+        entry = self.entries.get(task_id)
+        return None if entry is None else entry[1]
+
+    def toggle(self, task_id, stored_status):
+        """
+        Method to flip the status of a Task in the buffer.
+        :param task_id: Identifier of the Task.
+        :type task_id: int
+        :param stored_status: Status of the Task in the database, used
+        if the Task is not in the buffer.
+        :type stored_status: bool
+        :return: The new status of the Task.
+        :rtype: bool
+        """
+        with self._lock:
+            original, current = self.entries.get(
+                task_id, (stored_status, stored_status))
+            current = not current
+            if current == original:
+                del self.entries[task_id]
+            else:
+                self.entries[task_id] = (original, current)
+            self.generation += 1
+            return current
+
+    def drain(self):
+        """
+        Method to remove all the entries, to be written.
+        :return: Stored and current status, by Identifier.
+        :rtype: dict
+        """
+        with self._lock:
+            entries, self.entries = self.entries, {}
+            return entries
+
+    def restore(self, entries):
+        """
+        Method to put back entries that could not be written.
+        :param entries: Stored and current status, by Identifier.
+        :type entries: dict
+        """
+        with self._lock:
+            for task_id, entry in entries.items():
+                self.entries.setdefault(task_id, entry)
+            self.generation += 1
+
+    def overlay(self, task):
+        """
+        Method to apply the buffered status to a Task read from the
+        database.
+        :param task: Task read from the database, as dict or Task.
+        :type task: dict
+        :return: The Task (a copy, if the status changed), with the
+        buffered status if there is one.
+        :rtype: dict
+        """
+        status = self.status(task.get('_id')) if task else None
+        if status is None:
+            return task
+        task = task.copy()
+        task['status'] = status
+        return task
+
+    def finished_delta(self):
+        """
+        Method to compute the change in the amount of finished Tasks not
+        written yet.
+        :return: Amount of Tasks finished minus the ones reopened.
+        :rtype: int
+        """
+        return sum(1 if current else -1
+                   for _, current in list(self.entries.values()))
@@ -0,0 +1,357 @@
+"""
+Interface of the storage of the Tasks, behind TaskRepository
+"""
+
+# Code of the error of MongoDB (and of the memory engine) for a unique
+# key that already exists.
+DUPLICATE_KEY_ERROR = 11000
+
+# Sort keys of the Task lists, and if each one is unique. Lists sorted by
+# a key that is not unique are also sorted by Identifier, so the order
+# (and the keyset of the pages) is always the same.
+SORT_KEYS = {"_id": True, "description": True, "status": False}
+
+
+class TaskStore:
+    """
+    Class with the operations a backend implements to keep the Tasks and
+    the counters of the application (see MongoTaskStore and
+    MemoryTaskStore). TaskRepository keeps everything else (the cache,
+    the write-behind buffer, the Identifier blocks, the statistics and
+    the metrics), so a new repository operation is written once, over
+    these operations.
+
+    The filters of the queries are the dicts of
+    TaskRepository.task_filters, with any of: _id (an Identifier, or a
+    list of them), description (the whole Description), prefix (of the
+    Description) and status. The edge of a page is the Identifier of the
+    Task in the edge, or, if the sort key is not the Identifier, its
+    value and the Identifier. Errors are the ones of pymongo, for every
+    backend: DuplicateKeyError when a Description already exists, and
+    OperationFailure when the backend can not execute an operation.
+    """
+    def find_one(self, field, value, fields=None):
+        """
+        Method to read the Task with a unique value.
+        :param field: _id or description.
+        :type field: str
+        :param value: Value of the field.
+        :type value: object
+        :param fields: Fields read ({field: True}), or None for all.
+        :type fields: dict
+        :return: The Task document, or None if it does not exist.
+        :rtype: dict
+        """
+        raise NotImplementedError
+
+    def find(self, filters, fields=None):
+        """
+        Method to read the Tasks matched by the filters, in no specific
+        order.
+        :param filters: Filters of the Tasks.
+        :type filters: dict
+        :param fields: Fields read ({field: True}), or None for all.
+        :type fields: dict
+        :return: Iterator of the Task documents.
+        :rtype: iterator
+        """
+        raise NotImplementedError
+
+    def find_tasks(self, filters, sort_key='_id', direction=1, after=None,
+                   limit=0, batch_size=None):
+        """
+        Method to read the Tasks matched by the filters, in the order of
+        the sort key, as Task.
+        :param filters: Filters of the Tasks.
+        :type filters: dict
+        :param sort_key: Field of the sort (see SORT_KEYS).
+        :type sort_key: str
+        :param direction: 1 (ascending) or -1 (descending).
+        :type direction: int
+        :param after: Edge after which the Tasks start, in the order of
+        the sort, or None.
+        :type after: int or tuple
+        :param limit: Max amount of Tasks, or 0 for all.
+        :type limit: int
+        :param batch_size: Amount of Tasks read at a time, or None for
+        the default of the backend.
+        :type batch_size: int
+        :return: Iterator of the Tasks.
+        :rtype: iterator
+        """
+        raise NotImplementedError
+
+    def search(self, text, skip, limit):
+        """
+        Method to search the Tasks by the words of their descriptions,
+        ranked by relevance (then by Identifier).
+        :param text: Words to be searched.
+        :type text: str
+        :param skip: Amount of Tasks skipped.
+        :type skip: int
+        :param limit: Max amount of Tasks.
+        :type limit: int
+        :return: Task documents, with the score in the field score.
+        :rtype: list
+        """
+        raise NotImplementedError
+
+    def statuses(self, task_ids):
+        """
+        Method to read the status of many Tasks at once.
+        :param task_ids: Identifiers of the Tasks.
+        :type task_ids: list
+        :return: Status of the Tasks found, by Identifier.
+        :rtype: dict
+        """
+        raise NotImplementedError
+
+    def count(self):
+        """
+        Method to count the Tasks over all of them.
+        :return: Amount of Tasks, and of finished Tasks.
+        :rtype: tuple(int, int)
+        """
+        raise NotImplementedError
+
+    def duplicates(self):
+        """
+        Method to find the Tasks with the Description of another Task,
+        except the one with the lowest Identifier.
+        :return: Identifiers of the duplicated Tasks.
+        :rtype: list
+        """
+        raise NotImplementedError
+
+    def insert(self, task):
+        """
+        Method to store a new Task.
+        :param task: Task document, with _id, description and status.
+        :type task: dict
+        :raises pymongo.errors.DuplicateKeyError: If the Identifier or
+        the Description already exist.
+        """
+        raise NotImplementedError
+
+    def insert_many(self, tasks):
+        """
+        Method to store many new Tasks. A failed Task does not stop the
+        others.
+        :param tasks: Task documents.
+        :type tasks: list
+        :return: The write errors of the failed Tasks, by index.
+        :rtype: dict
+        """
+        raise NotImplementedError
+
+    def update(self, task_id, fields):
+        """
+        Method to set fields of a Task.
+        :param task_id: Identifier of the Task.
+        :type task_id: int
+        :param fields: New values, by field.
+        :type fields: dict
+        :return: The Task before the update (_id, description and
+        status), or None if it does not exist.
+        :rtype: dict
+        :raises pymongo.errors.DuplicateKeyError: If the new Description
+        already belongs to another Task.
+        """
+        raise NotImplementedError
+
+    def update_many(self, updates):
+        """
+        Method to set fields of many Tasks. A failed Task does not stop
+        the others.
+        :param updates: Identifier and new values of each Task.
+        :type updates: list
+        :return: The write errors of the failed Tasks, by index, and the
+        amount of Tasks found by the updates that did not fail.
+        :rtype: tuple(dict, int)
+        """
+        raise NotImplementedError
+
+    def update_status_by_description(self, description, status):
+        """
+        Method to set the status of the Task with a Description.
+        :param description: Description of the Task.
+        :type description: str
+        :param status: New status.
+        :type status: bool
+        :return: The Task before the update (_id and status), or None if
+        the Description does not exist.
+        :rtype: dict
+        """
+        raise NotImplementedError
+
+    def upsert_status(self, description, status, task_id):
+        """
+        Method to set the status of the Task with a Description, or
+        create the Task with the Identifier if the Description does not
+        exist, in a single write.
+        :param description: Description of the Task.
+        :type description: str
+        :param status: New status.
+        :type status: bool
+        :param task_id: Identifier of the Task, if it is created.
+        :type task_id: int
+        :return: The Task before the update (_id and status), or None if
+        it was created.
+        :rtype: dict
+        :raises pymongo.errors.DuplicateKeyError: If a concurrent write
+        created the Description, or the Identifier already exists.
+        """
+        raise NotImplementedError
+
+    def toggle(self, task_id):
+        """
+        Method to flip the status of a Task, atomically.
+        :param task_id: Identifier of the Task.
+        :type task_id: int
+        :return: The Task after the update (_id, description and the new
+        status), or None if it does not exist.
+        :rtype: dict
+        """
+        raise NotImplementedError
+
+    def toggle_many(self, task_ids):
+        """
+        Method to flip the status of many Tasks, each one atomically.
+        :param task_ids: Identifiers of the Tasks.
+        :type task_ids: list
+        :return: Identifiers of the Tasks toggled, of the Tasks whose
+        toggle failed (the missing Tasks are in neither), and the change
+        in the amount of finished Tasks.
+        :rtype: tuple(list, list, int)
+        """
+        raise NotImplementedError
+
+    def delete(self, task_id):
+        """
+        Method to remove a Task.
+        :param task_id: Identifier of the Task.
+        :type task_id: int
+        :return: The Task removed (_id and status), or None if it does
+        not exist.
+        :rtype: dict
+        """
+        raise NotImplementedError
+
+    def delete_many(self, task_ids):
+        """
+        Method to remove many Tasks.
+        :param task_ids: Identifiers of the Tasks.
+        :type task_ids: list
+        :return: Amount of Tasks removed.
+        :rtype: int
+        """
+        raise NotImplementedError
+
+    def reserve_ids(self, count):
+        """
+        Method to reserve a range of Identifiers, atomically increasing
+        the counter of the Identifiers. The counter starts from the max
+        Identifier stored.
+        :param count: Amount of Identifiers.
+        :type count: int
+        :return: The last Identifier of the range.
+        :rtype: int
+        """
+        raise NotImplementedError
+
+    def counter(self, name):
+        """
+        Method to read a counter.
+        :param name: Name of the counter.
+        :type name: str
+        :return: The counter document, or None if it does not exist.
+        :rtype: dict
+        """
+        raise NotImplementedError
+
+    def increment(self, name, values, on_insert=None):
+        """
+        Method to increase the values of a counter, atomically.
+        :param name: Name of the counter.
+        :type name: str
+        :param values: Increment, by field.
+        :type values: dict
+        :param on_insert: Values of the fields of a new counter, or None
+        if a missing counter is not created.
+        :type on_insert: dict
+        :return: The counter after the increment, or None if it does not
+        exist.
+        :rtype: dict
+        """
+        raise NotImplementedError
+
+    def increment_if(self, name, revision, values):
+        """
+        Method to increase the values of a counter, atomically, only if
+        its revision (the field rev, 0 if missing) is the given one.
+        :param name: Name of the counter.
+        :type name: str
+        :param revision: Expected revision of the counter.
+        :type revision: int
+        :param values: Increment, by field.
+        :type values: dict
+        :return: If the counter was increased.
+        :rtype: bool
+        """
+        raise NotImplementedError
+
+    def set_counter(self, name, values):
+        """
+        Method to set the values of a counter, creating it if needed.
+        :param name: Name of the counter.
+        :type name: str
+        :param values: New values, by field.
+        :type values: dict
+        """
+        raise NotImplementedError
+
+    def acquire_lease(self, name, now, until):
+        """
+        Method to take a lease, if it is expired or missing.
+        :param name: Name of the lease.
+        :type name: str
+        :param now: Current time (epoch seconds).
+        :type now: float
+        :param until: Expiration of the lease taken.
+        :type until: float
+        :return: If the lease was taken.
+        :rtype: bool
+        """
+        raise NotImplementedError
+
+    def create_indexes(self):
+        """
+        Method to create the declared indexes (see indexes.TASK_INDEXES),
+        keeping the existing ones.
+        :return: Names of the indexes.
+        :rtype: list
+        :raises pymongo.errors.OperationFailure: If an index can not be
+        built.
+        """
+        raise NotImplementedError
+
+    def ping(self):
+        """
+        Method to check if the backend answers.
+        :raises pymongo.errors.PyMongoError: If it does not.
+        """
+
+    def drop(self):
+        """
+        Method to remove all the Tasks and counters (tests).
+        """
+        raise NotImplementedError
+
+    def save(self):
+        """
+        Method to write the Tasks to the snapshot file of the backend.
+        :return: Amount of documents written, or None if the backend has
+        no snapshot.
+        :rtype: int
+        """
+        return None
@@ -0,0 +1,117 @@
+"""
+In-process cache of Tasks
+"""
+import threading
+import time
+from collections import OrderedDict
+
+
+class TaskCache:
+    """
+    Class to keep the most recently used Tasks in memory, by
+    Identifier. The cache is bounded (least recently used Tasks are
+    evicted first), and each entry expires after a time to live.
+    Also used to keep rendered pages, by version of the collection.
+    """
+    def __init__(self, max_size, ttl, clock=time.monotonic):
+        """
+        :param max_size: Max amount of Tasks kept. 0 disables the cache.
+        :type max_size: int
+        :param ttl: Seconds an entry stays valid. 0 or less means it
+        never expires.
+        :type ttl: float
+        :param clock: Function returning the current time in seconds.
+        :type clock: function
+        """
+        self.max_size = max_size
+        self.ttl = ttl
+        self.clock = clock
+        self.hits = 0
+        self.misses = 0
+        self.generation = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self):
+        """
+        :return: If the cache keeps any entry.
+        :rtype: bool
+        """
+        return self.max_size > 0
+
+    def get(self, key):
+        """
+        Method to read an entry, refreshing its position in the LRU
+        order.
+        :param key: Identifier of the Task.
+        :type key: int
+        :return: A copy of the Task, or None if it is not cached or is
+        expired.
+        :rtype: dict
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and self.ttl > 0 \
+                    and entry[0] <= self.clock():
+                del self._entries[key]
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return dict(entry[1])
+
+    def set(self, key, value, generation=None):
+        """
+        Method to store an entry, evicting the least recently used one
+        if the cache is full.
+        :param key: Identifier of the Task.
+        :type key: int
+        :param value: Task document.
+        :type value: dict
+        :param generation: Value of generation read before the Task was
+        queried. If any write invalidated the cache since then, the
+        Task may be outdated and is not stored.
+        :type generation: int
+        """
+        if not self.enabled:
+            return
+        with self._lock:
+            if generation is not None and generation != self.generation:
+                return
+            self._entries[key] = (self.clock() + self.ttl, dict(value))
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, key):
+        """
+        Method to remove an entry, after the Task is written.
+        :param key: Identifier of the Task.
+        :type key: int
+        """
+        with self._lock:
+            self.generation += 1
+            self._entries.pop(key, None)
+
+    def clear(self):
+        """
+        Method to remove all the entries, after a write whose Tasks are
+        not known by Identifier.
+        """
+        with self._lock:
+            self.generation += 1
+            self._entries.clear()
+
+    def stats(self):
+        """
+        Method to read the counters of the cache.
+        :return: Hits, misses, current and max size, and time to live.
+        :rtype: dict
+        """
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses,
+                    "size": len(self._entries), "max_size": self.max_size,
+                    "ttl": self.ttl}
@@ -1,11 +1,18 @@
 """
 Database communication
 """
+import atexit
 import os
-import mongomock
-from flask_pymongo import PyMongo
-
-mongo = None
+import threading
+import time
+import uuid
+from pymongo.results import DeleteResult, InsertOneResult, UpdateResult
+from pymongo.errors import DuplicateKeyError, OperationFailure, \
+    PyMongoError
+from src.metrics import timed
+from src.model.task import Task
+from src.repository.connection import backend_name, connections
+from src.repository.task_cache import TaskCache
 
 
 class TaskRepository:
@@ -14,31 +21,346 @@ class TaskRepository:
     """
     def __init__(self, app):
         self.app = app
+        self._id_lock = threading.Lock()
+        self._id_block_pid = None
+        self._id_block_store = None
+        self._id_block_next = 1
+        self._id_block_last = 0
+        self._cache = None
+        self._flush_registered = False
+        self._counters_registered = False
 
-    def get_mongo_connection(self):
+    @property
+    def cache(self):
         """
-        Method to initialize the MongoDB connection.
-        :return: Mongodb connection instance.
-        :rtype: PyMongo
+        In-process cache of the Tasks read by Identifier, configured by
+        TASK_CACHE_SIZE and TASK_CACHE_TTL.
+        :return: Cache of the repository.
+        :rtype: TaskCache
         """
-        global mongo
+        if self._cache is None:
+            self._cache = TaskCache(self.app.config['TASK_CACHE_SIZE'],
+                                    self.app.config['TASK_CACHE_TTL'])
+        return self._cache
 
-        if self.app.config['TESTING']:
-            if mongo is None:
-                mongo = mongomock.MongoClient()
-            return mongo
+    @property
+    def status_buffer(self):
+        """
+        Write-behind buffer of the status changes of the current
+        process (shared by its repositories), if TASK_WRITE_BEHIND is
+        enabled. It is flushed at exit.
+        :return: Buffer of the status changes, or None if disabled.
+        :rtype: StatusBuffer
+        """
+        if not self.app.config['TASK_WRITE_BEHIND']:
+            return None
+        if not self._flush_registered:
+            atexit.register(self.flush_status_buffer)
+            self._flush_registered = True
+        return connections.get_status_buffer()
+
+    def _pending_statuses(self):
+        """
+        :return: The write-behind buffer, if it has status changes not
+        written yet, or None.
+        :rtype: StatusBuffer
+        """
+        buffer = self.status_buffer
+        return buffer if buffer else None
+
+    def _written(self, parameters):
+        """
+        Method to be executed after every write: removes from the cache
+        the Tasks matched by the constraints of the write, and bumps the
+        version of the collection.
+        :param parameters: Constraints of the write.
+        :type parameters: dict
+        """
+        self._bump_version()
+        self.invalidate(parameters)
+
+    def invalidate(self, parameters):
+        """
+        Method to remove from the cache the Tasks matched by the
+        constraints of a write: the Task of the Identifier, or all of
+        them.
+        :param parameters: Constraints of the write.
+        :type parameters: dict
+        """
+        if not self.cache.enabled:
+            return
+        task_id = self._cache_key(parameters)
+        if task_id is None:
+            self.cache.clear()
         else:
-            if 'MONGO_URI' not in self.app.config:
-                self.app.config['MONGO_URI'] = "mongodb://"\
-                              + os.environ['MONGODB_USERNAME']\
-                              + ":" + os.environ['MONGODB_PASSWORD']\
-                              + "@" + os.environ['MONGODB_HOSTNAME']\
-                              + "/" + os.environ['MONGODB_DATABASE']
+            self.cache.invalidate(task_id)
+
+    @property
+    def counter_buffer(self):
+        """
+        Buffer of the counters of the current process (shared by its
+        repositories), if TASK_COUNTERS_FLUSH_INTERVAL is positive. It
+        is flushed at exit.
+        :return: Buffer of the counters, or None if they are written by
+        every write.
+        :rtype: CounterBuffer
+        """
+        if self.app.config['TASK_COUNTERS_FLUSH_INTERVAL'] <= 0:
+            return None
+        if not self._counters_registered:
+            atexit.register(self._flush_counters_at_exit)
+            self._counters_registered = True
+        return connections.get_counter_buffer()
+
+    def _flush_counters_at_exit(self):
+        # Nothing pending needs no connection (the backend may have been
+        # dropped, or never configured, in this process).
+        if connections.get_counter_buffer():
+            self.flush_counters()
+
+    @timed('version')
+    def version(self):
+        """
+        Method to read the version stamp of the Task collection, which
+        changes after every write (and every status change kept in the
+        write-behind buffer). Pages rendered from the collection can be
+        reused while it does not change.
+
+        With TASK_COUNTERS_FLUSH_INTERVAL, the stamp is the stored one,
+        read by the last flush of the counters, followed by a generation
+        of the process while its writes are not flushed: it costs one
+        read of the counter per interval, instead of one per call, and
+        the writes of other processes change it after up to twice the
+        interval. Otherwise the counter is read by every call.
+        :return: Version stamp, or None if the collection was never
+        written.
+        :rtype: str
+        """
+        buffer = self.counter_buffer
+        if buffer is None:
+            counter = self.get_store().counter("task_version")
+            generation = None
+        else:
+            if buffer.stale(self.app.config['TASK_COUNTERS_FLUSH_INTERVAL']) \
+                    or (buffer.counters.get("task_version") is None
+                        and buffer):
+                self.flush_counters()
+            with buffer.flush_lock:
+                counter = buffer.counters.get("task_version")
+                generation = buffer.generation \
+                    if buffer.pending("task_version") else None
+        if counter is None:
+            return None
+        version = f'{counter.get("epoch")}-{counter.get("seq")}'
+        statuses = self._pending_statuses()
+        if generation is not None or statuses is not None:
+            # Pages of this process show the writes not flushed yet, so
+            # they are different from the stored ones.
+            version += f'+{os.getpid()}.{generation or 0}' \
+                f'.{statuses.generation if statuses is not None else 0}'
+        return version
+
+    def _bump_version(self):
+        """
+        Method to increase the version stamp of the Task collection. The
+        epoch is random, so a version is never repeated after the
+        counter is recreated. With TASK_COUNTERS_FLUSH_INTERVAL, the
+        increment is kept in the counter buffer, and written by the next
+        flush.
+        """
+        if self._defer_counter("task_version", {"seq": 1}):
+            self._flush_stale_counters()
+            return
+        self.get_store().increment("task_version", {"seq": 1},
+                                   on_insert=self._counter_defaults(
+                                       "task_version"))
+
+    @staticmethod
+    def _counter_defaults(name):
+        """
+        Method to build the fields of a new counter, created by an
+        increment.
+        :param name: Name of the counter.
+        :type name: str
+        :return: The fields, or None if the counter is not created by
+        an increment.
+        :rtype: dict
+        """
+        if name == "task_version":
+            return {"epoch": uuid.uuid4().hex}
+        return None
+
+    def _defer_counter(self, name, values):
+        """
+        Method to keep the increment of a counter in the counter buffer,
+        if it is enabled.
+        :param name: Name of the counter.
+        :type name: str
+        :param values: Increment, by field.
+        :type values: dict
+        :return: If the increment was buffered.
+        :rtype: bool
+        """
+        buffer = self.counter_buffer
+        if buffer is None:
+            return False
+        buffer.add(name, values)
+        return True
+
+    def _flush_stale_counters(self):
+        """
+        Method to flush the counter buffer if its last flush is older
+        than TASK_COUNTERS_FLUSH_INTERVAL, so the counters are written
+        even if the flush job is not running.
+        """
+        buffer = self.counter_buffer
+        if buffer is not None and buffer.stale(
+                self.app.config['TASK_COUNTERS_FLUSH_INTERVAL']):
+            self.flush_counters()
+
+    @timed('flush_counters')
+    def flush_counters(self):
+        """
+        Method to write the increments of the counter buffer, one
+        increment per counter, and keep the counters returned. The
+        version stamp is read again even if it was not increased, so the
+        writes of other processes are seen. Increments that failed are
+        kept in the buffer, to be written again.
+        :return: Amount of counters written.
+        :rtype: int
+        """
+        buffer = connections.get_counter_buffer()
+        with buffer.flush_lock:
+            increments = buffer.drain()
+            store = self.get_store()
+            counters = {}
+            try:
+                for name, values in increments.items():
+                    counters[name] = store.increment(
+                        name, values, on_insert=self._counter_defaults(name))
+                if "task_version" not in counters:
+                    counters["task_version"] = store.counter("task_version")
+            except PyMongoError:
+                buffer.restore({name: values
+                                for name, values in increments.items()
+                                if name not in counters})
+                buffer.synchronize(counters)
+                raise
+            buffer.synchronize(counters)
+        if increments:
+            self.app.logger.info('Executing at: TaskRepository -'
+                                 ' flush_counters(counters=%s)',
+                                 len(increments))
+        return len(increments)
 
-            if not mongo:
-                mongo = PyMongo(self.app)
+    @staticmethod
+    def _cache_key(parameters):
+        """
+        Method to find the Identifier of the constraints that match a
+        single Task by Identifier.
+        :param parameters: Constraints of a query or write.
+        :type parameters: dict
+        :return: The Identifier, or None if the constraints are
+        different.
+        :rtype: int
+        """
+        if len(parameters) == 1 and isinstance(parameters.get('_id'), int):
+            return parameters.get('_id')
+        return None
 
-            return mongo
+    def get_store(self):
+        """
+        Method to initialize the storage of the Tasks of the backend of
+        the application (see backend_name), over the MongoDB connection
+        or in the memory of the process. The store is kept by process
+        (see ConnectionManager).
+        :return: Storage of the Tasks.
+        :rtype: src.repository.store.TaskStore
+        """
+        if backend_name(self.app) == 'mongodb':
+            self.get_mongo_uri()
+
+        store = connections.get_connection(self.app)
+        if not connections.indexes_ready:
+            self.ensure_indexes()
+
+        return store
+
+    def get_mongo_connection(self):
+        """
+        Method kept for the callers of the first versions, the same as
+        get_store.
+        :return: Storage of the Tasks.
+        :rtype: src.repository.store.TaskStore
+        """
+        return self.get_store()
+
+    def warm_up(self):
+        """
+        Method to open the connection pool of the current process and
+        create the indexes before the first request. Must be executed
+        after the fork, in each worker process.
+        :return: If the database answered.
+        :rtype: bool
+        """
+        self.app.logger.info('Executing at: TaskRepository - warm_up()')
+        try:
+            self.get_store().ping()
+        except PyMongoError as error:
+            self.app.logger.warning('TaskRepository - warm_up() failed:'
+                                    ' %s', error)
+            return False
+        return True
+
+    def get_mongo_uri(self):
+        """
+        Method to read the MongoDB URI of the application, building it
+        from the environment variables if it was not configured.
+        :return: MongoDB URI.
+        :rtype: str
+        """
+        if 'MONGO_URI' not in self.app.config:
+            self.app.config['MONGO_URI'] = "mongodb://"\
+                          + os.environ['MONGODB_USERNAME']\
+                          + ":" + os.environ['MONGODB_PASSWORD']\
+                          + "@" + os.environ['MONGODB_HOSTNAME']\
+                          + "/" + os.environ['MONGODB_DATABASE']
+        return self.app.config['MONGO_URI']
+
+    def ensure_indexes(self, strict=False):
+        """
+        Method to create the declared indexes of the Task collection
+        (see src.repository.indexes), if they do not exist. The unique
+        index on description makes the database reject duplicated Tasks,
+        so no query is needed before writing. The indexes are created
+        once by process: if the database can not build them (as the
+        unique index over duplicated Tasks), the error is logged and the
+        collection is used without them, until the create-indexes
+        command fixes it.
+        :param strict: If the error is raised instead of logged.
+        :type strict: bool
+        :return: Names of the indexes, or an empty list if they could
+        not be created.
+        :rtype: list
+        :raises pymongo.errors.OperationFailure: With strict, if the
+        database can not build an index.
+        """
+        self.app.logger.info('Executing at: TaskRepository -'
+                             ' ensure_indexes()')
+        try:
+            names = connections.get_connection(self.app).create_indexes()
+        except OperationFailure as error:
+            # Not retried on every request: the error is the same until
+            # the collection is fixed.
+            connections.indexes_ready = True
+            if strict:
+                raise
+            self.app.logger.error('TaskRepository - ensure_indexes()'
+                                  ' failed, run the create-indexes'
+                                  ' command: %s', error)
+            return []
+        connections.indexes_ready = True
+        return names
 
     def drop_mongo_connection(self):
         """
@@ -46,40 +368,336 @@ class TaskRepository:
         :return: Returns the Mongo Instance.
         :rtype: mongo
         """
+        store = connections.current()
+
         if self.app.config['TESTING']:
-            if mongo:
-                mongo.drop_database('db')
-        return mongo
+            if store:
+                store.drop()
+                connections.indexes_ready = False
+        self._discard_id_block()
+        self.cache.clear()
+        connections.get_status_buffer().drain()
+        connections.get_counter_buffer().clear()
+        return store
+
+    def save_snapshot(self):
+        """
+        Method to write the Tasks kept by the in-memory backend to its
+        snapshot file (TASK_MEMORY_SNAPSHOT), with the status changes of
+        the write-behind buffer.
+        :return: Amount of documents written, or None if the backend has
+        no snapshot.
+        :rtype: int
+        """
+        store = connections.current()
+        if getattr(store, 'snapshot_path', None) is None:
+            return None
+        self.flush_status_buffer()
+        count = store.save()
+        self.app.logger.info('Executing at: TaskRepository -'
+                             ' save_snapshot() = %s', count)
+        return count
+
+    @timed('next_id')
+    def next_id(self):
+        """
+        Method that returns the next Identifier available to be used.
+        Identifiers are reserved from an atomic counter document, in
+        blocks of TASK_ID_BLOCK_SIZE (hi/lo), and handed out from memory
+        until the block is exhausted, so only one call by block costs a
+        find-and-modify in the database. The Identifiers of a block not
+        used before the process ends are skipped.
+        :return: Integer Identifier available to be used.
+        :rtype: int
+        """
+        block_size = self.app.config['TASK_ID_BLOCK_SIZE']
+        store = self.get_store()
+
+        with self._id_lock:
+            if self._id_block_pid != os.getpid() \
+                    or self._id_block_store is not store:
+                # A block reserved before a fork must not be shared by
+                # the parent and the child processes, nor used in
+                # another store.
+                self._discard_id_block()
+            if self._id_block_next > self._id_block_last:
+                self._id_block_last = self._reserve_ids(block_size)
+                self._id_block_next = self._id_block_last - block_size + 1
+                self._id_block_pid = os.getpid()
+                self._id_block_store = store
+            task_id = self._id_block_next
+            self._id_block_next += 1
+
+        self.app.logger.info('Executing at: TaskRepository -'
+                             ' next_id() = %s', task_id)
+        return task_id
+
+    @timed('next_ids')
+    def next_ids(self, count):
+        """
+        Method that returns a list of Identifiers available to be used,
+        reserved from the counter in a single operation.
+        :param count: Amount of Identifiers.
+        :type count: int
+        :return: List of Integer Identifiers available to be used.
+        :rtype: list
+        """
+        if count == 1:
+            return [self.next_id()]
+        if count < 1:
+            return []
+
+        last_id = self._reserve_ids(count)
+        self.app.logger.info('Executing at: TaskRepository -'
+                             ' next_ids(count=%s) = %s', count, last_id)
+        return list(range(last_id - count + 1, last_id + 1))
+
+    def _release_id(self, task_id):
+        """
+        Method to hand an unused Identifier back to the block, if it is
+        the last one handed out, so it is not skipped.
+        :param task_id: Identifier returned by next_id.
+        :type task_id: int
+        """
+        with self._id_lock:
+            if self._id_block_pid == os.getpid() \
+                    and self._id_block_next == task_id + 1:
+                self._id_block_next = task_id
 
+    def _discard_id_block(self):
+        """
+        Method to forget the Identifiers reserved in memory, so the next
+        call of next_id reserves a new block.
+        """
+        self._id_block_pid = None
+        self._id_block_store = None
+        self._id_block_next = 1
+        self._id_block_last = 0
+
+    def _reserve_ids(self, count):
+        """
+        Method to reserve a range of Identifiers, atomically increasing
+        the counter of the Identifiers, which starts from the max
+        Identifier already stored.
+        :param count: Amount of Identifiers to be reserved.
+        :type count: int
+        :return: The last Identifier of the reserved range.
+        :rtype: int
+        """
+        return self.get_store().reserve_ids(count)
+
+    @timed('find', iterated=True)
     def find(self, parameters, fields):
         """
         Method to do a query in the database. Can be used parameters to
         filter results, and fields to restrict return properties.
-        :param parameters: Constraints, or empty for all.
+        :param parameters: Filters (see task_filters, and the _id or the
+        description of the Tasks), or empty for all.
         :type parameters: dict
         :param fields: Fields required or empty for all.
         :type fields: dict
         :return: Query result containing all the documents queried.
-        :rtype: pymongo.cursor.Cursor
+        :rtype: iterator
+        """
+        self.app.logger.info('Executing at: TaskRepository -'
+                             ' find(parameters=%s,'
+                             ' fields=%s)', parameters, fields)
+        # The documents read can not show the buffered status changes,
+        # so they are written first.
+        self.flush_status_buffer()
+        return self.get_store().find(parameters, fields)
+
+    @staticmethod
+    def task_filters(status=None, description=None):
+        """
+        Method to build the filters of a query of Tasks (see TaskStore),
+        backed by the indexes of the backend: status uses the index on
+        status and Identifier, and description is matched as a prefix,
+        which uses the index on description.
+        :param status: Status of the Tasks, or None for all.
+        :type status: bool
+        :param description: Prefix of the Description of the Tasks, or
+        None for all.
+        :type description: str
+        :return: Filters of the query.
+        :rtype: dict
+        """
+        parameters = {}
+        if status is not None:
+            parameters["status"] = status
+        if description:
+            parameters["prefix"] = description
+        return parameters
+
+    @timed('find_tasks', iterated=True)
+    def find_tasks(self, parameters, sort_key='_id', direction=1,
+                   batch_size=None):
+        """
+        Method to query Tasks, read as Task while they are iterated.
+        :param parameters: Filters (see task_filters), or empty for all.
+        :type parameters: dict
+        :param sort_key: Field of the sort (see SORT_KEYS).
+        :type sort_key: str
+        :param direction: 1 (ascending) or -1 (descending).
+        :type direction: int
+        :param batch_size: Amount of Tasks read from the database at a
+        time, or None for the default.
+        :type batch_size: int
+        :return: Iterator of the Tasks.
+        :rtype: iterator
+        """
+        self.app.logger.info('Executing at: TaskRepository -'
+                             ' find_tasks(parameters=%s, sort_key=%s,'
+                             ' direction=%s)', parameters, sort_key,
+                             direction)
+        self.flush_status_buffer()
+        return self.get_store().find_tasks(parameters, sort_key, direction,
+                                           batch_size=batch_size)
+
+    @timed('find_page')
+    def find_page(self, limit, after=None, before=None, parameters=None,
+                  sort_key='_id', direction=1):
+        """
+        Method to query one page of Tasks, using the sort key of the
+        page edge (keyset) instead of skipping documents, so every page
+        costs the same. Only the fields of Task are read, and decoded
+        directly into Task where the backend allows it.
+        :param limit: Max amount of Tasks in the page.
+        :type limit: int
+        :param after: Edge after which the page starts: the Identifier,
+        or, if the sort key is not the Identifier, the value and the
+        Identifier of the Task.
+        :type after: int or tuple
+        :param before: Edge before which the page ends.
+        :type before: int or tuple
+        :param parameters: Filters (see task_filters), or None for all.
+        :type parameters: dict
+        :param sort_key: Field of the sort (see SORT_KEYS).
+        :type sort_key: str
+        :param direction: 1 (ascending) or -1 (descending).
+        :type direction: int
+        :return: The Tasks of the page, and if there are pages before
+        and after it.
+        :rtype: tuple(list, bool, bool)
+        """
+        self.app.logger.info('Executing at: TaskRepository -'
+                             ' find_page(limit=%s, after=%s,'
+                             ' before=%s, parameters=%s, sort_key=%s,'
+                             ' direction=%s)', limit, after, before,
+                             parameters, sort_key, direction)
+        parameters = parameters or {}
+
+        buffer = self._pending_statuses()
+        if buffer is not None and ('status' in parameters
+                                   or sort_key == 'status'):
+            # The buffered status would change which Tasks are in the
+            # page, so it is written first.
+            self.flush_status_buffer()
+            buffer = None
+
+        store = self.get_store()
+        if before is not None:
+            tasks = list(store.find_tasks(parameters, sort_key, -direction,
+                                          after=before, limit=limit + 1))
+            has_previous = len(tasks) > limit
+            tasks = tasks[:limit]
+            tasks.reverse()
+            return self._overlay(buffer, tasks), has_previous, True
+
+        tasks = list(store.find_tasks(parameters, sort_key, direction,
+                                      after=after, limit=limit + 1))
+        return self._overlay(buffer, tasks[:limit]), after is not None, \
+            len(tasks) > limit
+
+    @staticmethod
+    def _overlay(buffer, tasks):
         """
-        self.app.logger.info(f'Executing at: TaskRepository -'
-                             f' find(parameters={parameters},'
-                             f' fields={fields})')
-        return self.get_mongo_connection().db.task.find(parameters, fields)
+        Method to apply the status changes of the write-behind buffer to
+        Tasks read from the database.
+        :param buffer: Write-behind buffer, or None.
+        :type buffer: StatusBuffer
+        :param tasks: Tasks read from the database.
+        :type tasks: list
+        :return: The Tasks, with the buffered status.
+        :rtype: list
+        """
+        if buffer is None:
+            return tasks
+        return [buffer.overlay(task) for task in tasks]
+
+    @timed('search')
+    def search(self, text, limit, page=1):
+        """
+        Method to search the Tasks by the words of their descriptions,
+        using the text index of the backend, ranked by relevance. If the
+        database has no text search (mongomock, in the tests), the Tasks
+        are searched in an inverted index kept in memory, rebuilt after
+        the writes.
+        :param text: Words to be searched.
+        :type text: str
+        :param limit: Max amount of Tasks in the page.
+        :type limit: int
+        :param page: Number of the page, starting at 1.
+        :type page: int
+        :return: The Tasks of the page, with the score in the field
+        score, and if there is a page after it.
+        :rtype: tuple(list, bool)
+        """
+        self.app.logger.info('Executing at: TaskRepository -'
+                             ' search(text=%s, limit=%s, page=%s)', text,
+                             limit, page)
+        tasks = self.get_store().search(text, (page - 1) * limit,
+                                        limit + 1)
+        return self._overlay(self._pending_statuses(), tasks[:limit]), \
+            len(tasks) > limit
 
+    @staticmethod
+    def _unique_key(parameters):
+        """
+        Method to read the unique field (Identifier or Description) of
+        the constraints of a single Task.
+        :param parameters: Constraints, with _id or description.
+        :type parameters: dict
+        :return: The field and its value.
+        :rtype: tuple
+        """
+        if len(parameters) != 1 or not ({'_id', 'description'}
+                                        & set(parameters)):
+            raise ValueError('A single Task is found by _id or'
+                             ' description, not by %r.' % (parameters,))
+        return next(iter(parameters.items()))
+
+    @timed('find_one')
     def find_one(self, parameters):
         """
         Method to do a query in the database. Can be used parameters to
-        filter results.
-        :param parameters: Constraints, or empty for all.
+        filter results. Queries by Identifier are read through the
+        cache. The Task has the status kept in the write-behind buffer,
+        if there is one.
+        :param parameters: Constraints: the _id or the description.
         :type parameters: dict
         :return: Query result containing the document queried.
         :rtype: dict
         """
-        self.app.logger.info(f'Executing at: TaskRepository -'
-                             f' find_one(parameters={parameters})')
-        return self.get_mongo_connection().db.task.find_one(parameters)
+        self.app.logger.info('Executing at: TaskRepository -'
+                             ' find_one(parameters=%s)', parameters)
+        field, value = self._unique_key(parameters)
+        buffer = self._pending_statuses()
+
+        task_id = self._cache_key(parameters)
+        if task_id is None or not self.cache.enabled:
+            task = self.get_store().find_one(field, value)
+            return task if buffer is None else buffer.overlay(task)
+
+        task = self.cache.get(task_id)
+        if task is None:
+            generation = self.cache.generation
+            task = self.get_store().find_one(field, value)
+            if task is not None:
+                self.cache.set(task_id, task, generation=generation)
+        return task if buffer is None else buffer.overlay(task)
 
+    @timed('insert_one')
     def insert_one(self, task_id, description, status):
         """
         Method to insert a object in the database.
@@ -92,44 +710,587 @@ class TaskRepository:
         :return: Instance of InsertOneResult, containing information
         about insert operation.
         :rtype: pymongo.results.InsertOneResult
+        :raises pymongo.errors.DuplicateKeyError: If the Identifier or
+        the Description already exist.
         """
-        self.app.logger.info(f'Executing at: TaskRepository -'
-                             f' insert_one(task_id={task_id},'
-                             f' description={description},'
-                             f' status={status})')
-        return self.get_mongo_connection()\
-            .db.task.insert_one({"_id": task_id,
-                                 "description": description,
+        self.app.logger.info('Executing at: TaskRepository -'
+                             ' insert_one(task_id=%s,'
+                             ' description=%s,'
+                             ' status=%s)', task_id, description, status)
+        self.get_store().insert({"_id": task_id, "description": description,
                                  "status": status})
+        self._written({"_id": task_id})
+        self._count_stats(1, 1 if status else 0)
+        return InsertOneResult(task_id, True)
+
+    @timed('insert_many')
+    def insert_many(self, tasks):
+        """
+        Method to insert many objects in the database in a single
+        unordered operation. Identifiers are allocated for all of them
+        at once, and a failed Task does not stop the others.
+        :param tasks: Tasks to be inserted, each one with description
+        and status.
+        :type tasks: list
+        :return: The documents sent to the database (in the same order
+        of tasks), and the write errors of the failed ones, by index.
+        :rtype: tuple(list, dict)
+        """
+        self.app.logger.info('Executing at: TaskRepository -'
+                             ' insert_many(tasks=%s)', len(tasks))
+        documents = [{"_id": task_id,
+                      "description": task.get('description'),
+                      "status": task.get('status')}
+                     for task_id, task in zip(self.next_ids(len(tasks)),
+                                              tasks)]
+        if not documents:
+            return documents, {}
+
+        try:
+            write_errors = self.get_store().insert_many(documents)
+        finally:
+            # Identifiers just allocated are never cached, so only the
+            # version of the collection changes.
+            self._bump_version()
+
+        inserted = [document for index, document in enumerate(documents)
+                    if index not in write_errors]
+        self._count_stats(len(inserted),
+                          sum(1 for document in inserted
+                              if document.get('status')))
+        return documents, write_errors
+
+    @timed('update_many')
+    def update_many(self, updates):
+        """
+        Method to set fields of many Tasks in a single unordered
+        operation. The Tasks not found are derived from the amount of
+        Tasks matched by the operation, and read only if it is not the
+        amount of updates. If the status is updated, the status of the
+        Tasks is read before the operation (which also finds the Tasks
+        that do not exist), for the statistics; a status changed by
+        another write between the read and the operation is fixed by
+        reconcile_stats.
+        :param updates: Identifier and new values of each Task, with
+        unique Identifiers.
+        :type updates: list
+        :return: The write errors of the failed updates, by index, and
+        the indexes of the updates whose Task does not exist.
+        :rtype: tuple(dict, set)
+        """
+        self.app.logger.info('Executing at: TaskRepository -'
+                             ' update_many(updates=%s)', len(updates))
+        if not updates:
+            return {}, set()
+
+        counted = any('status' in fields for _, fields in updates)
+        if counted:
+            # A buffered status written later would undo these ones.
+            self.flush_status_buffer()
+        store = self.get_store()
+        before = None
+        missing = set()
+        if counted:
+            before = store.statuses([task_id for task_id, _ in updates])
+            missing = {index for index, (task_id, _) in enumerate(updates)
+                       if task_id not in before}
+        indexes = [index for index in range(len(updates))
+                   if index not in missing]
+        try:
+            errors, matched = store.update_many([updates[index]
+                                                 for index in indexes])
+        finally:
+            self._written({})
+        write_errors = {indexes[position]: error
+                        for position, error in errors.items()}
+
+        written = [index for index in indexes if index not in write_errors]
+        if matched < len(written):
+            # Some Tasks do not exist, or were deleted after the read.
+            found = store.statuses([updates[index][0] for index in written])
+            missing.update(index for index in written
+                           if updates[index][0] not in found)
+        if counted:
+            self._count_stats(0, sum(
+                self._status_change({"status": before[task_id]},
+                                    fields.get('status'))
+                for index, (task_id, fields) in enumerate(updates)
+                if 'status' in fields and index in written
+                and index not in missing))
+        return write_errors, missing
+
+    @timed('delete_many')
+    def delete_many(self, task_ids):
+        """
+        Method to delete many Tasks in a single operation. The Tasks
+        that exist, and their status for the statistics, are read before
+        it. If another write deletes some of them between the read and
+        the operation, the change in the amount of finished Tasks is not
+        known, and is left to reconcile_stats.
+        :param task_ids: Identifiers of the Tasks.
+        :type task_ids: list
+        :return: Identifiers of the Tasks deleted, in the order of
+        task_ids.
+        :rtype: list
+        """
+        self.app.logger.info('Executing at: TaskRepository -'
+                             ' delete_many(task_ids=%s)', len(task_ids))
+        self.flush_status_buffer()
+        store = self.get_store()
+        before = store.statuses(task_ids) if task_ids else {}
+        if not before:
+            return []
+        try:
+            deleted = store.delete_many(list(before))
+        finally:
+            self._written({})
+
+        if deleted == len(before):
+            self._count_stats(-deleted, -sum(before.values()))
+        else:
+            self.app.logger.warning('TaskRepository - delete_many():'
+                                    ' %s Tasks deleted by another write,'
+                                    ' statistics left to reconcile_stats',
+                                    len(before) - deleted)
+            self._count_stats(-deleted, 0)
+        return [task_id for task_id in dict.fromkeys(task_ids)
+                if task_id in before]
+
+    @timed('upsert_by_description')
+    def upsert_by_description(self, description, status):
+        """
+        Method to update the status of the Task with the Description,
+        or create it if the Description does not exist, in a single
+        write that also returns the previous status for the statistics.
+        The Identifier of a new Task is taken from the block of
+        next_id, so it costs no other write, and is handed back to the
+        block when the Task already existed.
+        :param description: Description of the Task.
+        :type description: str
+        :param status: Status of the Task (Finished or No).
+        :type status: bool
+        :return: The Task after the write, built from the document
+        returned by it, and the Task before the update (_id and status),
+        or None if the Task was created.
+        :rtype: tuple(Task, dict)
+        """
+        self.app.logger.info('Executing at: TaskRepository -'
+                             ' upsert_by_description('
+                             'description=%s,'
+                             ' status=%s)', description, status)
+        self.flush_status_buffer()
+        store = self.get_store()
+        task_id = self.next_id()
+        try:
+            try:
+                previous = store.upsert_status(description, status, task_id)
+            except DuplicateKeyError:
+                # A concurrent request created the same Description
+                # between the query and the insert of the upsert: it
+                # exists now.
+                previous = store.update_status_by_description(description,
+                                                              status)
+                if previous is None:
+                    raise
+        finally:
+            self._written({"description": description})
 
+        if previous is None:
+            self._count_stats(1, 1 if status else 0)
+        else:
+            self._release_id(task_id)
+            self._count_stats(0, self._status_change(previous, status))
+            task_id = previous.get('_id')
+        return Task(task_id, description, status), previous
+
+    @timed('update_one')
     def update_one(self, parameters, new_data):
         """
-        Method to update a object in the database.
-        :param parameters: Constraints of the object to be updated
-        (Like Identifier)
+        Method to update a object in the database. When the status
+        changes, the statistics of the Tasks are updated.
+        :param parameters: Constraints of the object to be updated: the
+        _id or the description.
         :type parameters: dict
         :param new_data: New data to be placed in the object.
         :type new_data: dict
         :return: Instance of UpdateResult, containing information about
         update operation.
         :rtype: pymongo.results.UpdateResult
+        :raises pymongo.errors.DuplicateKeyError: If the new Description
+        already belongs to another Task.
+        """
+        previous = self._update(parameters, new_data)
+        if previous is None:
+            return UpdateResult({"n": 0, "nModified": 0, "ok": 1.0}, True)
+        modified = any(previous.get(field) != value
+                       for field, value in new_data.items())
+        return UpdateResult({"n": 1, "nModified": int(modified), "ok": 1.0},
+                            True)
+
+    @timed('update_task')
+    def update_task(self, task_id, new_data):
+        """
+        Method to update a Task by Identifier, as update_one, returning
+        the Task after the update, built from the document returned by
+        the write (the Task before it, with the new values), so it is
+        not read again.
+        :param task_id: Identifier of the Task.
+        :type task_id: int
+        :param new_data: New data to be placed in the Task.
+        :type new_data: dict
+        :return: The Task after the update, or None if it does not
+        exist.
+        :rtype: Task
+        :raises pymongo.errors.DuplicateKeyError: If the new Description
+        already belongs to another Task.
+        """
+        previous = self._update({"_id": task_id}, new_data)
+        return None if previous is None \
+            else Task.from_document(dict(previous, **new_data))
+
+    def _update(self, parameters, new_data):
+        """
+        Method to update a Task, and the statistics when the status
+        changes.
+        :param parameters: Constraints: the _id or the description.
+        :type parameters: dict
+        :param new_data: New values, by field.
+        :type new_data: dict
+        :return: The Task before the update, or None if it does not
+        exist.
+        :rtype: dict
+        """
+        self.app.logger.info('Executing at: TaskRepository -'
+                             ' update_one(parameters=%s,'
+                             ' new_data=%s)', parameters, new_data)
+        task_id = self._task_id(parameters)
+        if task_id is None:
+            return None
+        if 'status' in new_data:
+            # A buffered status written later would undo this one.
+            self.flush_status_buffer()
+        try:
+            # The previous status is needed by the statistics, so it is
+            # returned by the same write.
+            previous = self.get_store().update(task_id, new_data)
+        finally:
+            self._written(parameters)
+
+        if previous is not None and 'status' in new_data:
+            self._count_stats(0, self._status_change(
+                previous, new_data.get('status')))
+        return previous
+
+    @timed('toggle_status')
+    def toggle_status(self, task_id):
+        """
+        Method to flip the status of a Task on the server, without
+        reading it first, so concurrent toggles are never lost. With
+        TASK_WRITE_BEHIND, the status is flipped in the write-behind
+        buffer, and written later.
+        :param task_id: Identifier of the Task.
+        :type task_id: int
+        :return: The new status of the Task, or None if it does not
+        exist.
+        :rtype: bool
         """
-        self.app.logger.info(f'Executing at: TaskRepository -'
-                             f' update_one(parameters={parameters},'
-                             f' new_data={new_data})')
-        return self.get_mongo_connection()\
-            .db.task.update_one(parameters, {"$set": new_data})
+        buffer = self.status_buffer
+        if buffer is not None:
+            self.app.logger.info('Executing at: TaskRepository -'
+                                 ' toggle_status(task_id=%s)', task_id)
+            return self._buffer_toggle(buffer, task_id)
+        task = self._toggle(task_id)
+        return None if task is None else task.get('status')
 
+    @timed('toggle_task')
+    def toggle_task(self, task_id):
+        """
+        Method to flip the status of a Task, as toggle_status, returning
+        the Task after the update, from the document returned by the
+        write. With TASK_WRITE_BEHIND, the Task is read (through the
+        cache) after its status is flipped in the buffer.
+        :param task_id: Identifier of the Task.
+        :type task_id: int
+        :return: The Task after the update, or None if it does not
+        exist.
+        :rtype: Task
+        """
+        buffer = self.status_buffer
+        if buffer is not None:
+            self.app.logger.info('Executing at: TaskRepository -'
+                                 ' toggle_task(task_id=%s)', task_id)
+            if self._buffer_toggle(buffer, task_id) is None:
+                return None
+            return Task.from_document(self.find_one({"_id": task_id}))
+        return Task.from_document(self._toggle(task_id))
+
+    def _toggle(self, task_id):
+        """
+        Method to flip the status of a Task on the server, and update
+        the statistics.
+        :param task_id: Identifier of the Task.
+        :type task_id: int
+        :return: The Task after the update, or None if it does not
+        exist.
+        :rtype: dict
+        """
+        self.app.logger.info('Executing at: TaskRepository -'
+                             ' toggle_status(task_id=%s)', task_id)
+        try:
+            task = self.get_store().toggle(task_id)
+        finally:
+            self._written({"_id": task_id})
+        if task is not None:
+            self._count_stats(0, 1 if task.get('status') else -1)
+        return task
+
+    def _buffer_toggle(self, buffer, task_id):
+        """
+        Method to flip the status of a Task in the write-behind buffer.
+        The database is read only if the Task is not in the buffer, and
+        the buffer is flushed when it reaches
+        TASK_WRITE_BEHIND_MAX_PENDING Tasks.
+        :param buffer: Write-behind buffer.
+        :type buffer: StatusBuffer
+        :param task_id: Identifier of the Task.
+        :type task_id: int
+        :return: The new status of the Task, or None if it does not
+        exist.
+        :rtype: bool
+        """
+        with buffer.flush_lock:
+            stored_status = None
+            if buffer.status(task_id) is None:
+                task = self.get_store().find_one('_id', task_id,
+                                                 {"status": True})
+                if task is None:
+                    return None
+                stored_status = task.get('status')
+            status = buffer.toggle(task_id, stored_status)
+
+        if len(buffer) >= self.app.config['TASK_WRITE_BEHIND_MAX_PENDING']:
+            self.flush_status_buffer()
+        return status
+
+    @timed('flush_status_buffer')
+    def flush_status_buffer(self):
+        """
+        Method to write the status changes of the write-behind buffer.
+        Each Task in the buffer was toggled an odd number of times, so
+        it is written as one toggle of the stored status (see
+        TaskStore.toggle_many), and the toggles of the same Task by other
+        processes in the meantime are kept. Toggles that failed are kept
+        in the buffer, to be written again.
+        :return: Amount of Tasks written.
+        :rtype: int
+        """
+        buffer = connections.get_status_buffer()
+        if not buffer:
+            return 0
+
+        with buffer.flush_lock:
+            entries = buffer.drain()
+            if not entries:
+                return 0
+            self.app.logger.info('Executing at: TaskRepository -'
+                                 ' flush_status_buffer(tasks=%s)',
+                                 len(entries))
+            try:
+                written, failed, finished = \
+                    self.get_store().toggle_many(list(entries))
+            except PyMongoError:
+                buffer.restore(entries)
+                raise
+            if failed:
+                self.app.logger.warning('TaskRepository - failed to'
+                                        ' write the status of %s Tasks',
+                                        len(failed))
+                buffer.restore({task_id: entries[task_id]
+                                for task_id in failed})
+
+        self._bump_version()
+        for task_id in entries:
+            self.cache.invalidate(task_id)
+        self._count_stats(0, finished)
+        return len(written)
+
+    @timed('delete_one')
     def delete_one(self, parameters):
         """
         Method to delete a object in the database.
-        :param parameters: Constraints of the object to be deleted
-        (Like Identifier)
+        :param parameters: Constraints of the object to be deleted: the
+        _id or the description.
         :type parameters: dict
         :return: Instance of DeleteResult, containing information about
         delete operation.
         :rtype: pymongo.results.DeleteResult
         """
-        self.app.logger.info(f'Executing at: TaskRepository -'
-                             f' delete_one(parameters={parameters})')
-        return self.get_mongo_connection().db.task.delete_one(parameters)
+        self.app.logger.info('Executing at: TaskRepository -'
+                             ' delete_one(parameters=%s)', parameters)
+        self.flush_status_buffer()
+        task_id = self._task_id(parameters)
+        task = None if task_id is None \
+            else self.get_store().delete(task_id)
+        self._written(parameters)
+        if task is None:
+            return DeleteResult({"n": 0, "ok": 1.0}, True)
+        self._count_stats(-1, -1 if task.get('status') else 0)
+        return DeleteResult({"n": 1, "ok": 1.0}, True)
+
+    def _task_id(self, parameters):
+        """
+        Method to find the Identifier of the Task of the constraints of
+        a write, reading it if the Task is found by description.
+        :param parameters: Constraints: the _id or the description.
+        :type parameters: dict
+        :return: The Identifier, or None if the Task does not exist.
+        :rtype: int
+        """
+        field, value = self._unique_key(parameters)
+        if field == '_id':
+            return value
+        task = self.get_store().find_one(field, value, {"_id": True})
+        return None if task is None else task.get('_id')
+
+    @staticmethod
+    def _status_change(previous, status):
+        """
+        Method to compute the change in the amount of finished Tasks
+        caused by a new status.
+        :param previous: Task before the write, with its status.
+        :type previous: dict
+        :param status: New status of the Task.
+        :type status: bool
+        :return: 1, -1 or 0.
+        :rtype: int
+        """
+        return int(bool(status)) - int(bool(previous.get('status')))
+
+    def _count_stats(self, total, finished):
+        """
+        Method to increase the counters of the statistics of the Tasks
+        (see stats), after a write, in the counter buffer if it is
+        enabled. Every increment also increases the revision (rev) of
+        the counters, checked by reconcile_stats. If the statistics were
+        never computed, they are left to reconcile_stats.
+        :param total: Change in the amount of Tasks.
+        :type total: int
+        :param finished: Change in the amount of finished Tasks.
+        :type finished: int
+        """
+        if not (total or finished):
+            return
+        values = {"total": total, "finished": finished, "rev": 1}
+        if self._defer_counter("task_stats", values):
+            self._flush_stale_counters()
+            return
+        self.get_store().increment("task_stats", values)
+
+    @timed('stats')
+    def stats(self):
+        """
+        Method to read the statistics of the Tasks, kept in a single
+        document updated by every write, so reading them does not
+        depend on the amount of Tasks. The increments of the process
+        not flushed yet are added to it.
+        :return: Amount of Tasks, of finished and of pending Tasks.
+        :rtype: dict
+        """
+        counter = self.get_store().counter("task_stats")
+        if counter is None:
+            stats = self.reconcile_stats()
+        else:
+            stats = {"total": counter.get('total'),
+                     "finished": counter.get('finished')}
+            buffer = self.counter_buffer
+            pending = {} if buffer is None else buffer.pending("task_stats")
+            stats["total"] += pending.get('total', 0)
+            stats["finished"] += pending.get('finished', 0)
+
+        buffer = self._pending_statuses()
+        if buffer is not None:
+            stats["finished"] += buffer.finished_delta()
+        stats["pending"] = stats.get('total') - stats.get('finished')
+        return stats
+
+    @timed('acquire_lease')
+    def acquire_lease(self, name, seconds):
+        """
+        Method to take a lease, kept in a document of the counters
+        collection, that expires after some seconds. Only one process,
+        among all the workers, takes the lease until it expires, so a
+        periodic job guarded by it runs once for the whole application.
+        :param name: Name of the lease.
+        :type name: str
+        :param seconds: Duration of the lease.
+        :type seconds: float
+        :return: If the lease was taken.
+        :rtype: bool
+        """
+        now = time.time()
+        return self.get_store().acquire_lease(name, now, now + seconds)
+
+    @timed('remove_duplicates')
+    def remove_duplicates(self):
+        """
+        Method to delete the Tasks with the description of another Task,
+        keeping the one with the lowest Identifier, so the unique index
+        on description can be built.
+        :return: Identifiers of the Tasks deleted.
+        :rtype: list
+        """
+        self.app.logger.info('Executing at: TaskRepository -'
+                             ' remove_duplicates()')
+        task_ids = self.get_store().duplicates()
+        self.delete_many(task_ids)
+        return task_ids
+
+    @timed('reconcile_stats')
+    def reconcile_stats(self, wait=None):
+        """
+        Method to compute the statistics of the Tasks again, with an
+        aggregation over the collection, fixing any difference left by
+        writes that failed between the Task and the counters.
+
+        The counters are not set to the aggregation: the difference is
+        added to them only if their revision did not change since they
+        were read, before the aggregation, and until the increments
+        buffered by the other processes are flushed (wait). Otherwise a
+        write counted by the aggregation would be counted twice, so the
+        counters are kept, until the next execution.
+        :param wait: Seconds waited for the increments of the other
+        processes, or None for twice TASK_COUNTERS_FLUSH_INTERVAL.
+        :type wait: float
+        :return: Amount of Tasks, of finished and of pending Tasks, or
+        None if the counters changed.
+        :rtype: dict
+        """
+        self.app.logger.info('Executing at: TaskRepository -'
+                             ' reconcile_stats()')
+        if self.counter_buffer is not None:
+            self.flush_counters()
+        store = self.get_store()
+        counter = store.counter("task_stats")
+        total, finished = store.count()
+        stats = {"total": total, "finished": finished,
+                 "pending": total - finished}
+        if counter is None:
+            store.set_counter("task_stats", {"total": total,
+                                             "finished": finished,
+                                             "rev": 0})
+            return stats
+
+        if wait is None:
+            wait = 2 * self.app.config['TASK_COUNTERS_FLUSH_INTERVAL']
+        if wait > 0:
+            time.sleep(wait)
+        if not store.increment_if(
+                "task_stats", counter.get('rev', 0),
+                {"total": total - counter.get('total', 0),
+                 "finished": finished - counter.get('finished', 0),
+                 "rev": 1}):
+            self.app.logger.warning('TaskRepository - reconcile_stats()'
+                                    ' skipped: the statistics changed'
+                                    ' during the aggregation')
+            return None
+        return stats
@@ -0,0 +1,113 @@
+"""
+In-process full-text index of the Task descriptions
+"""
+import re
+import unicodedata
+from collections import Counter
+
+WORD = re.compile(r'\w+')
+
+
+def tokenize(text):
+    """
+    Method to split a text in words, ignoring case and diacritics, like
+    the text index of MongoDB without language.
+
+    :param text: Text to be split.
+    :type text: str
+    :return: Words of the text.
+    :rtype: list
+    """
+    text = unicodedata.normalize('NFKD', text or '')
+    text = ''.join(char for char in text if not unicodedata.combining(char))
+    return WORD.findall(text.lower())
+
+
+class TextIndex:
+    """
+    Class to search the Tasks by the words of their descriptions, with an
+    inverted index (word to Identifiers). Used by the text indexes of the
+    memory engine, and when the database has no text search (mongomock).
+    Searching reads only the Tasks that have the words searched, so it
+    does not scan every Task.
+    """
+    def __init__(self, tasks=(), fields=('description',)):
+        """
+        :param tasks: Tasks to be indexed, with Identifier, description
+        and status.
+        :type tasks: iterable
+        :param fields: Text fields indexed.
+        :type fields: tuple
+        """
+        self.fields = fields
+        self.tasks = {}
+        self.postings = {}
+        for task in tasks:
+            self.add(task)
+
+    def add(self, task):
+        """
+        Method to index a Task, replacing the entries of a Task with the
+        same Identifier.
+        :param task: Task with Identifier, description and status.
+        :type task: dict
+        """
+        task_id = task.get('_id')
+        self.remove(task_id)
+        words = []
+        for field in self.fields:
+            value = task.get(field)
+            if isinstance(value, str):
+                words.extend(tokenize(value))
+        counts = Counter(words)
+        self.tasks[task_id] = (task, counts)
+        for word in counts:
+            self.postings.setdefault(word, set()).add(task_id)
+
+    def remove(self, task_id):
+        """
+        Method to remove the entries of a Task.
+        :param task_id: Identifier of the Task.
+        :type task_id: int
+        """
+        entry = self.tasks.pop(task_id, None)
+        if entry is None:
+            return
+        for word in entry[1]:
+            ids = self.postings[word]
+            ids.discard(task_id)
+            if not ids:
+                del self.postings[word]
+
+    def scores(self, text):
+        """
+        Method to score the Tasks with any of the words of a text, like
+        the text score of MongoDB: each word found adds
+        0.5 + 0.5 * (its frequency / the words of the description).
+        :param text: Words to be searched.
+        :type text: str
+        :return: Score of each Identifier found.
+        :rtype: dict
+        """
+        scores = {}
+        for word in set(tokenize(text)):
+            for task_id in self.postings.get(word, ()):
+                counts = self.tasks[task_id][1]
+                scores[task_id] = scores.get(task_id, 0.0) + 0.5 \
+                    + 0.5 * counts[word] / sum(counts.values())
+        return scores
+
+    def search(self, text):
+        """
+        Method to search the Tasks with any of the words of a text,
+        ranked by their scores.
+        :param text: Words to be searched.
+        :type text: str
+        :return: Tasks found, with the score in the field score, from
+        the best to the worst match (then by Identifier).
+        :rtype: list
+        """
+        ranked = sorted(self.scores(text).items(),
+                        key=lambda item: (-item[1], item[0]))
+        return [dict(self.tasks[task_id][0], score=score)
+                for task_id, score in ranked]
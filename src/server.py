@@ -0,0 +1,219 @@
+"""
+Production server of the application.
+Runs the WSGI application in gunicorn, with many worker processes and
+threads, or in waitress (a single multi-threaded process) when gunicorn
+is not installed.
+"""
+import multiprocessing
+from src import app
+from src.admission import admission
+from src.controller.task_controller import db
+from src.jobs import start_jobs
+from src.repository.connection import backend_name
+
+try:
+    from gunicorn.app.base import BaseApplication
+except ImportError:
+    BaseApplication = None
+
+try:
+    import waitress
+except ImportError:
+    waitress = None
+
+
+# Timers of the background jobs of the current worker process.
+worker_timers = []
+
+
+def default_workers():
+    """
+    Method to calculate the amount of worker processes when
+    SERVER_WORKERS is not defined: two per core, plus one.
+    :return: Amount of worker processes.
+    :rtype: int
+    """
+    return multiprocessing.cpu_count() * 2 + 1
+
+
+def preload_templates(application):
+    """
+    Method to compile every template of the application before the
+    fork, so the worker processes share the compiled templates instead
+    of compiling them on the first request.
+
+    :param application: Flask application.
+    :type application: flask.Flask
+    :return: Names of the templates compiled.
+    :rtype: list
+    """
+    names = application.jinja_env.list_templates()
+    for name in names:
+        application.jinja_env.get_template(name)
+    return names
+
+
+def initialize_worker():
+    """
+    Method to open the repository connection and start the background
+    jobs in the current worker process.
+    :return: The timers of the jobs started.
+    :rtype: list
+    """
+    db.warm_up()
+    return start_jobs(app, db)
+
+
+def stop_worker(timers):
+    """
+    Method to stop the background jobs of the current worker process,
+    and write the status changes and the counters kept in memory.
+    :param timers: Timers returned by initialize_worker.
+    :type timers: list
+    """
+    for timer in timers:
+        timer.stop()
+    db.flush_status_buffer()
+    if db.counter_buffer is not None:
+        db.flush_counters()
+
+
+def when_ready(server):
+    """
+    gunicorn hook executed in the master process after the application
+    is loaded, before the worker processes are forked.
+    """
+    preload_templates(app)
+
+
+def post_fork(server, worker):
+    """
+    gunicorn hook executed in each worker process after the fork. The
+    connections and threads of the master are not inherited, so they
+    are created here.
+    """
+    worker_timers[:] = initialize_worker()
+
+
+def worker_exit(server, worker):
+    """
+    gunicorn hook executed in each worker process when it exits: on
+    HUP, on TERM, and when the old master of a USR2 upgrade is stopped.
+    Stops the jobs and writes what is kept in memory, before the new
+    workers take over.
+    """
+    stop_worker(worker_timers)
+
+
+def server_options(application):
+    """
+    Method to build the gunicorn settings from the configuration of the
+    application. The application is always preloaded in the master
+    process, and the connections are opened after the fork, so HUP
+    recreates the workers with the same code: a new version of the code
+    is loaded by a USR2 upgrade (a new master). The memory backend keeps
+    the Tasks in the process, so it runs a single worker.
+
+    :param application: Flask application.
+    :type application: flask.Flask
+    :return: gunicorn settings, with the hooks.
+    :rtype: dict
+    """
+    config = application.config
+    workers = config['SERVER_WORKERS'] or default_workers()
+    if backend_name(application) == 'memory':
+        workers = 1
+    threads = max(config['SERVER_THREADS'], 1)
+    return {
+        'bind': config['SERVER_BIND'],
+        'workers': workers,
+        'threads': threads,
+        'worker_class': 'gthread' if threads > 1 else 'sync',
+        'preload_app': True,
+        'timeout': config['SERVER_TIMEOUT'],
+        'graceful_timeout': config['SERVER_GRACEFUL_TIMEOUT'],
+        'keepalive': config['SERVER_KEEPALIVE'],
+        'max_requests': config['SERVER_MAX_REQUESTS'],
+        'max_requests_jitter': config['SERVER_MAX_REQUESTS_JITTER'],
+        'when_ready': when_ready,
+        'post_fork': post_fork,
+        'worker_exit': worker_exit,
+    }
+
+
+def server_processes(application):
+    """
+    Method to calculate the amount of processes serving the
+    application: the gunicorn workers, or one in waitress.
+
+    :param application: Flask application.
+    :type application: flask.Flask
+    :return: Amount of processes.
+    :rtype: int
+    """
+    if BaseApplication is None:
+        return 1
+    return server_options(application)['workers']
+
+
+def waitress_options(options):
+    """
+    Method to convert the gunicorn settings to the arguments of
+    waitress.serve. waitress has a single process, so it runs the
+    threads of every worker.
+
+    :param options: gunicorn settings.
+    :type options: dict
+    :return: Keyword arguments of waitress.serve.
+    :rtype: dict
+    """
+    return {
+        'listen': options['bind'],
+        'threads': options['workers'] * options['threads'],
+        'channel_timeout': max(options['keepalive'], options['timeout']),
+    }
+
+
+def serve(application):
+    """
+    Method to serve the application in gunicorn or, when it is not
+    installed, in waitress. Blocks until the server stops.
+
+    :param application: Flask application.
+    :type application: flask.Flask
+    """
+    options = server_options(application)
+    if BaseApplication is not None:
+        GunicornApplication(application, options).run()
+    elif waitress is not None:
+        arguments = waitress_options(options)
+        if application.config['ADMISSION_MAX_CONCURRENCY'] is None:
+            # A single process runs the threads of every worker.
+            application.config['ADMISSION_MAX_CONCURRENCY'] = \
+                max(arguments['threads'] - 1, 1)
+            admission.configure(application)
+        preload_templates(application)
+        initialize_worker()
+        waitress.serve(application, **arguments)
+    else:
+        raise RuntimeError('Install gunicorn or waitress to serve the'
+                           ' application')
+
+
+if BaseApplication is not None:
+    class GunicornApplication(BaseApplication):
+        """
+        Class to run the Flask application in gunicorn from Python,
+        with the settings built by server_options.
+        """
+        def __init__(self, application, options):
+            self.application = application
+            self.options = options
+            super().__init__()
+
+        def load_config(self):
+            for key, value in self.options.items():
+                self.cfg.set(key, value)
+
+        def load(self):
+            return self.application
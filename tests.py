@@ -1,12 +1,54 @@
 """
 Unit Tests
 """
+import asyncio
+import atexit
+import bson
+import json
+import logging
+import os
+import queue
+import re
+import tempfile
+import threading
+import time
 import unittest
+from logging.handlers import QueueListener, RotatingFileHandler, \
+    WatchedFileHandler
+from pymongo.errors import DuplicateKeyError, NetworkTimeout
+import benchmarks
 from src import app
+from src.asgi import AsgiApplication, application
 from src.repository.task_repository import TaskRepository
+from src.repository.async_task_repository import AsyncTaskRepository
+from src.jobs import RepeatingTimer, reconcile_stats_once
+from src.model.task import CODEC_OPTIONS, Task
+from src.repository.task_cache import TaskCache
+from src.repository.connection import ConnectionManager, connections
+from src.repository.memory import MemoryTaskStore
+from src.repository.store import TaskStore
+from src.repository.mongo_store import MongoTaskStore, \
+    supports_pipeline_updates
+from src.repository.monitoring import CommandMonitor, plan_stages, \
+    query_shape
+from src.repository.indexes import index_for_query
+from src.repository.text_index import TextIndex, tokenize
+from src.admission import AdmissionGate, AsyncAdmissionGate, \
+    CircuitBreaker, admission
+from src.metrics import Histogram, metrics, timed
+from types import SimpleNamespace
+from src.logging_setup import JsonFormatter, SamplingFilter, \
+    configure_logging, create_file_handler, parse_sampling, \
+    restart_listener
+from src.server import initialize_worker, preload_templates, \
+    server_options, stop_worker, waitress_options, worker_timers
 from src.controller.task_controller import find_next_available_id
+from src.controller.task_controller import edge_cursor, encode_cursor
+from src.controller.task_controller import db as task_db, page_cache
 
 app.config['TESTING'] = True
+# The Identifiers of the tests are sequential among the repositories.
+app.config['TASK_ID_BLOCK_SIZE'] = 1
 
 
 class TestIndex(unittest.TestCase):
@@ -116,19 +158,21 @@ class TestFindAll(unittest.TestCase):
         self.assertEqual(2, find_next_available_id())
 
 
-class TestInsert(unittest.TestCase):
+class TestFindAllPagination(unittest.TestCase):
     """
-    Class to allocate the test methods of insert page (/insert).
+    Class to allocate the test methods of the pages of the list page
+    (/find-all).
     """
     def setUp(self):
         """
         Method that will be executed before tests. Creates a test
-        instance and mock Database. Makes a GET HTTP request to /insert
-        endpoint and stores the response in a variable.
+        instance and mock Database with five registers.
         """
         self.app_test = app.test_client()
         self.db = TaskRepository(app)
-        self.response = self.app_test.get('/insert')
+
+        for task_id in range(1, 6):
+            self.db.insert_one(task_id, "MockData" + str(task_id), False)
 
     def tearDown(self):
         """
@@ -136,58 +180,97 @@ class TestInsert(unittest.TestCase):
         """
         self.db.drop_mongo_connection()
 
-    def test_get_insert_returns_200(self):
+    def test_find_page_returns_first_page(self):
         """
-        Method to test if the /insert endpoint returns 200 in HTTP
-        status code.
+        Method to test if find_page returns the first Tasks, and that
+        only a next page exists.
         """
         print("In method", self._testMethodName)
-        self.assertEqual(200, self.response.status_code)
+        tasks, has_previous, has_next = self.db.find_page(2)
+        self.assertEqual([1, 2], [task.get('_id') for task in tasks])
+        self.assertFalse(has_previous)
+        self.assertTrue(has_next)
 
-    def test_get_insert_renders_html(self):
+    def test_find_page_after_and_before(self):
         """
-        Method to test if the /insert endpoint returns HTML.
+        Method to test if find_page returns the pages around an
+        Identifier.
         """
         print("In method", self._testMethodName)
-        self.assertIn('text/html', self.response.content_type)
+        tasks, has_previous, has_next = self.db.find_page(2, after=4)
+        self.assertEqual([5], [task.get('_id') for task in tasks])
+        self.assertTrue(has_previous)
+        self.assertFalse(has_next)
 
-    def test_get_insert_renders_title_html(self):
+        tasks, has_previous, has_next = self.db.find_page(2, before=3)
+        self.assertEqual([1, 2], [task.get('_id') for task in tasks])
+        self.assertFalse(has_previous)
+        self.assertTrue(has_next)
+
+    def test_get_find_all_with_limit_renders_next_page_link(self):
         """
-        Method to test if the /insert endpoint returns a HTML tag with
-        title of the page.
+        Method to test if the /find-all endpoint renders only the
+        Tasks of the page, with the link to the next page.
         """
         print("In method", self._testMethodName)
-        response_decoded = self.response.data.decode('utf-8')
-        self.assertIn('<title>Criar nova Tarefa</title>', response_decoded)
+        response = self.app_test.get('/find-all?limit=2')
+        response_decoded = response.data.decode('utf-8')
+        self.assertIn('MockData2', response_decoded)
+        self.assertNotIn('MockData3', response_decoded)
+        self.assertIn('after=' + encode_cursor(2), response_decoded)
+        self.assertNotIn('before=', response_decoded)
 
-    def test_route_insert(self):
+    def test_get_find_all_after_cursor(self):
         """
-        Method to test if the /insert endpoint creates a new register
-        in the database.
+        Method to test if the /find-all endpoint renders the page after
+        the cursor token.
         """
         print("In method", self._testMethodName)
-        description = 'TesteInsert'
-        status = False
-        self.app_test.post('/insert', data=dict(description=description,
-                                                status=status))
-        task = self.db.find_one({"description": description})
+        response = self.app_test.get('/find-all?limit=2&after='
+                                     + encode_cursor(2))
+        response_decoded = response.data.decode('utf-8')
+        self.assertIn('MockData3', response_decoded)
+        self.assertNotIn('MockData2', response_decoded)
+        self.assertIn('before=' + encode_cursor(3), response_decoded)
 
-        self.assertEqual(description, task.get('description'))
+    def test_get_find_all_stream_renders_all_tasks(self):
+        """
+        Method to test if the /find-all endpoint, in stream mode, sends
+        all the Tasks without pagination.
+        """
+        print("In method", self._testMethodName)
+        response = self.app_test.get('/find-all?stream=1&limit=2')
+        response_decoded = response.data.decode('utf-8')
+        self.assertIn('MockData1', response_decoded)
+        self.assertIn('MockData5', response_decoded)
+        self.assertIn('</html>', response_decoded)
+
+    def test_get_find_all_with_invalid_cursor_returns_400(self):
+        """
+        Method to test if the /find-all endpoint refuses an invalid
+        cursor token.
+        """
+        print("In method", self._testMethodName)
+        response = self.app_test.get('/find-all?after=invalid')
+        self.assertEqual(400, response.status_code)
 
 
-class TestUpdate(unittest.TestCase):
+class TestFindAllFilters(unittest.TestCase):
     """
-    Class to allocate the test methods of update page (/update-by-id).
+    Class to allocate the test methods of the filters and sort of the
+    list of Tasks (/find-all and /api/v1/tasks).
     """
     def setUp(self):
         """
         Method that will be executed before tests. Creates a test
-        instance and mock Database. Makes a GET HTTP request to
-        /update-by-id endpoint and stores the response in a variable.
+        instance and mock Database with five registers.
         """
         self.app_test = app.test_client()
         self.db = TaskRepository(app)
-        self.response = self.app_test.get('/update-by-id/1')
+        tasks = [("Buy milk", False), ("Buy bread", True), ("Call mom", False),
+                 ("Clean (house)", True), ("Buy eggs", False)]
+        for task_id, (description, status) in enumerate(tasks, 1):
+            self.db.insert_one(task_id, description, status)
 
     def tearDown(self):
         """
@@ -195,84 +278,126 @@ class TestUpdate(unittest.TestCase):
         """
         self.db.drop_mongo_connection()
 
-    def test_get_update_by_id_returns_200(self):
+    @staticmethod
+    def ids(tasks):
         """
-        Method to test if the /update-by-id endpoint returns 200 in
-        HTTP status code.
+        Method to list the Identifiers of the Tasks.
         """
-        print("In method", self._testMethodName)
-        self.assertEqual(200, self.response.status_code)
+        return [task.get('_id') for task in tasks]
 
-    def test_get_update_by_id_renders_html(self):
+    def test_find_page_filters_by_status_and_prefix(self):
         """
-        Method to test if the /update-by-id endpoint returns HTML.
+        Method to test if find_page returns only the Tasks with the
+        status and the description prefix, escaping the prefix.
         """
         print("In method", self._testMethodName)
-        self.assertIn('text/html', self.response.content_type)
+        tasks, _, _ = self.db.find_page(
+            10, parameters=self.db.task_filters(False, 'Buy'))
+        self.assertEqual([1, 5], self.ids(tasks))
 
-    def test_get_update_by_id_renders_title_html(self):
+        tasks, _, _ = self.db.find_page(
+            10, parameters=self.db.task_filters(description='Clean ('))
+        self.assertEqual([4], self.ids(tasks))
+
+    def test_find_page_sorted_by_description(self):
         """
-        Method to test if the /update-by-id endpoint returns a HTML tag
-        with title of the page.
+        Method to test if the pages sorted by description follow the
+        keyset of the description, in both directions.
         """
         print("In method", self._testMethodName)
-        response_decoded = self.response.data.decode('utf-8')
-        self.assertIn('<title>Atualizar Tarefa</title>', response_decoded)
+        tasks, has_previous, has_next = \
+            self.db.find_page(2, sort_key='description')
+        self.assertEqual([2, 5], self.ids(tasks))
+        self.assertFalse(has_previous)
+        self.assertTrue(has_next)
 
-    def test_route_update_by_id(self):
+        tasks, _, has_next = self.db.find_page(
+            2, after=("Buy eggs", 5), sort_key='description')
+        self.assertEqual([1, 3], self.ids(tasks))
+        self.assertTrue(has_next)
+
+        tasks, has_previous, _ = self.db.find_page(
+            2, before=("Buy milk", 1), sort_key='description',
+            direction=1)
+        self.assertEqual([2, 5], self.ids(tasks))
+        self.assertFalse(has_previous)
+
+    def test_find_page_sorted_by_status_descending(self):
         """
-        Method to test if the /update-by-id endpoint updates an
-        existing register in the database.
+        Method to test if the pages sorted by status are also sorted by
+        Identifier, so the keyset never skips or repeats a Task.
         """
         print("In method", self._testMethodName)
-        description = 'TesteUpdate'
-        status = False
-        self.app_test.post('/insert', data=dict(description=description,
-                                                status=status))
-        task = self.db.find_one({"description": description})
+        tasks, _, _ = self.db.find_page(3, sort_key='status',
+                                        direction=-1)
+        self.assertEqual([4, 2, 5], self.ids(tasks))
+        tasks, _, has_next = self.db.find_page(
+            3, after=(False, 5), sort_key='status', direction=-1)
+        self.assertEqual([3, 1], self.ids(tasks))
+        self.assertFalse(has_next)
 
-        description = 'TesteUpdateUpdated'
-        self.app_test.put('/update-by-id/' + str(task.get('_id')),
-                          data=dict(description=description))
-        task = self.db.find_one({"description": description})
-
-        self.assertEqual(description, task.get('description'))
+    def test_get_find_all_with_filters(self):
+        """
+        Method to test if the /find-all endpoint filters the Tasks, and
+        keeps the filters in the pagination links.
+        """
+        print("In method", self._testMethodName)
+        response = self.app_test.get('/find-all?status=false&sort='
+                                     'description&order=desc&limit=1')
+        response_decoded = response.data.decode('utf-8')
+        self.assertIn('Call mom', response_decoded)
+        self.assertNotIn('Buy milk', response_decoded)
+        self.assertIn('after=' + edge_cursor({"_id": 3,
+                                              "description": "Call mom"},
+                                             'description'),
+                      response_decoded)
+        self.assertIn('status=false', response_decoded)
 
-    def test_route_change_status_by_id(self):
+    def test_get_find_all_with_invalid_filters_returns_400(self):
         """
-        Method to test if the /change-status-by-id endpoint changes the
-        status of an existing register in the database.
+        Method to test if the /find-all endpoint refuses invalid filters
+        and cursor tokens of another sort key.
         """
         print("In method", self._testMethodName)
-        description = 'TesteUpdateStatus'
-        status = False
-        self.app_test.post('/insert', data=dict(description=description,
-                                                status=status))
-        task = self.db.find_one({"description": description})
-        self.app_test.put('/change-status-by-id/' + str(task.get('_id')))
-        task = self.db.find_one({"_id": task.get('_id')})
+        for query in ('status=maybe', 'sort=other', 'order=up',
+                      'sort=description&after=' + encode_cursor(2)):
+            response = self.app_test.get('/find-all?' + query)
+            self.assertEqual(400, response.status_code)
 
-        self.assertEqual(True, task.get('status'))
+    def test_api_get_tasks_with_filters(self):
+        """
+        Method to test if the API lists the Tasks filtered and sorted,
+        following the cursor token of the next page.
+        """
+        print("In method", self._testMethodName)
+        response = self.app_test.get('/api/v1/tasks?description=Buy'
+                                     '&sort=description&limit=2')
+        data = response.get_json()
+        self.assertEqual([2, 5], [task.get('id') for task
+                                  in data.get('tasks')])
+        response = self.app_test.get('/api/v1/tasks?description=Buy'
+                                     '&sort=description&limit=2&after='
+                                     + data.get('next'))
+        self.assertEqual([1], [task.get('id') for task
+                               in response.get_json().get('tasks')])
 
 
-class TestDelete(unittest.TestCase):
+class TestSearch(unittest.TestCase):
     """
-    Class to allocate the test methods of delete page (/delete-by-id).
+    Class to allocate the test methods of the full-text search of Tasks
+    (/search).
     """
     def setUp(self):
         """
         Method that will be executed before tests. Creates a test
-        instance and mock Database with register.
+        instance and mock Database with four registers.
         """
         self.app_test = app.test_client()
         self.db = TaskRepository(app)
-
-        self.mock_task_id = 1
-        self.mock_task_description = "MockData"
-        self.mock_task_status = False
-
-        self.db.insert_one(self.mock_task_id, self.mock_task_description,
-                           self.mock_task_status)
+        descriptions = ["Comprar pão", "Comprar pão e leite",
+                        "Lavar o carro", "Pagar a conta de luz"]
+        for task_id, description in enumerate(descriptions, 1):
+            self.db.insert_one(task_id, description, False)
 
     def tearDown(self):
         """
@@ -280,35 +405,87 @@ class TestDelete(unittest.TestCase):
         """
         self.db.drop_mongo_connection()
 
-    def test_route_delete_by_id(self):
+    def test_tokenize_ignores_case_and_diacritics(self):
         """
-        Method to test if the /delete-by-id endpoint deletes an
-        existing register in the database.
+        Method to test if the words are split ignoring case and
+        diacritics.
         """
         print("In method", self._testMethodName)
-        task = self.db.find_one({"description": self.mock_task_description})
+        self.assertEqual(['comprar', 'pao', 'e', 'leite'],
+                         tokenize('Comprar PÃO, e leite!'))
 
-        self.app_test.delete('/delete-by-id/' + str(task.get('_id')))
-        task = self.db.find_one({"description": self.mock_task_description})
+    def test_text_index_ranks_by_relevance(self):
+        """
+        Method to test if the Tasks with more (and rarer) words searched
+        come first.
+        """
+        print("In method", self._testMethodName)
+        text_index = TextIndex([{"_id": 1, "description": "pão"},
+                                {"_id": 2, "description": "pão e leite"},
+                                {"_id": 3, "description": "carro"}])
+        self.assertEqual([2, 1], [task.get('_id') for task
+                                  in text_index.search('leite pao')])
+        self.assertEqual([], text_index.search('nada'))
 
-        self.assertEqual(None, task)
+    def test_search_is_paginated_and_follows_writes(self):
+        """
+        Method to test if the search returns pages, and sees the Tasks
+        written after the previous search.
+        """
+        print("In method", self._testMethodName)
+        tasks, has_next = self.db.search('comprar pão', 1)
+        self.assertEqual([1], [task.get('_id') for task in tasks])
+        self.assertTrue(has_next)
+        tasks, has_next = self.db.search('comprar pão', 1, page=2)
+        self.assertEqual([2], [task.get('_id') for task in tasks])
+        self.assertFalse(has_next)
 
+        self.db.insert_one(5, "Comprar carro", False)
+        tasks, _ = self.db.search('carro', 10)
+        self.assertEqual({3, 5}, {task.get('_id') for task in tasks})
 
-class TestRepository(unittest.TestCase):
+    def test_get_search_renders_tasks(self):
+        """
+        Method to test if the /search endpoint renders the Tasks found,
+        and only the form without search.
+        """
+        print("In method", self._testMethodName)
+        response = self.app_test.get('/search?q=carro')
+        response_decoded = response.data.decode('utf-8')
+        self.assertEqual(200, response.status_code)
+        self.assertIn('Lavar o carro', response_decoded)
+        self.assertNotIn('Comprar', response_decoded)
+        self.assertEqual(200, self.app_test.get('/search').status_code)
+
+    def test_get_search_returns_json(self):
+        """
+        Method to test if the /search endpoint returns JSON to clients
+        that accept it, and 400 without search.
+        """
+        print("In method", self._testMethodName)
+        headers = {"Accept": "application/json"}
+        response = self.app_test.get('/search?q=leite', headers=headers)
+        data = response.get_json()
+        self.assertEqual([2], [task.get('id') for task in data.get('tasks')])
+        self.assertGreater(data.get('tasks')[0].get('score'), 0)
+        self.assertIsNone(data.get('next'))
+        self.assertEqual(400, self.app_test.get('/search',
+                                                headers=headers).status_code)
+
+
+class TestStats(unittest.TestCase):
+    """
+    Class to allocate the test methods of the statistics of the Tasks.
+    """
     def setUp(self):
         """
         Method that will be executed before tests. Creates a test
-        instance and mock Database with register.
+        instance and mock Database with two registers.
         """
         self.app_test = app.test_client()
         self.db = TaskRepository(app)
-
-        self.mock_task_id = 1
-        self.mock_task_description = "MockData"
-        self.mock_task_status = False
-
-        self.db.insert_one(self.mock_task_id, self.mock_task_description,
-                           self.mock_task_status)
+        self.db.insert_one(1, "Stats1", False)
+        self.db.insert_one(2, "Stats2", True)
 
     def tearDown(self):
         """
@@ -316,130 +493,2865 @@ class TestRepository(unittest.TestCase):
         """
         self.db.drop_mongo_connection()
 
-    def test_find_returns_2(self):
+    def test_stats_follow_writes(self):
         """
-        Method to test if find, returns the correct amount of objects.
+        Method to test if every write keeps the statistics equal to the
+        ones computed from the collection.
         """
         print("In method", self._testMethodName)
-        self.db.insert_one(2, "TesteFind", True)
-        query = self.db.find({}, {})
-        tasks = []
-        for task in query:
-            tasks.append(task)
-        self.assertEqual(2, len(tasks))
+        self.assertEqual({"total": 2, "finished": 1, "pending": 1},
+                         self.db.stats())
+        self.db.toggle_status(1)
+        self.db.update_one({"_id": 2}, {"status": False})
+        self.db.update_one({"_id": 2}, {"description": "Stats2b"})
+        self.db.upsert_by_description("Stats3", True)
+        self.db.upsert_by_description("Stats3", True)
+        self.db.insert_many([{"description": "Stats4", "status": True},
+                             {"description": "Stats1", "status": True}])
+        self.db.delete_one({"_id": 1})
+        self.db.delete_one({"_id": 1})
+        self.assertEqual({"total": 3, "finished": 2, "pending": 1},
+                         self.db.stats())
+        self.assertEqual(self.db.stats(), self.db.reconcile_stats(wait=0))
 
-    def test_find_with_constraints_returns_object_2(self):
+    def test_bulk_writes_count_stats_without_aggregation(self):
         """
-        Method to test if find using description as constraint, returns
-        the correct object.
+        Method to test if the bulk writes update the statistics from the
+        status of the written Tasks, without computing them again over
+        the collection.
         """
         print("In method", self._testMethodName)
-        self.db.insert_one(2, "TestFindWithConstraints", True)
-        query = self.db.find({"description": "TestFindWithConstraints"}, {})
-        tasks = []
-        for task in query:
-            tasks.append(task)
-        self.assertEqual(2, tasks[0].get('_id'))
+        self.db.insert_one(3, "Stats3", False)
+        self.db.stats()
+        self.db.get_store().increment("task_stats", {"total": 10})
+        self.db.update_many([(1, {"status": True}), (2, {"status": True}),
+                             (9, {"status": True})])
+        self.assertEqual([3], self.db.delete_many([3, 9]))
+        self.assertEqual({"total": 12, "finished": 2, "pending": 10},
+                         self.db.stats())
 
-    def test_find_with_fields_returns_all_fields(self):
+    def test_reconcile_job_runs_once_per_interval(self):
         """
-        Method to test if find passing the required fields, returns the
-        correct object.
+        Method to test if the periodic recalculation of the statistics
+        runs in a single process until its lease expires.
         """
         print("In method", self._testMethodName)
-        query = self.db.find({}, {"_id": True, "description": True,
-                                  "status": True})
-        tasks = []
-        for task in query:
-            tasks.append(task)
-        self.assertEqual(self.mock_task_description,
-                         tasks[0].get('description'))
+        interval = app.config['TASK_COUNTERS_FLUSH_INTERVAL']
+        app.config['TASK_COUNTERS_FLUSH_INTERVAL'] = 0
+        try:
+            self.assertIsNotNone(reconcile_stats_once(self.db, 60))
+            self.assertIsNone(reconcile_stats_once(self.db, 60))
+        finally:
+            app.config['TASK_COUNTERS_FLUSH_INTERVAL'] = interval
+        self.assertTrue(self.db.acquire_lease('test_lease', 0))
+        self.assertTrue(self.db.acquire_lease('test_lease', 60))
+        self.assertFalse(self.db.acquire_lease('test_lease', 60))
 
-    def test_find_with_constraints_and_fields_returns_all_object_2(self):
+    def test_async_writes_update_stats(self):
         """
-        Method to test if find using description as constraint, and
-        passing the required fields, returns the correct object.
+        Method to test if the writes of the asynchronous repository
+        also update the statistics.
         """
         print("In method", self._testMethodName)
-        self.db.insert_one(2, "TestFindWithConstraintsAndFields", True)
-        query = \
-            self.db.find({"description": "TestFindWithConstraintsAndFields"},
-                         {"_id": True, "description": True,
+        self.db.stats()
+        async_db = AsyncTaskRepository(app)
+
+        async def write():
+            await async_db.insert_one(3, "Stats3", True)
+            await async_db.toggle_status(1)
+            await async_db.delete_one({"_id": 2})
+        asyncio.run(write())
+        self.assertEqual({"total": 2, "finished": 2, "pending": 0},
+                         self.db.stats())
+
+    def test_reconcile_stats_fixes_counters(self):
+        """
+        Method to test if the reconciliation fixes counters different
+        from the collection.
+        """
+        print("In method", self._testMethodName)
+        self.db.stats()
+        self.db.get_store().set_counter("task_stats", {"total": 10})
+        result = app.test_cli_runner().invoke(
+            args=['reconcile-stats', '--wait', '0'])
+        self.assertIn('total=2 finished=1 pending=1', result.output)
+        self.assertEqual(2, self.db.stats().get('total'))
+
+    def test_reconcile_stats_keeps_counters_changed_meanwhile(self):
+        """
+        Method to test if the reconciliation keeps the counters when a
+        write changes them during the aggregation, instead of setting
+        them to a stale count, and fixes them on the next execution.
+        """
+        print("In method", self._testMethodName)
+        self.db.stats()
+        store = self.db.get_store()
+        count = store.count
+
+        def count_during_write():
+            result = count()
+            # A write counted by the aggregation, whose increment is
+            # written after it.
+            store.insert({"_id": 3, "description": "Stats3",
                           "status": True})
-        tasks = []
-        for task in query:
-            tasks.append(task)
-        self.assertEqual("TestFindWithConstraintsAndFields",
-                         tasks[0].get('description'))
+            self.db._count_stats(1, 1)
+            self.db.flush_counters()
+            return result
+        store.count = count_during_write
+        try:
+            self.assertIsNone(self.db.reconcile_stats(wait=0))
+        finally:
+            del store.count
+        self.assertEqual({"total": 3, "finished": 2, "pending": 1},
+                         self.db.stats())
+        self.assertEqual(self.db.stats(), self.db.reconcile_stats(wait=0))
 
-    def test_find_one_by_id_returns_correct_object(self):
+    def test_get_index_renders_stats(self):
         """
-        Method to test if find_one using id as constraint, returns
-        the correct object.
+        Method to test if the /index endpoint renders the statistics.
         """
         print("In method", self._testMethodName)
-        task = self.db.find_one({"_id": self.mock_task_id})
-        self.assertEqual(self.mock_task_description, task.get('description'))
+        self.db.toggle_status(1)
+        response_decoded = self.app_test.get('/').data.decode('utf-8')
+        self.assertIn('<td>2</td>', response_decoded)
+        self.assertIn('<td>0</td>', response_decoded)
 
-    def test_find_one_by_description_returns_correct_object(self):
+    def test_repeating_timer_runs_until_stopped(self):
         """
-        Method to test if find_one using description as constraint,
-        returns the correct object.
+        Method to test if the timer executes the function periodically,
+        even after an error.
         """
         print("In method", self._testMethodName)
-        self.db.insert_one(2, "TestFindOneByDescription", True)
-        task = self.db.find_one({"description": "TestFindOneByDescription"})
-        self.assertEqual("TestFindOneByDescription", task.get('description'))
+        calls = []
+        done = threading.Event()
 
-    def test_insert_one(self):
+        def function():
+            calls.append(1)
+            if len(calls) == 1:
+                raise RuntimeError('failure')
+            done.set()
+
+        timer = RepeatingTimer(0.01, function, logging.getLogger('test'))
+        timer.start()
+        self.assertTrue(done.wait(5))
+        timer.stop()
+        self.assertGreaterEqual(len(calls), 2)
+
+
+class TestTaskTransfer(unittest.TestCase):
+    """
+    Class to allocate the test methods of the export and import
+    commands.
+    """
+    def setUp(self):
         """
-        Method to test if insert_one really insert the register in
-        database.
+        Method that will be executed before tests. Creates a command
+        runner and mock Database with two registers.
+        """
+        self.runner = app.test_cli_runner(mix_stderr=False)
+        self.db = TaskRepository(app)
+        self.db.insert_one(1, "Transfer1", False)
+        self.db.insert_one(2, "Transfer2, \"quoted\"", True)
+
+    def tearDown(self):
+        """
+        Method to be executed when test finish. Drop the mock database.
+        """
+        self.db.drop_mongo_connection()
+
+    def test_export_writes_ndjson(self):
+        """
+        Method to test if the export writes one JSON object per Task, in
+        the order of the Identifier, and reports the throughput.
         """
         print("In method", self._testMethodName)
-        self.db.insert_one(2, "TesteInsert", True)
-        task = self.db.find_one({"_id": 2})
-        self.assertEqual("TesteInsert", task.get('description'))
+        result = self.runner.invoke(args=['tasks', 'export'])
+        self.assertEqual(0, result.exit_code)
+        self.assertEqual([{"id": 1, "description": "Transfer1",
+                           "status": False},
+                          {"id": 2, "description": 'Transfer2, "quoted"',
+                           "status": True}],
+                         [json.loads(line)
+                          for line in result.stdout.splitlines()])
+        self.assertIn('exported=2', result.stderr)
+        self.assertIn('tasks_per_second=', result.stderr)
 
-    def test_update_one_by_id(self):
+    def test_export_and_import_csv(self):
         """
-        Method to test if update_one really update the register in
-        database.
+        Method to test if an exported CSV file is imported again, with
+        the existing descriptions skipped and new Identifiers allocated.
         """
         print("In method", self._testMethodName)
-        self.db.update_one({"_id": self.mock_task_id},
-                           {"description": "TesteUpdate"})
-        task = self.db.find_one({"_id": self.mock_task_id})
-        self.assertEqual("TesteUpdate", task.get('description'))
+        result = self.runner.invoke(args=['tasks', 'export',
+                                          '--format', 'csv'])
+        self.assertEqual('id,description,status',
+                         result.stdout.splitlines()[0])
 
-    def test_update_one_by_nonexistent_id(self):
+        exported = result.stdout + '9,Transfer3,true\n'
+        result = self.runner.invoke(args=['tasks', 'import', '--format',
+                                          'csv', '--batch-size', '2'],
+                                    input=exported)
+        self.assertEqual(0, result.exit_code)
+        self.assertIn('imported=1 duplicated=2 invalid=0 failed=0',
+                      result.stderr)
+        task = self.db.find_one({"description": "Transfer3"})
+        self.assertTrue(task.get('status'))
+        self.assertNotEqual(9, task.get('_id'))
+        self.assertEqual({"total": 3, "finished": 2, "pending": 1},
+                         self.db.stats())
+
+    def test_import_ndjson_skips_invalid_lines(self):
         """
-        Method to test if update_one works with nonexistent id.
+        Method to test if the import reports the invalid lines, and
+        inserts the valid ones.
         """
         print("In method", self._testMethodName)
-        self.db.update_one({"_id": 15},
-                           {"description": "TesteUpdate"})
-        task = self.db.find_one({"_id": 15})
-        self.assertEqual(None, task)
+        source = '\n'.join(['{"description": "New1", "status": true}',
+                            'not json',
+                            '{"description": "", "status": false}',
+                            '{"description": "New2", "status": "x"}',
+                            '',
+                            '{"description": "New3"}']) + '\n'
+        result = self.runner.invoke(args=['tasks', 'import'], input=source)
+        self.assertEqual(0, result.exit_code)
+        self.assertIn('line 2: invalid Task', result.stderr)
+        self.assertIn('imported=2 duplicated=0 invalid=3 failed=0',
+                      result.stderr)
+        self.assertFalse(self.db.find_one({"description": "New3"})
+                         .get('status'))
 
-    def test_delete_one_by_id(self):
+
+class TestWriteBehind(unittest.TestCase):
+    """
+    Class to allocate the test methods of the write-behind buffer of the
+    status changes (TASK_WRITE_BEHIND).
+    """
+    def setUp(self):
         """
-        Method to test if delete_one really delete the register in
-        database.
+        Method that will be executed before tests. Enables the
+        write-behind buffer, and creates a mock Database with three
+        registers.
+        """
+        app.config['TASK_WRITE_BEHIND'] = True
+        self.app_test = app.test_client()
+        self.db = TaskRepository(app)
+        self.store = self.db.get_store()
+        for task_id in range(1, 4):
+            self.db.insert_one(task_id, "Buffered" + str(task_id), False)
+
+    def tearDown(self):
+        """
+        Method to be executed when test finish. Drop the mock database
+        and disables the write-behind buffer.
+        """
+        self.db.drop_mongo_connection()
+        app.config['TASK_WRITE_BEHIND'] = False
+        app.config['TASK_WRITE_BEHIND_MAX_PENDING'] = 100
+
+    def stored_status(self, task_id):
+        """
+        Method to read the status written in the database.
+        """
+        return self.store.find_one('_id', task_id).get('status')
+
+    def test_toggles_are_coalesced_and_read_from_buffer(self):
+        """
+        Method to test if repeated toggles are kept in memory, seen by
+        the reads, and written once.
         """
         print("In method", self._testMethodName)
-        self.db.delete_one({"_id": self.mock_task_id})
-        task = self.db.find_one({"_id": self.mock_task_id})
-        self.assertEqual(None, task)
+        self.assertTrue(self.db.toggle_status(1))
+        self.assertFalse(self.db.toggle_status(1))
+        self.assertTrue(self.db.toggle_status(1))
+        self.assertTrue(self.db.toggle_status(2))
+        self.assertFalse(self.stored_status(1))
+        self.assertTrue(self.db.find_one({"_id": 1}).get('status'))
+        self.assertEqual(2, self.db.stats().get('finished'))
 
-    def test_delete_one_by_nonexistent_id(self):
+        self.assertEqual(2, self.db.flush_status_buffer())
+        self.assertTrue(self.stored_status(1))
+        self.assertTrue(self.stored_status(2))
+        self.assertEqual(0, self.db.flush_status_buffer())
+        self.assertEqual(self.db.reconcile_stats(wait=0), self.db.stats())
+
+    def test_toggle_back_needs_no_write(self):
         """
-        Method to test if delete_one works with nonexistent id.
+        Method to test if a Task toggled back to its stored status is
+        removed from the buffer.
         """
         print("In method", self._testMethodName)
-        self.db.delete_one({"_id": 15})
-        task = self.db.find_one({"_id": 15})
-        self.assertEqual(None, task)
+        self.db.toggle_status(1)
+        self.db.toggle_status(1)
+        self.assertEqual(0, len(self.db.status_buffer))
+        self.assertIsNone(self.db.toggle_status(99))
+
+    def test_buffer_is_flushed_when_full(self):
+        """
+        Method to test if the buffer is written when it reaches the max
+        amount of Tasks.
+        """
+        print("In method", self._testMethodName)
+        app.config['TASK_WRITE_BEHIND_MAX_PENDING'] = 2
+        self.db.toggle_status(1)
+        self.assertFalse(self.stored_status(1))
+        self.db.toggle_status(2)
+        self.assertTrue(self.stored_status(1))
+        self.assertTrue(self.stored_status(2))
+
+    def test_list_page_shows_buffered_status(self):
+        """
+        Method to test if the version of the collection changes with a
+        buffered toggle, and the list page shows the buffered status.
+        """
+        print("In method", self._testMethodName)
+        version = self.db.version()
+        self.app_test.get('/change-status-by-id/1')
+        self.assertNotEqual(version, self.db.version())
+        response_decoded = self.app_test.get('/find-all').data\
+            .decode('utf-8')
+        self.assertEqual(1, response_decoded.count('checked'))
+        self.assertFalse(self.stored_status(1))
+
+        response_decoded = self.app_test.get('/find-all?status=true').data\
+            .decode('utf-8')
+        self.assertIn('Buffered1', response_decoded)
+        self.assertTrue(self.stored_status(1))
+
+    def test_direct_writes_are_not_undone(self):
+        """
+        Method to test if a status written directly is not undone by the
+        buffer.
+        """
+        print("In method", self._testMethodName)
+        self.db.toggle_status(1)
+        self.db.update_one({"_id": 1}, {"status": False})
+        self.db.flush_status_buffer()
+        self.assertFalse(self.stored_status(1))
+        self.assertEqual(self.db.reconcile_stats(wait=0), self.db.stats())
+
+    def test_toggles_of_other_processes_are_kept(self):
+        """
+        Method to test if the buffered toggles are written as toggles,
+        keeping the toggles of the same Tasks written by other processes
+        in the meantime, and if deleted Tasks are not counted.
+        """
+        print("In method", self._testMethodName)
+        for task_id in (1, 2, 3):
+            self.db.toggle_status(task_id)
+        # Another process toggles Task 2 and deletes Task 3.
+        app.config['TASK_WRITE_BEHIND'] = False
+        try:
+            self.db.toggle_status(2)
+        finally:
+            app.config['TASK_WRITE_BEHIND'] = True
+        self.store.delete(3)
+        self.store.increment("task_stats", {"total": -1})
+
+        self.assertEqual(2, self.db.flush_status_buffer())
+        self.assertTrue(self.stored_status(1))
+        self.assertFalse(self.stored_status(2))
+        self.assertEqual({"total": 2, "finished": 1, "pending": 1},
+                         self.db.stats())
+        self.assertEqual(self.db.reconcile_stats(wait=0), self.db.stats())
+
+
+class TestTaskModel(unittest.TestCase):
+    """
+    Class to allocate the test methods of the Task model.
+    """
+    def test_task_has_only_slots(self):
+        """
+        Method to test if a Task keeps its fields in slots, and can be
+        read as a document.
+        """
+        print("In method", self._testMethodName)
+        task = Task(1, "Model", True)
+        self.assertFalse(hasattr(task, '__dict__'))
+        self.assertEqual({"_id": 1, "description": "Model", "status": True},
+                         dict(task))
+        self.assertEqual(1, task.get('_id'))
+        self.assertIsNone(task.get('other'))
+        self.assertEqual(task, Task.from_document(dict(task)))
+
+    def test_bson_decodes_into_task(self):
+        """
+        Method to test if the BSON decoder builds a Task directly,
+        skipping the fields that are not of the Task.
+        """
+        print("In method", self._testMethodName)
+        data = bson.encode({"_id": 2, "description": "Decoded",
+                            "status": False, "other": [1, 2]})
+        task = bson.decode(data, codec_options=CODEC_OPTIONS)
+        self.assertIsInstance(task, Task)
+        self.assertEqual(Task(2, "Decoded", False), task)
+
+    def test_find_page_returns_tasks(self):
+        """
+        Method to test if the pages of Tasks are read as Task.
+        """
+        print("In method", self._testMethodName)
+        db = TaskRepository(app)
+        db.insert_one(1, "Model", False)
+        try:
+            tasks, _, _ = db.find_page(10)
+            streamed = list(db.find_tasks({}))
+        finally:
+            db.drop_mongo_connection()
+        self.assertEqual([Task(1, "Model", False)], tasks)
+        self.assertIsInstance(tasks[0], Task)
+        self.assertIsInstance(streamed[0], Task)
+
+
+class TestFindAllConditional(unittest.TestCase):
+    """
+    Class to allocate the test methods of the version stamp (ETag) of
+    the list page (/find-all).
+    """
+    def setUp(self):
+        """
+        Method that will be executed before tests. Creates a test
+        instance and mock Database with register, and makes a GET HTTP
+        request to /find-all endpoint.
+        """
+        self.app_test = app.test_client()
+        self.db = TaskRepository(app)
+        self.db.insert_one(1, "MockData", False)
+        self.response = self.app_test.get('/find-all')
+
+    def tearDown(self):
+        """
+        Method to be executed when test finish. Drop the mock database.
+        """
+        self.db.drop_mongo_connection()
+
+    def test_version_changes_after_write(self):
+        """
+        Method to test if the version of the collection changes after
+        a write.
+        """
+        print("In method", self._testMethodName)
+        version = self.db.version()
+        self.db.toggle_status(1)
+        self.assertNotEqual(version, self.db.version())
+
+    def test_get_find_all_returns_etag(self):
+        """
+        Method to test if the /find-all endpoint returns the version of
+        the collection as ETag.
+        """
+        print("In method", self._testMethodName)
+        self.assertEqual(self.db.version(),
+                         self.response.get_etag()[0])
+
+    def test_get_find_all_with_same_etag_returns_304(self):
+        """
+        Method to test if the /find-all endpoint returns 304 when the
+        client already has the current version.
+        """
+        print("In method", self._testMethodName)
+        response = self.app_test.get(
+            '/find-all',
+            headers={"If-None-Match": self.response.headers['ETag']})
+        self.assertEqual(304, response.status_code)
+        self.assertEqual(b'', response.data)
+
+    def test_get_find_all_after_write_returns_200(self):
+        """
+        Method to test if the /find-all endpoint renders the page again
+        after a write.
+        """
+        print("In method", self._testMethodName)
+        self.app_test.post('/insert', data=dict(description='TesteETag'))
+        response = self.app_test.get(
+            '/find-all',
+            headers={"If-None-Match": self.response.headers['ETag']})
+        self.assertEqual(200, response.status_code)
+        self.assertIn('TesteETag', response.data.decode('utf-8'))
+
+    def test_get_find_all_reuses_rendered_page(self):
+        """
+        Method to test if the rendered page is reused while the version
+        does not change.
+        """
+        print("In method", self._testMethodName)
+        hits = page_cache.stats().get('hits')
+        response = self.app_test.get('/find-all')
+        self.assertEqual(hits + 1, page_cache.stats().get('hits'))
+        self.assertEqual(self.response.data, response.data)
+
+    def test_version_bump_is_written_by_flush(self):
+        """
+        Method to test if a write changes the version of the process
+        without writing the counter, and the flush writes it.
+        """
+        print("In method", self._testMethodName)
+        store = self.db.get_store()
+        self.db.flush_counters()
+        seq = store.counter("task_version").get('seq')
+        version = self.db.version()
+        self.db.toggle_status(1)
+        self.assertEqual(seq, store.counter("task_version").get('seq'))
+        self.assertNotEqual(version, self.db.version())
+        self.assertEqual(2, self.db.flush_counters())
+        counter = store.counter("task_version")
+        self.assertEqual(seq + 1, counter.get('seq'))
+        self.assertEqual(f'{counter.get("epoch")}-{seq + 1}',
+                         self.db.version())
+
+    def test_exit_flush_needs_no_connection_without_increments(self):
+        """
+        Method to test if the flush executed at exit writes the pending
+        increments, and does not connect when there is none.
+        """
+        print("In method", self._testMethodName)
+        self.db.toggle_status(1)
+        self.db._flush_counters_at_exit()
+        self.assertFalse(self.db.counter_buffer)
+        self.db.drop_mongo_connection()
+        uri = app.config.pop('MONGO_URI', None)
+        backend = app.config['TASK_BACKEND']
+        app.config['TASK_BACKEND'] = 'mongodb'
+        try:
+            self.db._flush_counters_at_exit()
+        finally:
+            app.config['TASK_BACKEND'] = backend
+            if uri is not None:
+                app.config['MONGO_URI'] = uri
+            self.db.drop_mongo_connection()
+
+    def test_version_reads_counter_once_per_interval(self):
+        """
+        Method to test if the version is read from the counter kept by
+        the last flush, and the writes of other processes are seen
+        after the next one.
+        """
+        print("In method", self._testMethodName)
+        store = self.db.get_store()
+        self.db.flush_counters()
+        version = self.db.version()
+        reads = []
+        read = store.counter
+        store.counter = lambda name: reads.append(name) or read(name)
+        try:
+            store.increment("task_version", {"seq": 1})
+            self.assertEqual(version, self.db.version())
+            self.assertEqual([], reads)
+            self.db.flush_counters()
+        finally:
+            del store.counter
+        self.assertEqual(["task_version"], reads)
+        self.assertNotEqual(version, self.db.version())
+
+    def test_version_without_counter_buffer(self):
+        """
+        Method to test if the counter is written by every write when
+        TASK_COUNTERS_FLUSH_INTERVAL is 0.
+        """
+        print("In method", self._testMethodName)
+        interval = app.config['TASK_COUNTERS_FLUSH_INTERVAL']
+        app.config['TASK_COUNTERS_FLUSH_INTERVAL'] = 0
+        try:
+            store = self.db.get_store()
+            self.db.flush_counters()
+            seq = store.counter("task_version").get('seq')
+            self.db.toggle_status(1)
+            self.assertEqual(seq + 1,
+                             store.counter("task_version").get('seq'))
+            self.assertEqual(f'{store.counter("task_version")["epoch"]}'
+                             f'-{seq + 1}', self.db.version())
+        finally:
+            app.config['TASK_COUNTERS_FLUSH_INTERVAL'] = interval
+
+
+class TestInsert(unittest.TestCase):
+    """
+    Class to allocate the test methods of insert page (/insert).
+    """
+    def setUp(self):
+        """
+        Method that will be executed before tests. Creates a test
+        instance and mock Database. Makes a GET HTTP request to /insert
+        endpoint and stores the response in a variable.
+        """
+        self.app_test = app.test_client()
+        self.db = TaskRepository(app)
+        self.response = self.app_test.get('/insert')
+
+    def tearDown(self):
+        """
+        Method to be executed when test finish. Drop the mock database.
+        """
+        self.db.drop_mongo_connection()
+
+    def test_get_insert_returns_200(self):
+        """
+        Method to test if the /insert endpoint returns 200 in HTTP
+        status code.
+        """
+        print("In method", self._testMethodName)
+        self.assertEqual(200, self.response.status_code)
+
+    def test_get_insert_renders_html(self):
+        """
+        Method to test if the /insert endpoint returns HTML.
+        """
+        print("In method", self._testMethodName)
+        self.assertIn('text/html', self.response.content_type)
+
+    def test_get_insert_renders_title_html(self):
+        """
+        Method to test if the /insert endpoint returns a HTML tag with
+        title of the page.
+        """
+        print("In method", self._testMethodName)
+        response_decoded = self.response.data.decode('utf-8')
+        self.assertIn('<title>Criar nova Tarefa</title>', response_decoded)
+
+    def test_route_insert(self):
+        """
+        Method to test if the /insert endpoint creates a new register
+        in the database.
+        """
+        print("In method", self._testMethodName)
+        description = 'TesteInsert'
+        status = False
+        self.app_test.post('/insert', data=dict(description=description,
+                                                status=status))
+        task = self.db.find_one({"description": description})
+
+        self.assertEqual(description, task.get('description'))
+
+    def test_route_insert_existing_description_updates_status(self):
+        """
+        Method to test if the /insert endpoint updates the status of the
+        Task when the Description already exists, instead of creating a
+        new register.
+        """
+        print("In method", self._testMethodName)
+        description = 'TesteInsertTwice'
+        self.app_test.post('/insert', data=dict(description=description,
+                                                status=False))
+        self.app_test.post('/insert', data=dict(description=description,
+                                                status=True))
+        tasks = list(self.db.find({"description": description},
+                                  {"_id": True, "status": True}))
+
+        self.assertEqual(1, len(tasks))
+        self.assertEqual(True, tasks[0].get('status'))
+
+    def test_route_insert_costs_one_write(self):
+        """
+        Method to test if the /insert endpoint creates or updates a Task
+        with a single operation of the store, once the block of
+        Identifiers is reserved.
+        """
+        print("In method", self._testMethodName)
+        app.config['TASK_ID_BLOCK_SIZE'] = 10
+        store = self.db.get_store()
+        calls = []
+
+        def counted(name):
+            method = getattr(store, name)
+            return lambda *args, **kwargs: calls.append(name) \
+                or method(*args, **kwargs)
+        names = [name for name in dir(TaskStore) if not name.startswith('_')]
+        try:
+            self.app_test.post('/insert', data=dict(description='Block'))
+            for name in names:
+                setattr(store, name, counted(name))
+            self.app_test.post('/insert', data=dict(description='New'))
+            self.app_test.post('/insert', data=dict(description='New',
+                                                    status=True))
+        finally:
+            for name in names:
+                delattr(store, name)
+            app.config['TASK_ID_BLOCK_SIZE'] = 1
+            task_db._discard_id_block()
+        self.assertEqual(['upsert_status', 'upsert_status'], calls)
+
+
+class TestUpdate(unittest.TestCase):
+    """
+    Class to allocate the test methods of update page (/update-by-id).
+    """
+    def setUp(self):
+        """
+        Method that will be executed before tests. Creates a test
+        instance and mock Database. Makes a GET HTTP request to
+        /update-by-id endpoint and stores the response in a variable.
+        """
+        self.app_test = app.test_client()
+        self.db = TaskRepository(app)
+        self.response = self.app_test.get('/update-by-id/1')
+
+    def tearDown(self):
+        """
+        Method to be executed when test finish. Drop the mock database.
+        """
+        self.db.drop_mongo_connection()
+
+    def test_get_update_by_id_returns_200(self):
+        """
+        Method to test if the /update-by-id endpoint returns 200 in
+        HTTP status code.
+        """
+        print("In method", self._testMethodName)
+        self.assertEqual(200, self.response.status_code)
+
+    def test_get_update_by_id_renders_html(self):
+        """
+        Method to test if the /update-by-id endpoint returns HTML.
+        """
+        print("In method", self._testMethodName)
+        self.assertIn('text/html', self.response.content_type)
+
+    def test_get_update_by_id_renders_title_html(self):
+        """
+        Method to test if the /update-by-id endpoint returns a HTML tag
+        with title of the page.
+        """
+        print("In method", self._testMethodName)
+        response_decoded = self.response.data.decode('utf-8')
+        self.assertIn('<title>Atualizar Tarefa</title>', response_decoded)
+
+    def test_route_update_by_id(self):
+        """
+        Method to test if the /update-by-id endpoint updates an
+        existing register in the database.
+        """
+        print("In method", self._testMethodName)
+        description = 'TesteUpdate'
+        status = False
+        self.app_test.post('/insert', data=dict(description=description,
+                                                status=status))
+        task = self.db.find_one({"description": description})
+
+        description = 'TesteUpdateUpdated'
+        self.app_test.put('/update-by-id/' + str(task.get('_id')),
+                          data=dict(description=description))
+        task = self.db.find_one({"description": description})
+
+        self.assertEqual(description, task.get('description'))
+
+    def test_route_update_by_id_with_existing_description(self):
+        """
+        Method to test if the /update-by-id endpoint refuses a
+        Description that belongs to another Task.
+        """
+        print("In method", self._testMethodName)
+        self.db.insert_one(1, 'TesteUpdateFirst', False)
+        self.db.insert_one(2, 'TesteUpdateSecond', False)
+        response = self.app_test.post('/update-by-id/2',
+                                      data=dict(
+                                          description='TesteUpdateFirst'))
+        task = self.db.find_one({"_id": 2})
+
+        self.assertIn('Já existe um registro de Tarefa',
+                      response.data.decode('utf-8'))
+        self.assertEqual('TesteUpdateSecond', task.get('description'))
+
+    def test_route_change_status_by_id(self):
+        """
+        Method to test if the /change-status-by-id endpoint changes the
+        status of an existing register in the database.
+        """
+        print("In method", self._testMethodName)
+        description = 'TesteUpdateStatus'
+        status = False
+        self.app_test.post('/insert', data=dict(description=description,
+                                                status=status))
+        task = self.db.find_one({"description": description})
+        self.app_test.put('/change-status-by-id/' + str(task.get('_id')))
+        task = self.db.find_one({"_id": task.get('_id')})
+
+        self.assertEqual(True, task.get('status'))
+
+
+class TestDelete(unittest.TestCase):
+    """
+    Class to allocate the test methods of delete page (/delete-by-id).
+    """
+    def setUp(self):
+        """
+        Method that will be executed before tests. Creates a test
+        instance and mock Database with register.
+        """
+        self.app_test = app.test_client()
+        self.db = TaskRepository(app)
+
+        self.mock_task_id = 1
+        self.mock_task_description = "MockData"
+        self.mock_task_status = False
+
+        self.db.insert_one(self.mock_task_id, self.mock_task_description,
+                           self.mock_task_status)
+
+    def tearDown(self):
+        """
+        Method to be executed when test finish. Drop the mock database.
+        """
+        self.db.drop_mongo_connection()
+
+    def test_route_delete_by_id(self):
+        """
+        Method to test if the /delete-by-id endpoint deletes an
+        existing register in the database.
+        """
+        print("In method", self._testMethodName)
+        task = self.db.find_one({"description": self.mock_task_description})
+
+        self.app_test.delete('/delete-by-id/' + str(task.get('_id')))
+        task = self.db.find_one({"description": self.mock_task_description})
+
+        self.assertEqual(None, task)
+
+
+class TestFragments(unittest.TestCase):
+    """
+    Class to allocate the test methods of the fragment mode, in which
+    the changes return the row of the Task instead of a redirect.
+    """
+    def setUp(self):
+        """
+        Method that will be executed before tests. Creates a test
+        instance and mock Database with register.
+        """
+        self.app_test = app.test_client()
+        self.db = TaskRepository(app)
+        self.db.insert_one(1, 'TesteFragment', False)
+
+    def tearDown(self):
+        """
+        Method to be executed when test finish. Drop the mock database.
+        """
+        self.db.drop_mongo_connection()
+
+    def test_change_status_returns_row(self):
+        """
+        Method to test if the change of status returns only the changed
+        row, rendered by the macro of the list page.
+        """
+        print("In method", self._testMethodName)
+        response = self.app_test.put('/change-status-by-id/1?fragment=1')
+        row = response.data.decode('utf-8')
+
+        self.assertEqual(200, response.status_code)
+        self.assertTrue(row.startswith('<tr id="task-1">'))
+        self.assertTrue(row.endswith('</tr>'))
+        self.assertIn('TesteFragment', row)
+        self.assertIn('checked', row)
+        self.assertEqual(True, self.db.find_one({"_id": 1}).get('status'))
+        page = self.app_test.get('/find-all').data.decode('utf-8')
+        self.assertIn(row, page)
+
+    def test_change_status_of_missing_task_returns_404(self):
+        """
+        Method to test if the change of status of a Task that does not
+        exist returns 404 in fragment mode.
+        """
+        print("In method", self._testMethodName)
+        response = self.app_test.put('/change-status-by-id/99?fragment=1')
+        self.assertEqual(404, response.status_code)
+
+    def test_insert_and_update_return_row(self):
+        """
+        Method to test if the insert (201 when created) and the update
+        return the row of the Task, and the errors return the form.
+        """
+        print("In method", self._testMethodName)
+        response = self.app_test.post('/insert', data=dict(
+            description='TesteFragmentNew', fragment=1))
+        self.assertEqual(201, response.status_code)
+        self.assertIn('TesteFragmentNew', response.data.decode('utf-8'))
+        response = self.app_test.post('/insert', data=dict(
+            description='TesteFragmentNew', status='on', fragment=1))
+        self.assertEqual(200, response.status_code)
+        self.assertIn('checked', response.data.decode('utf-8'))
+
+        response = self.app_test.put('/update-by-id/1?fragment=1', data=dict(
+            description='TesteFragmentUpdated'))
+        self.assertEqual(200, response.status_code)
+        self.assertIn('TesteFragmentUpdated', response.data.decode('utf-8'))
+        response = self.app_test.put('/update-by-id/1?fragment=1', data=dict(
+            description='TesteFragmentNew'))
+        self.assertEqual(409, response.status_code)
+        response = self.app_test.post('/insert?fragment=1', data=dict(
+            description=''))
+        self.assertEqual(400, response.status_code)
+
+    def test_fragment_is_parsed_as_flag(self):
+        """
+        Method to test if the fragment parameter is read as the boolean
+        settings, so fragment=0 or false redirects to the list page.
+        """
+        print("In method", self._testMethodName)
+        for value in ('0', 'false', 'off', ''):
+            response = self.app_test.put('/change-status-by-id/1?fragment='
+                                         + value)
+            self.assertEqual(302, response.status_code)
+        for value in ('1', 'true', 'On', 'yes'):
+            response = self.app_test.put('/change-status-by-id/1?fragment='
+                                         + value)
+            self.assertEqual(200, response.status_code)
+
+    def test_rows_are_rendered_from_the_write(self):
+        """
+        Method to test if the rows returned in fragment mode are built
+        from the document returned by the write, with a single
+        operation of the store and no read of the Task.
+        """
+        print("In method", self._testMethodName)
+        app.config['TASK_ID_BLOCK_SIZE'] = 10
+        store = self.db.get_store()
+        calls = []
+
+        def counted(name):
+            method = getattr(store, name)
+            return lambda *args, **kwargs: calls.append(name) \
+                or method(*args, **kwargs)
+        names = [name for name in dir(TaskStore) if not name.startswith('_')]
+        responses = []
+        task_db._discard_id_block()
+        try:
+            self.app_test.post('/insert', data=dict(description='Block'))
+            for name in names:
+                setattr(store, name, counted(name))
+            responses.append(self.app_test.post('/insert', data=dict(
+                description='TesteFragment', status='on', fragment=1)))
+            responses.append(self.app_test.put(
+                '/change-status-by-id/1?fragment=1'))
+            responses.append(self.app_test.put(
+                '/update-by-id/1?fragment=1',
+                data=dict(description='TesteFragmentRow')))
+        finally:
+            for name in names:
+                delattr(store, name)
+            app.config['TASK_ID_BLOCK_SIZE'] = 1
+            task_db._discard_id_block()
+        self.assertEqual(['upsert_status', 'toggle', 'update'], calls)
+        self.assertEqual([200, 200, 200],
+                         [response.status_code for response in responses])
+        rows = [response.data.decode('utf-8') for response in responses]
+        self.assertIn('checked', rows[0])
+        self.assertNotIn('checked', rows[1])
+        self.assertIn('TesteFragment<', rows[1])
+        self.assertIn('TesteFragmentRow', rows[2])
+
+    def test_delete_returns_204(self):
+        """
+        Method to test if the delete returns 204, without content, in
+        fragment mode.
+        """
+        print("In method", self._testMethodName)
+        response = self.app_test.delete('/delete-by-id/1?fragment=1')
+
+        self.assertEqual(204, response.status_code)
+        self.assertEqual(b'', response.data)
+        self.assertIsNone(self.db.find_one({"_id": 1}))
+
+
+class TestApi(unittest.TestCase):
+    """
+    Class to allocate the test methods of the JSON API (/api/v1/tasks).
+    """
+    def setUp(self):
+        """
+        Method that will be executed before tests. Creates a test
+        instance and mock Database with register.
+        """
+        self.app_test = app.test_client()
+        self.db = TaskRepository(app)
+        self.db.insert_one(1, "MockData", False)
+
+    def tearDown(self):
+        """
+        Method to be executed when test finish. Drop the mock database.
+        """
+        self.db.drop_mongo_connection()
+
+    def test_get_tasks_returns_json(self):
+        """
+        Method to test if the /api/v1/tasks endpoint returns the Tasks
+        in JSON.
+        """
+        print("In method", self._testMethodName)
+        response = self.app_test.get('/api/v1/tasks')
+        self.assertEqual(200, response.status_code)
+        self.assertEqual([{"id": 1, "description": "MockData",
+                           "status": False}],
+                         response.get_json().get('tasks'))
+
+    def test_post_task_creates_task(self):
+        """
+        Method to test if the /api/v1/tasks endpoint creates a Task, and
+        refuses a duplicated Description.
+        """
+        print("In method", self._testMethodName)
+        response = self.app_test.post('/api/v1/tasks',
+                                      json={"description": "TesteApi"})
+        self.assertEqual(201, response.status_code)
+        task_id = response.get_json().get('task').get('id')
+        self.assertEqual("TesteApi",
+                         self.db.find_one({"_id": task_id})
+                         .get('description'))
+
+        response = self.app_test.post('/api/v1/tasks',
+                                      json={"description": "TesteApi"})
+        self.assertEqual(409, response.status_code)
+
+    def test_put_and_delete_task(self):
+        """
+        Method to test if the /api/v1/tasks/<id> endpoint updates and
+        deletes a Task.
+        """
+        print("In method", self._testMethodName)
+        response = self.app_test.put('/api/v1/tasks/1',
+                                     json={"status": True})
+        self.assertEqual(204, response.status_code)
+        self.assertEqual(True, self.db.find_one({"_id": 1}).get('status'))
+
+        response = self.app_test.delete('/api/v1/tasks/1')
+        self.assertEqual(204, response.status_code)
+        response = self.app_test.get('/api/v1/tasks/1')
+        self.assertEqual(404, response.status_code)
+
+    def test_bulk_insert_returns_result_by_item(self):
+        """
+        Method to test if the bulk insert creates the valid Tasks, and
+        returns the error of the invalid and duplicated ones.
+        """
+        print("In method", self._testMethodName)
+        response = self.app_test.post('/api/v1/tasks/bulk', json=[
+            {"description": "TesteBulk1"},
+            {"description": ""},
+            {"description": "MockData"},
+            {"description": "TesteBulk2", "status": True}])
+        results = response.get_json().get('results')
+
+        self.assertEqual([201, 400, 409, 201],
+                         [result.get('status') for result in results])
+        task = self.db.find_one({"_id": results[3].get('id')})
+        self.assertEqual("TesteBulk2", task.get('description'))
+
+    def test_bulk_update_and_delete(self):
+        """
+        Method to test if the bulk update and delete change the Tasks.
+        """
+        print("In method", self._testMethodName)
+        self.db.insert_one(2, "MockData2", False)
+        response = self.app_test.patch('/api/v1/tasks/bulk', json=[
+            {"id": 1, "status": True},
+            {"id": 2, "description": "MockData"}])
+        results = response.get_json().get('results')
+        self.assertEqual([200, 409],
+                         [result.get('status') for result in results])
+        self.assertEqual(True, self.db.find_one({"_id": 1}).get('status'))
+
+        response = self.app_test.delete('/api/v1/tasks/bulk',
+                                        json=[1, 2, "x"])
+        results = response.get_json().get('results')
+        self.assertEqual([204, 204, 400],
+                         [result.get('status') for result in results])
+        self.assertEqual([], list(self.db.find({}, {"_id": True})))
+
+    def test_bulk_update_and_delete_missing_tasks(self):
+        """
+        Method to test if the bulk update and delete return 404 for the
+        Tasks that do not exist, as the single item routes.
+        """
+        print("In method", self._testMethodName)
+        response = self.app_test.patch('/api/v1/tasks/bulk', json=[
+            {"id": 999, "status": True}, {"id": 1, "status": True}])
+        results = response.get_json().get('results')
+        self.assertEqual([404, 200],
+                         [result.get('status') for result in results])
+
+        response = self.app_test.patch('/api/v1/tasks/bulk', json=[
+            {"id": 1, "description": "Renamed"},
+            {"id": 998, "description": "Missing"},
+            {"id": 1, "status": False}])
+        results = response.get_json().get('results')
+        self.assertEqual([200, 404, 400],
+                         [result.get('status') for result in results])
+        self.assertEqual({"_id": 1, "description": "Renamed",
+                          "status": True}, self.db.find_one({"_id": 1}))
+
+        response = self.app_test.delete('/api/v1/tasks/bulk',
+                                        json=[999, 1, 1])
+        results = response.get_json().get('results')
+        self.assertEqual([404, 204, 400],
+                         [result.get('status') for result in results])
+        self.assertIsNone(self.db.find_one({"_id": 1}))
+        self.assertEqual(self.db.reconcile_stats(wait=0), self.db.stats())
+
+
+class TestAsgi(unittest.TestCase):
+    """
+    Class to allocate the test methods of the asynchronous JSON API,
+    served by the ASGI application.
+    """
+    def setUp(self):
+        """
+        Method that will be executed before tests. Creates a mock
+        Database with register.
+        """
+        self.db = TaskRepository(app)
+        self.db.insert_one(1, "MockData", False)
+
+    def tearDown(self):
+        """
+        Method to be executed when test finish. Drop the mock database.
+        """
+        self.db.drop_mongo_connection()
+
+    @staticmethod
+    def request(method, path, body=None, query_string=b''):
+        """
+        Method to send a request to the ASGI application.
+
+        :return: HTTP status code, and the JSON received.
+        :rtype: tuple(int, object)
+        """
+        messages = []
+        body = b'' if body is None else json.dumps(body).encode()
+
+        async def receive():
+            return {"type": 'http.request', "body": body}
+
+        async def send(message):
+            messages.append(message)
+
+        scope = {"type": 'http', "method": method, "path": path,
+                 "query_string": query_string, "headers": []}
+        asyncio.run(application(scope, receive, send))
+        content = messages[1].get('body')
+        return messages[0].get('status'), \
+            json.loads(content) if content else None
+
+    def test_lifespan_starts_and_stops_the_worker(self):
+        """
+        Method to test if the lifespan events of the ASGI server start
+        the background jobs of the worker, and stop them and write the
+        counters kept in memory on shutdown.
+        """
+        print("In method", self._testMethodName)
+        self.assertIs(initialize_worker, application.startup)
+        self.assertIs(stop_worker, application.shutdown)
+        events = queue.Queue()
+        messages = []
+        stopped = []
+
+        async def receive():
+            return events.get()
+
+        async def send(message):
+            messages.append(message.get('type'))
+
+        def shutdown(timers):
+            stopped.extend(timers)
+            stop_worker(timers)
+
+        events.put({"type": 'lifespan.startup'})
+        events.put({"type": 'lifespan.shutdown'})
+        task_db.insert_one(2, "Lifespan", False)
+        asyncio.run(AsgiApplication(None, startup=initialize_worker,
+                                    shutdown=shutdown).lifespan(receive,
+                                                                send))
+        self.assertEqual(['lifespan.startup.complete',
+                          'lifespan.shutdown.complete'], messages)
+        self.assertIn('flush-counters',
+                      [timer._thread.name for timer in stopped])
+        for timer in stopped:
+            timer._thread.join(5)
+            self.assertFalse(timer._thread.is_alive())
+        self.assertFalse(task_db.counter_buffer)
+
+    def test_lifespan_reports_failed_startup(self):
+        """
+        Method to test if a failure of the startup function is reported
+        to the ASGI server.
+        """
+        print("In method", self._testMethodName)
+        messages = []
+
+        def startup():
+            raise RuntimeError('unavailable')
+
+        async def receive():
+            return {"type": 'lifespan.startup'}
+
+        async def send(message):
+            messages.append(message)
+
+        asyncio.run(AsgiApplication(None, startup=startup).lifespan(
+            receive, send))
+        self.assertEqual([{"type": 'lifespan.startup.failed',
+                           "message": 'unavailable'}], messages)
+
+    def test_async_get_tasks_returns_json(self):
+        """
+        Method to test if the asynchronous /api/v1/tasks endpoint
+        returns the Tasks.
+        """
+        print("In method", self._testMethodName)
+        status, content = self.request('GET', '/api/v1/tasks')
+        self.assertEqual(200, status)
+        self.assertEqual([{"id": 1, "description": "MockData",
+                           "status": False}], content.get('tasks'))
+
+    def test_async_post_task_creates_task(self):
+        """
+        Method to test if the asynchronous /api/v1/tasks endpoint
+        creates a Task with the next Identifier, and refuses a
+        duplicated Description.
+        """
+        print("In method", self._testMethodName)
+        status, content = self.request('POST', '/api/v1/tasks',
+                                       {"description": "TesteAsync"})
+        self.assertEqual(201, status)
+        self.assertEqual(2, content.get('task').get('id'))
+        self.assertEqual("TesteAsync",
+                         self.db.find_one({"_id": 2}).get('description'))
+
+        status, _ = self.request('POST', '/api/v1/tasks',
+                                 {"description": "TesteAsync"})
+        self.assertEqual(409, status)
+
+    def test_async_update_and_delete_task(self):
+        """
+        Method to test if the asynchronous /api/v1/tasks/<id> endpoint
+        updates and deletes a Task.
+        """
+        print("In method", self._testMethodName)
+        status, _ = self.request('PATCH', '/api/v1/tasks/1',
+                                 {"status": True})
+        self.assertEqual(204, status)
+        self.assertEqual(True, self.db.find_one({"_id": 1}).get('status'))
+
+        status, _ = self.request('DELETE', '/api/v1/tasks/1')
+        self.assertEqual(204, status)
+        status, _ = self.request('GET', '/api/v1/tasks/1')
+        self.assertEqual(404, status)
+
+    def test_async_get_tasks_with_invalid_cursor_returns_400(self):
+        """
+        Method to test if the asynchronous /api/v1/tasks endpoint
+        refuses an invalid cursor token.
+        """
+        print("In method", self._testMethodName)
+        status, _ = self.request('GET', '/api/v1/tasks',
+                                 query_string=b'after=invalid')
+        self.assertEqual(400, status)
+
+    def test_async_get_tasks_with_filters(self):
+        """
+        Method to test if the asynchronous /api/v1/tasks endpoint
+        filters, sorts and pages the Tasks as the Flask endpoint, and
+        refuses the same invalid values.
+        """
+        print("In method", self._testMethodName)
+        self.db.insert_one(2, "Other", True)
+        self.db.insert_one(3, "MockData3", False)
+        self.db.insert_one(4, "MockData2", False)
+        query_string = b'status=false&description=Mock&sort=description' \
+                       b'&order=desc&limit=2'
+        status, payload = self.request('GET', '/api/v1/tasks',
+                                       query_string=query_string)
+        self.assertEqual(200, status)
+        self.assertEqual([3, 4], [task.get('id')
+                                  for task in payload.get('tasks')])
+        expected = app.test_client().get('/api/v1/tasks?'
+                                         + query_string.decode())
+        self.assertEqual(expected.get_json(), payload)
+
+        status, payload = self.request(
+            'GET', '/api/v1/tasks',
+            query_string=query_string + b'&after='
+            + payload.get('next').encode())
+        self.assertEqual([1], [task.get('id')
+                               for task in payload.get('tasks')])
+
+        for query_string in (b'status=bogus', b'sort=bogus',
+                             b'order=bogus'):
+            status, _ = self.request('GET', '/api/v1/tasks',
+                                     query_string=query_string)
+            self.assertEqual(400, status)
+
+    def test_async_writes_share_cache_and_status_buffer(self):
+        """
+        Method to test if the asynchronous writes invalidate the cache
+        of the synchronous repository, and if the asynchronous
+        repository reads and flushes its write-behind buffer.
+        """
+        print("In method", self._testMethodName)
+        app.config.update(TASK_CACHE_SIZE=2, TASK_WRITE_BEHIND=True)
+        try:
+            db = TaskRepository(app)
+            async_db = AsyncTaskRepository(app, db)
+            db.find_one({"_id": 1})
+            asyncio.run(async_db.update_one({"_id": 1},
+                                            {"description": "Changed"}))
+            self.assertEqual("Changed",
+                             db.find_one({"_id": 1}).get('description'))
+
+            db.toggle_status(1)
+            task = asyncio.run(async_db.find_one({"_id": 1}))
+            self.assertEqual(True, task.get('status'))
+            tasks, _ = asyncio.run(async_db.find_page(10))
+            self.assertEqual([True], [task.get('status') for task in tasks])
+            self.assertTrue(asyncio.run(async_db.toggle_status(1)) is False)
+
+            db.toggle_status(1)
+            asyncio.run(async_db.delete_one({"_id": 1}))
+            self.assertEqual(0, len(db.status_buffer))
+            self.assertIsNone(db.find_one({"_id": 1}))
+        finally:
+            app.config.update(TASK_CACHE_SIZE=0, TASK_WRITE_BEHIND=False)
+            connections.get_status_buffer().drain()
+
+    def test_async_id_block_is_not_shared_after_fork(self):
+        """
+        Method to test if the Identifiers reserved by a parent process
+        are discarded by the asynchronous repository in the child.
+        """
+        print("In method", self._testMethodName)
+        app.config['TASK_ID_BLOCK_SIZE'] = 10
+        try:
+            async_db = AsyncTaskRepository(app, self.db)
+            self.assertEqual(2, asyncio.run(async_db.next_id()))
+            self.assertEqual(3, asyncio.run(async_db.next_id()))
+            # Simulates the fork, as a different process Identifier. In
+            # the process, the block is the one of TaskRepository.
+            async_db._id_block_pid = None
+            self.db._id_block_pid = None
+            self.assertEqual(12, asyncio.run(async_db.next_id()))
+        finally:
+            app.config['TASK_ID_BLOCK_SIZE'] = 1
+
+
+class TestRepository(unittest.TestCase):
+    def setUp(self):
+        """
+        Method that will be executed before tests. Creates a test
+        instance and mock Database with register.
+        """
+        self.app_test = app.test_client()
+        self.db = TaskRepository(app)
+
+        self.mock_task_id = 1
+        self.mock_task_description = "MockData"
+        self.mock_task_status = False
+
+        self.db.insert_one(self.mock_task_id, self.mock_task_description,
+                           self.mock_task_status)
+
+    def tearDown(self):
+        """
+        Method to be executed when test finish. Drop the mock database.
+        """
+        self.db.drop_mongo_connection()
+
+    def test_find_returns_2(self):
+        """
+        Method to test if find, returns the correct amount of objects.
+        """
+        print("In method", self._testMethodName)
+        self.db.insert_one(2, "TesteFind", True)
+        query = self.db.find({}, {})
+        tasks = []
+        for task in query:
+            tasks.append(task)
+        self.assertEqual(2, len(tasks))
+
+    def test_find_with_constraints_returns_object_2(self):
+        """
+        Method to test if find using description as constraint, returns
+        the correct object.
+        """
+        print("In method", self._testMethodName)
+        self.db.insert_one(2, "TestFindWithConstraints", True)
+        query = self.db.find({"description": "TestFindWithConstraints"}, {})
+        tasks = []
+        for task in query:
+            tasks.append(task)
+        self.assertEqual(2, tasks[0].get('_id'))
+
+    def test_find_with_fields_returns_all_fields(self):
+        """
+        Method to test if find passing the required fields, returns the
+        correct object.
+        """
+        print("In method", self._testMethodName)
+        query = self.db.find({}, {"_id": True, "description": True,
+                                  "status": True})
+        tasks = []
+        for task in query:
+            tasks.append(task)
+        self.assertEqual(self.mock_task_description,
+                         tasks[0].get('description'))
+
+    def test_find_with_constraints_and_fields_returns_all_object_2(self):
+        """
+        Method to test if find using description as constraint, and
+        passing the required fields, returns the correct object.
+        """
+        print("In method", self._testMethodName)
+        self.db.insert_one(2, "TestFindWithConstraintsAndFields", True)
+        query = \
+            self.db.find({"description": "TestFindWithConstraintsAndFields"},
+                         {"_id": True, "description": True,
+                          "status": True})
+        tasks = []
+        for task in query:
+            tasks.append(task)
+        self.assertEqual("TestFindWithConstraintsAndFields",
+                         tasks[0].get('description'))
+
+    def test_find_one_by_id_returns_correct_object(self):
+        """
+        Method to test if find_one using id as constraint, returns
+        the correct object.
+        """
+        print("In method", self._testMethodName)
+        task = self.db.find_one({"_id": self.mock_task_id})
+        self.assertEqual(self.mock_task_description, task.get('description'))
+
+    def test_find_one_by_description_returns_correct_object(self):
+        """
+        Method to test if find_one using description as constraint,
+        returns the correct object.
+        """
+        print("In method", self._testMethodName)
+        self.db.insert_one(2, "TestFindOneByDescription", True)
+        task = self.db.find_one({"description": "TestFindOneByDescription"})
+        self.assertEqual("TestFindOneByDescription", task.get('description'))
+
+    def test_insert_one(self):
+        """
+        Method to test if insert_one really insert the register in
+        database.
+        """
+        print("In method", self._testMethodName)
+        self.db.insert_one(2, "TesteInsert", True)
+        task = self.db.find_one({"_id": 2})
+        self.assertEqual("TesteInsert", task.get('description'))
+
+    def test_update_one_by_id(self):
+        """
+        Method to test if update_one really update the register in
+        database.
+        """
+        print("In method", self._testMethodName)
+        self.db.update_one({"_id": self.mock_task_id},
+                           {"description": "TesteUpdate"})
+        task = self.db.find_one({"_id": self.mock_task_id})
+        self.assertEqual("TesteUpdate", task.get('description'))
+
+    def test_update_one_by_nonexistent_id(self):
+        """
+        Method to test if update_one works with nonexistent id.
+        """
+        print("In method", self._testMethodName)
+        self.db.update_one({"_id": 15},
+                           {"description": "TesteUpdate"})
+        task = self.db.find_one({"_id": 15})
+        self.assertEqual(None, task)
+
+    def test_toggle_status_returns_new_status(self):
+        """
+        Method to test if toggle_status flips the status in the
+        database and returns the new value.
+        """
+        print("In method", self._testMethodName)
+        self.assertEqual(True, self.db.toggle_status(self.mock_task_id))
+        self.assertEqual(False, self.db.toggle_status(self.mock_task_id))
+        task = self.db.find_one({"_id": self.mock_task_id})
+        self.assertEqual(False, task.get('status'))
+
+    def test_toggle_status_by_nonexistent_id(self):
+        """
+        Method to test if toggle_status works with nonexistent id.
+        """
+        print("In method", self._testMethodName)
+        self.assertEqual(None, self.db.toggle_status(15))
+
+    def test_delete_one_by_id(self):
+        """
+        Method to test if delete_one really delete the register in
+        database.
+        """
+        print("In method", self._testMethodName)
+        self.db.delete_one({"_id": self.mock_task_id})
+        task = self.db.find_one({"_id": self.mock_task_id})
+        self.assertEqual(None, task)
+
+    def test_delete_one_by_nonexistent_id(self):
+        """
+        Method to test if delete_one works with nonexistent id.
+        """
+        print("In method", self._testMethodName)
+        self.db.delete_one({"_id": 15})
+        task = self.db.find_one({"_id": 15})
+        self.assertEqual(None, task)
+
+
+class TestIdAllocation(unittest.TestCase):
+    """
+    Class to allocate the test methods of the Identifier allocation.
+    """
+    def setUp(self):
+        """
+        Method that will be executed before tests. Creates a test
+        instance and mock Database with register.
+        """
+        self.db = TaskRepository(app)
+        self.db.insert_one(1, "MockData", False)
+
+    def tearDown(self):
+        """
+        Method to be executed when test finish. Drop the mock database
+        and restore the default block size.
+        """
+        app.config['TASK_ID_BLOCK_SIZE'] = 1
+        self.db.drop_mongo_connection()
+
+    def test_upsert_reserves_id_only_on_create(self):
+        """
+        Method to test if the updates of an existing Description do not
+        consume Identifiers.
+        """
+        print("In method", self._testMethodName)
+        task, previous = self.db.upsert_by_description("Upsert", False)
+        self.assertIsNone(previous)
+        self.assertEqual({"_id": 2, "description": "Upsert",
+                          "status": False}, task)
+        task, previous = self.db.upsert_by_description("Upsert", True)
+        self.assertEqual({"_id": 2, "status": False}, previous)
+        self.assertEqual({"_id": 2, "description": "Upsert",
+                          "status": True}, task)
+        self.db.upsert_by_description("MockData", True)
+        self.db.upsert_by_description("Upsert2", False)
+        self.assertEqual(3, self.db.find_one(
+            {"description": "Upsert2"}).get('_id'))
+
+    def test_upsert_hands_unused_id_back_to_block(self):
+        """
+        Method to test if the upsert of an existing Description hands
+        the Identifier taken from the block back to it.
+        """
+        print("In method", self._testMethodName)
+        app.config['TASK_ID_BLOCK_SIZE'] = 10
+        self.assertEqual({"_id": 1, "status": False},
+                         self.db.upsert_by_description("MockData", True)[1])
+        self.assertIsNone(self.db.upsert_by_description("Upsert", False)[1])
+        self.assertEqual(2, self.db.find_one(
+            {"description": "Upsert"}).get('_id'))
+        self.assertEqual(11, self.db.get_store().counter("task").get('seq'))
+
+    def test_next_id_continues_from_max_id(self):
+        """
+        Method to test if next_id starts after the max Identifier
+        stored, and never returns the same value twice.
+        """
+        print("In method", self._testMethodName)
+        self.assertEqual(2, self.db.next_id())
+        self.assertEqual(3, self.db.next_id())
+
+    def test_next_id_is_shared_between_repositories(self):
+        """
+        Method to test if two repositories (like two workers) receive
+        distinct Identifiers from the counter.
+        """
+        print("In method", self._testMethodName)
+        other_db = TaskRepository(app)
+        self.assertEqual(2, self.db.next_id())
+        self.assertEqual(3, other_db.next_id())
+        self.assertEqual(4, self.db.next_id())
+
+    def test_next_id_reserves_blocks(self):
+        """
+        Method to test if the hi/lo mode reserves a block of
+        Identifiers in the counter and hands them out from memory.
+        """
+        print("In method", self._testMethodName)
+        app.config['TASK_ID_BLOCK_SIZE'] = 10
+        other_db = TaskRepository(app)
+        self.assertEqual(2, self.db.next_id())
+        self.assertEqual(3, self.db.next_id())
+        self.assertEqual(12, other_db.next_id())
+        counter = self.db.get_store().counter("task")
+        self.assertEqual(21, counter.get('seq'))
+
+
+class TestTaskCache(unittest.TestCase):
+    """
+    Class to allocate the test methods of the cache of Tasks.
+    """
+    def setUp(self):
+        """
+        Method that will be executed before tests. Enables the cache,
+        creates a repository using it, and mock Database with register.
+        """
+        self.now = 0
+        app.config['TASK_CACHE_SIZE'] = 2
+        self.db = TaskRepository(app)
+        self.db.insert_one(1, "MockData", False)
+
+    def tearDown(self):
+        """
+        Method to be executed when test finish. Drop the mock database
+        and disable the cache.
+        """
+        app.config['TASK_CACHE_SIZE'] = 0
+        self.db.drop_mongo_connection()
+
+    def test_cache_evicts_least_recently_used(self):
+        """
+        Method to test if the cache evicts the least recently used
+        entry when it is full.
+        """
+        print("In method", self._testMethodName)
+        cache = TaskCache(2, 0)
+        cache.set(1, {"_id": 1})
+        cache.set(2, {"_id": 2})
+        cache.get(1)
+        cache.set(3, {"_id": 3})
+        self.assertEqual(None, cache.get(2))
+        self.assertEqual({"_id": 1}, cache.get(1))
+        self.assertEqual({"hits": 2, "misses": 1, "size": 2,
+                          "max_size": 2, "ttl": 0}, cache.stats())
+
+    def test_cache_expires_entries(self):
+        """
+        Method to test if the entries expire after the time to live.
+        """
+        print("In method", self._testMethodName)
+        cache = TaskCache(2, 10, clock=lambda: self.now)
+        cache.set(1, {"_id": 1})
+        self.now = 9
+        self.assertEqual({"_id": 1}, cache.get(1))
+        self.now = 10
+        self.assertEqual(None, cache.get(1))
+
+    def test_cache_ignores_value_read_before_invalidation(self):
+        """
+        Method to test if a Task read before a write is not stored.
+        """
+        print("In method", self._testMethodName)
+        cache = TaskCache(2, 0)
+        generation = cache.generation
+        cache.invalidate(1)
+        cache.set(1, {"_id": 1}, generation=generation)
+        self.assertEqual(None, cache.get(1))
+
+    def test_find_one_reads_through_cache(self):
+        """
+        Method to test if find_one by Identifier is served by the cache
+        after the first query.
+        """
+        print("In method", self._testMethodName)
+        self.db.find_one({"_id": 1})
+        task = self.db.find_one({"_id": 1})
+        self.assertEqual("MockData", task.get('description'))
+        self.assertEqual(1, self.db.cache.stats().get('hits'))
+        self.assertEqual(1, self.db.cache.stats().get('misses'))
+
+    def test_writes_invalidate_cache(self):
+        """
+        Method to test if update_one, toggle_status and delete_one
+        remove the Task from the cache.
+        """
+        print("In method", self._testMethodName)
+        self.db.find_one({"_id": 1})
+        self.db.update_one({"_id": 1}, {"description": "TesteCache"})
+        self.assertEqual("TesteCache",
+                         self.db.find_one({"_id": 1}).get('description'))
+        self.db.toggle_status(1)
+        self.assertEqual(True, self.db.find_one({"_id": 1}).get('status'))
+        self.db.delete_one({"_id": 1})
+        self.assertEqual(None, self.db.find_one({"_id": 1}))
+
+
+class TestMemoryBackend(unittest.TestCase):
+    """
+    Class to allocate the test methods of the in-memory storage of the
+    Tasks.
+    """
+    def setUp(self):
+        """
+        Method that will be executed before tests. Creates an in-memory
+        store with three registers.
+        """
+        self.store = MemoryTaskStore()
+        self.assertEqual({}, self.store.insert_many([
+            {"_id": 1, "description": "Buy milk", "status": False},
+            {"_id": 2, "description": "Clean", "status": True},
+            {"_id": 3, "description": "Buy bread", "status": False}]))
+
+    def find_ids(self, filters, sort_key='_id', direction=1, after=None,
+                 limit=0):
+        return [task.id for task in self.store.find_tasks(
+            filters, sort_key, direction, after, limit)]
+
+    def test_queries_follow_sort_and_keyset(self):
+        """
+        Method to test the filters, the sort keys and the edges of the
+        pages, in both directions.
+        """
+        print("In method", self._testMethodName)
+        self.assertEqual([1, 3], self.find_ids({"status": False}))
+        self.assertEqual([3, 1], self.find_ids({"prefix": 'Buy'},
+                                               'description'))
+        self.assertEqual([3, 1], self.find_ids({"prefix": 'Buy'}, '_id', -1))
+        self.assertEqual([2, 1], self.find_ids({}, '_id', -1, after=3))
+        self.assertEqual([3, 2], self.find_ids({}, 'status', 1,
+                                               after=(False, 1)))
+        self.assertEqual([3, 1], self.find_ids({}, 'status', -1,
+                                               after=(True, 2)))
+        self.assertEqual([2], self.find_ids({}, 'description', 1,
+                                            after=("Buy milk", 1)))
+        self.assertEqual([1, 2], self.find_ids({}, limit=2))
+        self.assertEqual([3], self.find_ids({"_id": [3, 9],
+                                             "status": False}))
+        self.assertEqual({"_id": 2, "description": "Clean"},
+                         self.store.find_one('_id', 2,
+                                             {"description": True}))
+        self.assertEqual(1, self.store.find_one('description',
+                                                "Buy milk").get('_id'))
+        self.assertIsInstance(next(self.store.find_tasks({})), Task)
+
+    def test_text_search_follows_writes(self):
+        """
+        Method to test if the search uses the text index, kept up to
+        date by the writes, with the text score.
+        """
+        print("In method", self._testMethodName)
+        tasks = self.store.search("buy MILK", 0, 10)
+        self.assertEqual([1, 3], [task.get('_id') for task in tasks])
+        self.assertEqual([1.5, 0.75], [task.get('score') for task in tasks])
+        self.assertEqual("Buy milk", tasks[0].get('description'))
+
+        self.store.update(1, {"description": "Pay"})
+        self.store.insert({"_id": 4, "description": "Milk",
+                           "status": False})
+        self.store.delete(3)
+        self.assertEqual([4], [task.get('_id') for task
+                               in self.store.search("buy milk", 0, 10)])
+
+    def test_unique_descriptions_are_enforced(self):
+        """
+        Method to test if inserts and updates of an existing Description
+        are rejected, reporting each failed insert.
+        """
+        print("In method", self._testMethodName)
+        with self.assertRaises(DuplicateKeyError):
+            self.store.insert({"_id": 4, "description": "Clean"})
+        with self.assertRaises(DuplicateKeyError):
+            self.store.update(1, {"description": "Clean"})
+        write_errors = self.store.insert_many(
+            [{"_id": 4, "description": "New", "status": False},
+             {"_id": 5, "description": "Clean", "status": False},
+             {"_id": 1, "description": "Other", "status": False}])
+        self.assertEqual([1, 2], sorted(write_errors))
+        self.assertEqual(11000, write_errors[1].get('code'))
+        self.assertEqual((4, 1), self.store.count())
+        self.assertEqual([], self.store.duplicates())
+        self.assertEqual("Buy milk", self.store.find_one(
+            '_id', 1).get('description'))
+
+    def test_writes_and_counters(self):
+        """
+        Method to test the updates, the toggles, the deletes and the
+        counters used by the repository.
+        """
+        print("In method", self._testMethodName)
+        self.assertEqual({"_id": 3, "status": False},
+                         self.store.update_status_by_description(
+                             "Buy bread", True))
+        self.assertIsNone(self.store.update_status_by_description("New",
+                                                                  True))
+        self.assertEqual({"_id": 3, "description": "Buy bread",
+                          "status": False}, self.store.toggle(3))
+        self.assertIsNone(self.store.toggle(9))
+        self.assertEqual(([1, 2], [], 0), self.store.toggle_many([1, 2, 9]))
+        errors, matched = self.store.update_many(
+            [(1, {"description": "Clean"}), (9, {"status": True})])
+        self.assertEqual(([0], 0), (list(errors), matched))
+        self.assertEqual({"_id": 1, "status": True}, self.store.delete(1))
+        self.assertEqual(1, self.store.delete_many([1, 2]))
+        self.assertEqual((1, 0), self.store.count())
+
+        self.assertEqual(5, self.store.reserve_ids(2))
+        self.store.increment("stats", {"total": 1})
+        self.assertIsNone(self.store.counter("stats"))
+        self.store.increment("stats", {"total": 1}, on_insert={"epoch": 1})
+        self.store.set_counter("stats", {"finished": 0})
+        self.assertEqual({"_id": "stats", "epoch": 1, "total": 1,
+                          "finished": 0}, self.store.counter("stats"))
+        self.assertTrue(self.store.acquire_lease("lease", 10, 20))
+        self.assertFalse(self.store.acquire_lease("lease", 15, 25))
+        self.assertTrue(self.store.acquire_lease("lease", 21, 30))
+
+    def test_snapshot_keeps_tasks_and_counters(self):
+        """
+        Method to test if a snapshot file restores the Tasks, their
+        indexes and the counters.
+        """
+        print("In method", self._testMethodName)
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'tasks.bson')
+            self.store.reserve_ids(1)
+            self.assertEqual(4, self.store.save(path))
+            store = MemoryTaskStore(path)
+        self.assertEqual(list(self.store.find({})), list(store.find({})))
+        self.assertEqual(4, store.counter("task").get('seq'))
+        with self.assertRaises(DuplicateKeyError):
+            store.insert({"_id": 7, "description": "Clean"})
+
+    def test_repository_over_memory_backend(self):
+        """
+        Method to test the repository with TASK_BACKEND=memory.
+        """
+        print("In method", self._testMethodName)
+        backend = app.config['TASK_BACKEND']
+        app.config['TASK_BACKEND'] = 'memory'
+        connections.reset()
+        db = TaskRepository(app)
+        try:
+            self.assertIsInstance(db.get_store(), MemoryTaskStore)
+            db.insert_many([{"description": "Memory one", "status": False},
+                            {"description": "Memory two", "status": True}])
+            db.toggle_status(1)
+            tasks, _, has_next = db.find_page(1, after=1)
+            self.assertEqual([Task(2, "Memory two", True)], tasks)
+            self.assertFalse(has_next)
+            self.assertEqual({"total": 2, "finished": 2, "pending": 0},
+                             db.stats())
+            self.assertEqual(1, len(db.search("one", 10)[0]))
+        finally:
+            db.drop_mongo_connection()
+            app.config['TASK_BACKEND'] = backend
+            connections.reset()
+
+    def test_unknown_backend_is_rejected(self):
+        """
+        Method to test if an unknown TASK_BACKEND is rejected.
+        """
+        print("In method", self._testMethodName)
+        backend = app.config['TASK_BACKEND']
+        app.config['TASK_BACKEND'] = 'other'
+        try:
+            with self.assertRaises(ValueError):
+                ConnectionManager().get_connection(app)
+        finally:
+            app.config['TASK_BACKEND'] = backend
+
+
+class TestBenchmarks(unittest.TestCase):
+    """
+    Class to allocate the test methods of the benchmark harness.
+    """
+    def test_run_benchmarks_covers_every_route(self):
+        """
+        Method to test if the benchmark measures every route of the
+        application, and restores the configuration.
+        """
+        print("In method", self._testMethodName)
+        backend = app.config['TASK_BACKEND']
+        benchmark = benchmarks.run_benchmarks(tasks=30, iterations=2)
+        self.assertTrue(app.config['TESTING'])
+        self.assertEqual(backend, app.config['TASK_BACKEND'])
+
+        routes = {re.sub(r'<[^>]*>', '<id>', rule.rule)
+                  for rule in app.url_map.iter_rules()
+                  if rule.endpoint not in ('static', 'find_slow_queries')}
+        measured = {name.split(' ')[1].split('?')[0]
+                    for name in benchmark.get('results') if ' ' in name}
+        self.assertEqual(set(), routes - measured - {'/'})
+        result = benchmark.get('results').get('TaskRepository.find_page')
+        self.assertEqual(2, result.get('count'))
+        self.assertLessEqual(result.get('p50_ms'), result.get('p99_ms'))
+
+    def test_compare_detects_regressions(self):
+        """
+        Method to test if the comparison with a baseline reports the
+        cases slower than the threshold, ignoring tiny changes.
+        """
+        print("In method", self._testMethodName)
+        self.assertEqual(2, benchmarks.percentile([1, 2, 3, 4], 0.5))
+        self.assertEqual(4, benchmarks.percentile([1, 2, 3, 4], 0.99))
+        baseline = {"results": {
+            "slow": {"p50_ms": 1.0, "mean_ms": 1.0, "throughput": 1000},
+            "tiny": {"p50_ms": 0.01, "mean_ms": 0.01, "throughput": 1e5}}}
+        current = {"results": {
+            "slow": {"p50_ms": 1.5, "mean_ms": 1.5, "throughput": 660},
+            "tiny": {"p50_ms": 0.02, "mean_ms": 0.02, "throughput": 5e4},
+            "new": {"p50_ms": 9.0, "mean_ms": 9.0, "throughput": 1}}}
+        regressions = benchmarks.compare(current, baseline, threshold=0.2)
+        self.assertEqual([('slow', 'p50_ms'), ('slow', 'throughput')],
+                         [regression[:2] for regression in regressions])
+        self.assertEqual([], benchmarks.compare(current, baseline, 0.6))
+
+
+class TestConnectionManager(unittest.TestCase):
+    """
+    Class to allocate the test methods of the MongoDB connection
+    management.
+    """
+    def test_get_connection_reuses_connection(self):
+        """
+        Method to test if the connection is created once by process.
+        """
+        print("In method", self._testMethodName)
+        manager = ConnectionManager()
+        self.assertIs(manager.get_connection(app),
+                      manager.get_connection(app))
+
+    def test_get_connection_after_fork_creates_connection(self):
+        """
+        Method to test if a process with other pid (child of a fork)
+        does not reuse the connection of its parent.
+        """
+        print("In method", self._testMethodName)
+        manager = ConnectionManager()
+        connection = manager.get_connection(app)
+        manager._pid = -1
+        self.assertIsNone(manager.current())
+        self.assertIsNot(connection, manager.get_connection(app))
+
+    def test_client_options_from_config(self):
+        """
+        Method to test if the pool options are read from the
+        configuration, ignoring the ones not configured.
+        """
+        print("In method", self._testMethodName)
+        app.config['MONGO_WAIT_QUEUE_TIMEOUT_MS'] = 500
+        try:
+            options = ConnectionManager.client_options(app)
+        finally:
+            app.config['MONGO_WAIT_QUEUE_TIMEOUT_MS'] = None
+        self.assertEqual(500, options.get('waitQueueTimeoutMS'))
+        self.assertEqual(app.config['MONGO_MAX_POOL_SIZE'],
+                         options.get('maxPoolSize'))
+        self.assertNotIn('socketTimeoutMS', options)
+
+    def test_warm_up_creates_indexes(self):
+        """
+        Method to test if warm_up connects and creates the indexes.
+        """
+        print("In method", self._testMethodName)
+        db = TaskRepository(app)
+        db.drop_mongo_connection()
+        self.assertTrue(db.warm_up())
+        self.assertTrue(connections.indexes_ready)
+        store = db.get_store()
+        if isinstance(store, MongoTaskStore):
+            indexes = store.db.task.index_information()
+            self.assertIn('description_1', indexes)
+            self.assertIn('status_1__id_1', indexes)
+
+    def test_pipeline_updates_are_probed_by_server_version(self):
+        """
+        Method to test if the support of update pipelines is probed
+        once, by the version of the server, when it is pinged: MongoDB
+        4.2 or newer supports them, and mongomock does not.
+        """
+        print("In method", self._testMethodName)
+        self.assertTrue(supports_pipeline_updates(
+            {"versionArray": [4, 2, 0, 0]}))
+        self.assertTrue(supports_pipeline_updates(
+            {"versionArray": [5, 0, 3, 0]}))
+        self.assertFalse(supports_pipeline_updates(
+            {"versionArray": [4, 0, 9, 0]}))
+        self.assertFalse(supports_pipeline_updates({}))
+
+        db = TaskRepository(app)
+        db.drop_mongo_connection()
+        store = db.get_store()
+        if not isinstance(store, MongoTaskStore):
+            self.skipTest('The memory engine has no update pipelines.')
+        self.assertIsNone(store._pipeline_updates)
+        self.assertTrue(db.warm_up())
+        self.assertFalse(store._pipeline_updates)
+        db.insert_one(1, "Probed", False)
+        self.assertTrue(db.toggle_status(1))
+        self.assertEqual(True, db.find_one({"_id": 1}).get('status'))
+        db.drop_mongo_connection()
+
+
+class QueryRecorder:
+    """
+    Class to wrap a database, collection or cursor of pymongo (or
+    mongomock), keeping the constraints and the sort of every query sent
+    to the Task collection.
+    """
+    QUERIES = ('find', 'find_one', 'find_one_and_update',
+               'find_one_and_delete', 'update_one', 'delete_many')
+
+    def __init__(self, target, shapes, shape=None):
+        """
+        :param target: Database, collection or cursor wrapped.
+        :type target: object
+        :param shapes: List receiving the [query, sort] of each query.
+        :type shapes: list
+        :param shape: Shape of the query of the wrapped cursor.
+        :type shape: list
+        """
+        self._target = target
+        self._shapes = shapes
+        self._shape = shape
+
+    def __getattr__(self, name):
+        attribute = getattr(self._target, name)
+        if name == 'task':
+            return QueryRecorder(attribute, self._shapes)
+        if name in self.QUERIES:
+            return self._query(attribute)
+        if name in ('sort', 'skip', 'limit', 'batch_size', 'with_options'):
+            return self._chain(name, attribute)
+        return attribute
+
+    def __iter__(self):
+        return iter(self._target)
+
+    def _query(self, method):
+        def query(*args, **kwargs):
+            shape = [args[0] if args else kwargs.get('filter', {}),
+                     kwargs.get('sort')]
+            self._shapes.append(shape)
+            result = method(*args, **kwargs)
+            if method.__name__ == 'find':
+                return QueryRecorder(result, self._shapes, shape)
+            return result
+        return query
+
+    def _chain(self, name, method):
+        def chain(*args, **kwargs):
+            if name == 'sort':
+                key = args[0]
+                self._shape[1] = [(key, args[1] if len(args) > 1 else 1)] \
+                    if isinstance(key, str) else list(key)
+            return QueryRecorder(method(*args, **kwargs), self._shapes,
+                                 self._shape)
+        return chain
+
+
+class IndexAssertions:
+    """
+    Class with the assertion of the use of an index by a query.
+    """
+    def assertUsesIndex(self, collection, query, sort=None):
+        """
+        Method to assert that a query is executed through an index
+        (IXSCAN), not by a scan of the collection (COLLSCAN), by the
+        explain of the database. Skips the test when the database can
+        not explain (mongomock).
+        """
+        cursor = collection.find(query)
+        if sort:
+            cursor = cursor.sort(sort)
+        try:
+            explain = cursor.explain()
+        except (AttributeError, NotImplementedError):
+            self.skipTest('The database can not explain the queries.')
+        stages = plan_stages(explain.get('queryPlanner', {})
+                             .get('winningPlan', {}))
+        self.assertNotIn('COLLSCAN', stages,
+                         f'{query} sorted by {sort} scans the collection')
+
+
+class TestIndexes(IndexAssertions, unittest.TestCase):
+    """
+    Class to allocate the test methods of the indexes of the Task
+    collection.
+    """
+    def setUp(self):
+        self.db = TaskRepository(app)
+        store = self.db.get_store()
+        if not isinstance(store, MongoTaskStore):
+            self.skipTest('The memory engine keeps its indexes by itself.')
+        self.collection = store.db.task
+
+    def tearDown(self):
+        self.db.drop_mongo_connection()
+
+    def repository_query_shapes(self):
+        """
+        Method to execute the queries of the repository, recording the
+        constraints and the sort sent to the Task collection.
+        :return: The distinct [query, sort] of the queries.
+        :rtype: list
+        """
+        for task_id, description in enumerate(("Task", "Other"), 1):
+            self.db.insert_one(task_id, description, False)
+        store = self.db.get_store()
+        shapes = []
+        store.db = QueryRecorder(store.db, shapes)
+        try:
+            filters = (self.db.task_filters(),
+                       self.db.task_filters(status=True),
+                       self.db.task_filters(description="Task"))
+            for parameters in filters:
+                for sort_key in ('_id', 'description'):
+                    for direction in (1, -1):
+                        self.db.find_page(1, parameters=parameters,
+                                          sort_key=sort_key,
+                                          direction=direction)
+            self.db.find_page(1, after=1)
+            self.db.find_page(1, before=2)
+            self.db.find_page(1, after=(True, 1),
+                              sort_key='status')
+            self.db.cache.clear()
+            self.db.find_one({"_id": 1})
+            self.db.find_one({"description": "Task"})
+            self.db.update_one({"_id": 1}, {"description": "Task1"})
+            self.db.toggle_status(1)
+            self.db.upsert_by_description("Task1", False)
+            self.db.update_many([(2, {"status": True})])
+            self.db.delete_one({"_id": 2})
+            self.db.delete_many([1])
+            searched = len(shapes)
+            self.db.search("Task", 10)
+            if not store._text_search:
+                # Without text search (mongomock) the inverted index in
+                # memory is built by a scan.
+                del shapes[searched + 1:]
+        finally:
+            store.db = store.db._target
+        distinct = []
+        for shape in shapes:
+            if shape not in distinct:
+                distinct.append(shape)
+        return distinct
+
+    def test_repository_queries_have_declared_indexes(self):
+        """
+        Method to test if every query shape of the repository has a
+        declared index the query planner can use.
+        """
+        print("In method", self._testMethodName)
+        shapes = self.repository_query_shapes()
+        self.assertIn([{"$text": {"$search": "Task"}},
+                       [("score", {"$meta": "textScore"}), ("_id", 1)]],
+                      shapes)
+        for query, sort in shapes:
+            if query.get('$text'):
+                sort = None
+            self.assertIsNotNone(index_for_query(query, sort),
+                                 f'No index for {query} sorted by {sort}')
+
+    def test_repository_queries_use_indexes(self):
+        """
+        Method to test if every query shape of the repository uses an
+        index, by the explain of the database.
+        """
+        print("In method", self._testMethodName)
+        for query, sort in self.repository_query_shapes():
+            if query.get('$text'):
+                sort = None
+            self.assertUsesIndex(self.collection, query, sort)
+
+    def test_index_for_query_detects_collection_scan(self):
+        """
+        Method to test if a query without an index is detected.
+        """
+        print("In method", self._testMethodName)
+        self.assertIsNone(index_for_query({"other": 1}))
+        self.assertIsNone(index_for_query({}, [("description", 1),
+                                               ("_id", 1)]))
+        self.assertEqual('status_1__id_1',
+                         index_for_query({}, [("status", 1), ("_id", 1)]))
+
+    def test_ensure_indexes_is_idempotent(self):
+        """
+        Method to test if the indexes can be created more than once.
+        """
+        print("In method", self._testMethodName)
+        self.assertEqual(self.db.ensure_indexes(), self.db.ensure_indexes())
+        self.assertEqual({'_id_', 'description_1', 'status_1__id_1',
+                          'description_text'},
+                         set(self.collection.index_information()))
+
+    def test_create_indexes_command(self):
+        """
+        Method to test if the create-indexes command prints the indexes.
+        """
+        print("In method", self._testMethodName)
+        result = app.test_cli_runner().invoke(args=['create-indexes'])
+        self.assertEqual(0, result.exit_code)
+        self.assertIn('status_1__id_1', result.output)
+
+    def test_index_failure_is_logged_once_and_fixed_by_command(self):
+        """
+        Method to test if an index that can not be built (the unique
+        index over duplicated Tasks) is logged once, without failing the
+        requests, and if the create-indexes command removes the
+        duplicates with --dedup.
+        """
+        print("In method", self._testMethodName)
+        self.collection.drop()
+        self.collection = self.db.get_store().db.task
+        self.collection.insert_many([
+            {"_id": 1, "description": "Twice", "status": False},
+            {"_id": 2, "description": "Once", "status": False},
+            {"_id": 3, "description": "Twice", "status": True}])
+        connections.indexes_ready = False
+        with self.assertLogs(app.logger.name, 'ERROR') as logs:
+            self.assertEqual(3, len(list(self.db.find({}, None))))
+            self.assertEqual(3, len(list(self.db.find({}, None))))
+        self.assertEqual(1, len(logs.output))
+
+        runner = app.test_cli_runner(mix_stderr=False)
+        result = runner.invoke(args=['create-indexes'])
+        self.assertEqual(1, result.exit_code)
+        self.assertIn('--dedup', result.stderr)
+        result = runner.invoke(args=['create-indexes', '--dedup'])
+        self.assertEqual(0, result.exit_code)
+        self.assertIn('removed=1', result.stderr)
+        self.assertIn('description_1', result.stdout)
+        self.assertEqual([1, 2], [task.get('_id') for task
+                                  in self.collection.find().sort("_id")])
+        self.assertEqual({"total": 2, "finished": 0, "pending": 2},
+                         self.db.stats())
+
+
+class TestCommandMonitor(unittest.TestCase):
+    """
+    Class to allocate the test methods of the monitoring of the MongoDB
+    commands (mongomock does not publish command events, so the events
+    are sent to the monitor by the tests).
+    """
+    @staticmethod
+    def send(monitor, request_id, command, duration_ms):
+        """
+        Method to send the events of a command to the monitor.
+        """
+        name = next(iter(command))
+        monitor.started(SimpleNamespace(
+            command_name=name, command=command, database_name='db',
+            request_id=request_id, connection_id=('localhost', 27017)))
+        monitor.succeeded(SimpleNamespace(
+            command_name=name, request_id=request_id,
+            connection_id=('localhost', 27017),
+            duration_micros=int(duration_ms * 1000)))
+
+    def test_query_shape_removes_values(self):
+        """
+        Method to test if the shape keeps the fields and operators of a
+        query, without its values.
+        """
+        print("In method", self._testMethodName)
+        self.assertEqual({"_id": {"$gt": '?'}, "description": '?'},
+                         query_shape({"_id": {"$gt": 10},
+                                      "description": "Secret"}))
+
+    def test_slow_commands_are_kept(self):
+        """
+        Method to test if every command is counted, and only the ones
+        over the threshold are kept as slow.
+        """
+        print("In method", self._testMethodName)
+        monitor = CommandMonitor(50)
+        self.send(monitor, 1, {"find": "task", "filter": {"_id": 1}}, 2)
+        self.send(monitor, 2, {"find": "task",
+                               "filter": {"description": "Secret"}}, 80)
+        report = monitor.report()
+        self.assertEqual(2, report.get('commands').get('find').get('count'))
+        self.assertEqual(1, len(report.get('slow')))
+        self.assertEqual({"description": '?'},
+                         report.get('slow')[0].get('shape').get('filter'))
+
+    def test_slow_find_shape_is_explained_once(self):
+        """
+        Method to test if each slow find shape is explained once, in
+        the background, keeping only the summary of the plan.
+        """
+        print("In method", self._testMethodName)
+        explained = []
+
+        def explain(database, collection, query, sort):
+            explained.append(query)
+            return {"queryPlanner": {
+                "parsedQuery": query,
+                "winningPlan": {"stage": 'LIMIT', "inputStage": {
+                    "stage": 'FETCH', "inputStage": {
+                        "stage": 'IXSCAN', "indexName": 'description_1',
+                        "indexBounds": {"description": [
+                            '["First", "First"]']}}}}},
+                "executionStats": {"nReturned": 1, "totalKeysExamined": 1,
+                                   "totalDocsExamined": 1}}
+
+        monitor = CommandMonitor(50, explain=explain)
+        for request_id, description in enumerate(('First', 'Second')):
+            self.send(monitor, request_id,
+                      {"find": "task", "filter": {"description": description}},
+                      80)
+        monitor.flush()
+        explains = monitor.report().get('explains')
+        self.assertEqual([{"description": 'First'}], explained)
+        self.assertEqual(['LIMIT', 'FETCH', 'IXSCAN'],
+                         explains[0].get('stages'))
+        self.assertEqual(['description_1'], explains[0].get('indexes'))
+        self.assertFalse(explains[0].get('collscan'))
+        self.assertEqual((1, 1, 1), (explains[0].get('keys_examined'),
+                                     explains[0].get('docs_examined'),
+                                     explains[0].get('returned')))
+        # The values of the query are not kept.
+        self.assertNotIn('First', json.dumps(explains[0]))
+
+    def test_debug_endpoint(self):
+        """
+        Method to test if /debug/slow-queries returns the report of the
+        monitor, and 404 when the monitoring is disabled.
+        """
+        print("In method", self._testMethodName)
+        client = app.test_client()
+        self.assertEqual(404, client.get('/debug/slow-queries').status_code)
+        connections.monitor = CommandMonitor(0)
+        try:
+            self.send(connections.monitor, 1, {"find": "task"}, 1)
+            response = client.get('/debug/slow-queries')
+        finally:
+            connections.monitor = None
+        self.assertEqual(200, response.status_code)
+        self.assertEqual(1, len(response.get_json().get('slow')))
+
+
+class TestMetrics(unittest.TestCase):
+    """
+    Class to allocate the test methods of the latency metrics
+    (/metrics).
+    """
+    def setUp(self):
+        """
+        Method that will be executed before tests. Creates a test
+        instance and mock Database with register, and makes requests to
+        be measured.
+        """
+        self.app_test = app.test_client()
+        self.db = TaskRepository(app)
+        self.db.insert_one(1, "MockData", False)
+        self.app_test.get('/find-all')
+        self.response = self.app_test.get('/metrics')
+
+    def tearDown(self):
+        """
+        Method to be executed when test finish. Drop the mock database.
+        """
+        self.db.drop_mongo_connection()
+
+    def test_histogram_quantiles(self):
+        """
+        Method to test if the quantiles are estimated inside the bucket
+        where they fall.
+        """
+        print("In method", self._testMethodName)
+        histogram = Histogram(buckets=(1.0, 2.0, 4.0))
+        for seconds in (0.5, 1.5, 1.5, 3.0):
+            histogram.observe(seconds)
+        histogram.observe(10.0, error=True)
+        self.assertEqual(1.75, histogram.quantile(0.5))
+        self.assertEqual(4.0, histogram.quantile(0.99))
+        self.assertEqual((5, 16.5, 1), histogram.snapshot()[1:])
+
+    def test_timed_observes_the_iteration_of_a_cursor(self):
+        """
+        Method to test if an operation returning a lazy iterator is
+        observed when it is read, including the time of the reading but
+        not the time of the caller between the items.
+        """
+        print("In method", self._testMethodName)
+
+        def cursor():
+            for task_id in (1, 2):
+                time.sleep(0.02)
+                yield task_id
+            raise RuntimeError('cursor lost')
+
+        @timed('test_cursor', iterated=True)
+        def find():
+            return cursor()
+
+        histogram = metrics.histogram(
+            'task_repository_operation_duration_seconds', '',
+            operation='test_cursor')
+        tasks = find()
+        self.assertEqual(0, histogram.snapshot()[1])
+        self.assertEqual(1, next(tasks))
+        time.sleep(0.1)
+        self.assertEqual(2, next(tasks))
+        with self.assertRaises(RuntimeError):
+            next(tasks)
+        _, count, total, errors = histogram.snapshot()
+        self.assertEqual((1, 1), (count, errors))
+        self.assertGreaterEqual(total, 0.04)
+        self.assertLess(total, 0.1)
+
+        histogram = metrics.histogram(
+            'task_repository_operation_duration_seconds', '',
+            operation='find_tasks')
+        count = histogram.snapshot()[1]
+        tasks = self.db.find_tasks({})
+        self.assertEqual(count, histogram.snapshot()[1])
+        self.assertEqual(1, len(list(tasks)))
+        self.assertEqual(count + 1, histogram.snapshot()[1])
+
+    def test_get_metrics_returns_prometheus_text(self):
+        """
+        Method to test if the /metrics endpoint returns the metrics in
+        the Prometheus text format.
+        """
+        print("In method", self._testMethodName)
+        self.assertEqual(200, self.response.status_code)
+        self.assertIn('text/plain', self.response.content_type)
+
+    def test_get_metrics_measures_requests_and_repository(self):
+        """
+        Method to test if the requests, templates and repository
+        operations are measured.
+        """
+        print("In method", self._testMethodName)
+        content = self.response.data.decode('utf-8')
+        self.assertIn('task_http_request_duration_seconds_count'
+                      '{method="GET",route="/find-all"}', content)
+        self.assertIn('task_http_request_quantile_seconds'
+                      '{method="GET",route="/find-all",quantile="0.99"}',
+                      content)
+        self.assertIn('task_template_render_duration_seconds_count'
+                      '{template="list.html"}', content)
+        self.assertIn('task_repository_operation_errors_total'
+                      '{operation="find_page"} 0', content)
+        self.assertIn('task_cache_hits_total{cache="page"}', content)
+
+
+class TestAdmission(unittest.TestCase):
+    """
+    Class to allocate the test methods of the admission control of the
+    repository operations.
+    """
+    def setUp(self):
+        self.previous = dict(app.config)
+        self.app_test = app.test_client()
+        self.db = TaskRepository(app)
+        self.db.insert_one(1, "MockData", False)
+
+    def tearDown(self):
+        self.db.drop_mongo_connection()
+        app.config.update(self.previous)
+        admission.configure(app)
+
+    def test_gate_limits_waiting_operations(self):
+        """
+        Method to test if the gate refuses the operations beyond the
+        queue depth at once, and the queued ones after the timeout.
+        """
+        print("In method", self._testMethodName)
+        gate = AdmissionGate(1, 0, 0.05)
+        self.assertTrue(gate.acquire())
+        self.assertFalse(gate.acquire())
+
+        gate.queue_depth = 1
+        self.assertFalse(gate.acquire())
+        self.assertEqual(2, gate.rejected)
+
+        threading.Timer(0.01, gate.release).start()
+        gate.timeout = 5
+        self.assertTrue(gate.acquire())
+        self.assertEqual(0, gate.waiting)
+
+    def test_gate_size_follows_server_threads(self):
+        """
+        Method to test if the gate, when its size is not configured,
+        admits one operation less than the server threads, and queues
+        half as many, and the gate of the coroutines follows the
+        connection pool.
+        """
+        print("In method", self._testMethodName)
+        app.config.update(ADMISSION_MAX_CONCURRENCY=None,
+                          ADMISSION_QUEUE_DEPTH=None, SERVER_THREADS=4,
+                          MONGO_MAX_POOL_SIZE=10)
+        admission.configure(app)
+        self.assertEqual((3, 1), (admission.gate.limit,
+                                  admission.gate.queue_depth))
+        self.assertEqual((10, 5), (admission.async_gate.limit,
+                                   admission.async_gate.queue_depth))
+        self.assertIs(logging.getLogger(app.name), admission.breaker.logger)
+
+        app.config.update(ADMISSION_MAX_CONCURRENCY=0)
+        admission.configure(app)
+        self.assertIsNone(admission.gate)
+
+    def test_circuit_breaker_opens_and_probes(self):
+        """
+        Method to test if the circuit opens after consecutive timeouts,
+        lets a single probe through after the reset timeout, and closes
+        when it succeeds.
+        """
+        print("In method", self._testMethodName)
+        now = [0.0]
+        breaker = CircuitBreaker(2, 10, clock=lambda: now[0])
+        breaker.record(True)
+        breaker.record(False)
+        breaker.record(True)
+        self.assertEqual(CircuitBreaker.CLOSED, breaker.state)
+        breaker.record(True)
+        self.assertEqual(CircuitBreaker.OPEN, breaker.state)
+        self.assertFalse(breaker.allow())
+        now[0] = 4.0
+        self.assertEqual(6.0, breaker.retry_after())
+
+        now[0] = 10.0
+        self.assertTrue(breaker.allow())
+        self.assertFalse(breaker.allow())
+        breaker.record(True)
+        self.assertEqual(CircuitBreaker.OPEN, breaker.state)
+        self.assertFalse(breaker.allow())
+
+        now[0] = 20.0
+        self.assertTrue(breaker.allow())
+        breaker.cancel()
+        self.assertTrue(breaker.allow())
+        breaker.record(False)
+        self.assertEqual(CircuitBreaker.CLOSED, breaker.state)
+        self.assertTrue(breaker.allow())
+
+    def test_open_circuit_returns_503(self):
+        """
+        Method to test if the requests are answered with 503 and
+        Retry-After, without calling the database, while the circuit is
+        open.
+        """
+        print("In method", self._testMethodName)
+        app.config.update(CIRCUIT_BREAKER_THRESHOLD=1,
+                          CIRCUIT_BREAKER_RESET_TIMEOUT=30)
+        admission.configure(app)
+
+        @timed('test_timeout')
+        def timeout():
+            raise NetworkTimeout('timed out')
+
+        with self.assertRaises(NetworkTimeout):
+            timeout()
+        response = self.app_test.get('/find-all')
+        self.assertEqual(503, response.status_code)
+        self.assertEqual('30', response.headers.get('Retry-After'))
+
+        messages = []
+
+        async def receive():
+            return {"type": 'http.request', "body": b''}
+
+        async def send(message):
+            messages.append(message)
+
+        asyncio.run(application({"type": 'http', "method": 'GET',
+                                 "path": '/api/v1/tasks/1',
+                                 "headers": []}, receive, send))
+        self.assertEqual(503, messages[0].get('status'))
+        self.assertIn((b'retry-after', b'30'), messages[0].get('headers'))
+
+    def test_saturated_gate_returns_503(self):
+        """
+        Method to test if a request is refused at once when every slot
+        of the gate is taken and the queue is full, and admitted when a
+        slot is released.
+        """
+        print("In method", self._testMethodName)
+        app.config.update(ADMISSION_MAX_CONCURRENCY=None, SERVER_THREADS=1,
+                          ADMISSION_QUEUE_DEPTH=0, ADMISSION_RETRY_AFTER=2)
+        admission.configure(app)
+        self.assertEqual(1, admission.gate.limit)
+        started = threading.Event()
+        release = threading.Event()
+
+        @timed('test_slow')
+        def slow():
+            started.set()
+            release.wait(5)
+
+        thread = threading.Thread(target=slow)
+        thread.start()
+        started.wait(5)
+        try:
+            response = self.app_test.get('/find-all')
+            self.assertEqual(503, response.status_code)
+            self.assertEqual('2', response.headers.get('Retry-After'))
+            self.assertIn('text/html', response.content_type)
+            response = self.app_test.get('/api/v1/tasks')
+            self.assertEqual(503, response.status_code)
+            self.assertEqual('2', response.headers.get('Retry-After'))
+            self.assertIn('error', response.get_json())
+        finally:
+            release.set()
+            thread.join()
+        self.assertEqual(200, self.app_test.get('/find-all').status_code)
+
+    def test_concurrent_requests_beyond_the_gate_return_503(self):
+        """
+        Method to test if, with the default size of the gate, requests
+        of real threads beyond the slots and the queue are answered with
+        503, while the admitted ones complete.
+        """
+        print("In method", self._testMethodName)
+        app.config.update(ADMISSION_MAX_CONCURRENCY=None,
+                          ADMISSION_QUEUE_DEPTH=None, SERVER_THREADS=3,
+                          ADMISSION_TIMEOUT=0.1)
+        admission.configure(app)
+        store = self.db.get_store()
+        find_one = store.find_one
+        entered = threading.Semaphore(0)
+        release = threading.Event()
+
+        def slow_find_one(*args, **kwargs):
+            entered.release()
+            release.wait(5)
+            return find_one(*args, **kwargs)
+
+        statuses = []
+
+        def request():
+            response = app.test_client().get('/api/v1/tasks/1')
+            statuses.append(response.status_code)
+
+        store.find_one = slow_find_one
+        admitted = [threading.Thread(target=request) for _ in range(2)]
+        try:
+            for thread in admitted:
+                thread.start()
+            for _ in admitted:
+                self.assertTrue(entered.acquire(timeout=5))
+            refused = [threading.Thread(target=request) for _ in range(2)]
+            for thread in refused:
+                thread.start()
+            for thread in refused:
+                thread.join(5)
+            self.assertEqual([503, 503], statuses)
+        finally:
+            release.set()
+            for thread in admitted:
+                thread.join(5)
+            del store.find_one
+        self.assertEqual([503, 503, 200, 200], statuses)
+        self.assertEqual(2, admission.gate.rejected)
+
+    def test_async_gate_limits_coroutines(self):
+        """
+        Method to test if the gate of the coroutines refuses the ones
+        beyond the queue, and the queued ones after the timeout, without
+        blocking the event loop.
+        """
+        print("In method", self._testMethodName)
+        gate = AsyncAdmissionGate(1, 1, 0.05)
+
+        async def run():
+            self.assertTrue(await gate.acquire())
+            waiting = asyncio.ensure_future(gate.acquire())
+            await asyncio.sleep(0)
+            self.assertFalse(await gate.acquire())
+            self.assertFalse(await waiting)
+            waiting = asyncio.ensure_future(gate.acquire())
+            await asyncio.sleep(0)
+            gate.release()
+            self.assertTrue(await waiting)
+            gate.release()
+        asyncio.run(run())
+        self.assertEqual((2, 0), (gate.rejected, gate.waiting))
+
+
+class TestLogging(unittest.TestCase):
+    """
+    Class to allocate the test methods of the logging configuration.
+    """
+    def make_record(self, name, level, message, *args):
+        """
+        Method to create a log record.
+        """
+        return logging.LogRecord(name, level, __file__, 1, message, args,
+                                 None)
+
+    def test_json_formatter_returns_json_line(self):
+        """
+        Method to test if the JSON formatter returns the fields of the
+        record, with the message formatted.
+        """
+        print("In method", self._testMethodName)
+        record = self.make_record('src', logging.INFO, 'find_one(%s)', 1)
+        document = json.loads(JsonFormatter().format(record))
+        self.assertEqual('find_one(1)', document.get('message'))
+        self.assertEqual('INFO', document.get('level'))
+        self.assertEqual('src', document.get('logger'))
+
+    def test_sampling_filter_by_logger(self):
+        """
+        Method to test if the sampling filter drops the records of the
+        configured loggers (and children), keeping warnings.
+        """
+        print("In method", self._testMethodName)
+        sampling = SamplingFilter(parse_sampling('src=0.5, other=1'),
+                                  randomizer=lambda: 0.7)
+        self.assertFalse(sampling.filter(
+            self.make_record('src.repository', logging.INFO, 'x')))
+        self.assertTrue(sampling.filter(
+            self.make_record('src', logging.WARNING, 'x')))
+        self.assertTrue(sampling.filter(
+            self.make_record('werkzeug', logging.INFO, 'x')))
+
+    def test_configure_async_logging_writes_json(self):
+        """
+        Method to test if the asynchronous logging writes the records
+        in JSON lines, from the background thread.
+        """
+        print("In method", self._testMethodName)
+        directory = tempfile.mkdtemp()
+        file_name = os.path.join(directory, 'test.log')
+        settings = {"LOG_FILE": file_name, "LOG_FORMAT": 'json',
+                    "LOG_ASYNC": True, "LOG_MAX_BYTES": 1024 * 1024}
+        previous = {key: app.config[key] for key in settings}
+        root = logging.getLogger()
+        level = root.level
+        handlers = list(root.handlers)
+        app.config.update(settings)
+        try:
+            listener = configure_logging(app)
+            logging.getLogger('test').info('message %s', 'queued')
+            atexit.unregister(listener.stop)
+            listener.stop()
+        finally:
+            app.config.update(previous)
+            for handler in root.handlers:
+                if handler not in handlers:
+                    root.removeHandler(handler)
+            root.setLevel(level)
+
+        with open(file_name, encoding='utf-8') as log_file:
+            lines = [json.loads(line) for line in log_file]
+        self.assertIn('message queued',
+                      [line.get('message') for line in lines])
+
+    def test_many_processes_leave_rotation_to_logrotate(self):
+        """
+        Method to test if the log file is rotated by size only with a
+        single process, and reopened after it is moved when many
+        processes write it.
+        """
+        print("In method", self._testMethodName)
+        directory = tempfile.mkdtemp()
+        settings = {"LOG_FILE": os.path.join(directory, 'test.log'),
+                    "LOG_MAX_BYTES": 1024}
+        previous = {key: app.config[key] for key in settings}
+        app.config.update(settings)
+        try:
+            single = create_file_handler(app)
+            many = create_file_handler(app, processes=3)
+        finally:
+            app.config.update(previous)
+        single.close()
+        many.close()
+        self.assertIsInstance(single, RotatingFileHandler)
+        self.assertIsInstance(many, WatchedFileHandler)
+
+    @unittest.skipUnless(hasattr(os, 'fork'), 'requires os.fork')
+    def test_restart_listener_after_fork(self):
+        """
+        Method to test if a forked process writes the records queued
+        after the listener of the parent process is started again.
+        """
+        print("In method", self._testMethodName)
+        directory = tempfile.mkdtemp()
+        file_name = os.path.join(directory, 'test.log')
+        records = queue.SimpleQueue()
+        file_handler = logging.FileHandler(file_name, encoding='utf-8')
+        file_handler.setFormatter(logging.Formatter('%(message)s'))
+        listener = QueueListener(records, file_handler)
+        listener.start()
+        pid = os.fork()
+        if pid == 0:
+            restart_listener(listener)
+            records.put(logging.makeLogRecord({"msg": 'from worker'}))
+            listener.stop()
+            os._exit(0)
+        os.waitpid(pid, 0)
+        listener.stop()
+        file_handler.close()
+
+        with open(file_name, encoding='utf-8') as log_file:
+            self.assertEqual(['from worker'], log_file.read().split('\n')[:1])
+
+
+class TestServer(unittest.TestCase):
+    """
+    Class to allocate the test methods of the production server settings.
+    """
+    def setUp(self):
+        self.previous = dict(app.config)
+
+    def tearDown(self):
+        app.config.update(self.previous)
+
+    def test_server_options_from_config(self):
+        """
+        Method to test if the gunicorn settings are built from the
+        configuration, with a worker per core when not informed.
+        """
+        print("In method", self._testMethodName)
+        app.config.update(SERVER_WORKERS=None, SERVER_THREADS=8,
+                          SERVER_KEEPALIVE=10, TASK_BACKEND='mongomock')
+        options = server_options(app)
+        self.assertEqual(os.cpu_count() * 2 + 1, options.get('workers'))
+        self.assertEqual('gthread', options.get('worker_class'))
+        self.assertEqual(10, options.get('keepalive'))
+        self.assertTrue(options.get('preload_app'))
+        self.assertTrue(callable(options.get('post_fork')))
+
+        app.config.update(SERVER_WORKERS=3, SERVER_THREADS=1)
+        options = server_options(app)
+        self.assertEqual(3, options.get('workers'))
+        self.assertEqual('sync', options.get('worker_class'))
+        self.assertEqual({"listen": '0.0.0.0:5000', "threads": 3,
+                          "channel_timeout": 30}, waitress_options(options))
+
+    def test_memory_backend_runs_single_worker(self):
+        """
+        Method to test if the memory backend, which keeps the Tasks in
+        the process, is served by a single worker.
+        """
+        print("In method", self._testMethodName)
+        app.config.update(SERVER_WORKERS=4, TASK_BACKEND='memory')
+        self.assertEqual(1, server_options(app).get('workers'))
+
+    def test_worker_hooks_start_and_stop_the_jobs(self):
+        """
+        Method to test if the gunicorn hooks start the jobs of a worker
+        after the fork, and stop them and write the counters kept in
+        memory when the worker exits (HUP, TERM or the end of a USR2
+        upgrade), since the code is preloaded in the master.
+        """
+        print("In method", self._testMethodName)
+        options = server_options(app)
+        self.assertTrue(options.get('preload_app'))
+        options.get('post_fork')(None, None)
+        timers = list(worker_timers)
+        self.assertIn('flush-counters',
+                      [timer._thread.name for timer in timers])
+        task_db.insert_one(task_db.next_id(), "WorkerExit", False)
+        self.assertTrue(task_db.counter_buffer)
+
+        options.get('worker_exit')(None, None)
+        for timer in timers:
+            timer._thread.join(5)
+            self.assertFalse(timer._thread.is_alive())
+        self.assertFalse(task_db.counter_buffer)
+        task_db.drop_mongo_connection()
+
+    def test_preload_templates(self):
+        """
+        Method to test if every template is compiled before the fork.
+        """
+        print("In method", self._testMethodName)
+        names = preload_templates(app)
+        self.assertIn('list.html', names)
+        cached = {key[1] for key in app.jinja_env.cache.keys()}
+        self.assertEqual(set(), set(names) - cached)
 
 
 if __name__ == '__main__':